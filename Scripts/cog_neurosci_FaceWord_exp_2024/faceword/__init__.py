@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+The code behind the WordFace scripts.
+
+The WordFace_exp_*.py scripts in the experiment folder are what is run in the
+lab; each one only names its profile in engine.py. Everything else lives here:
+
+    engine        the experiment, written once for every modality
+    schedule      the frames of a trial, compiled before the run
+    sequence      the fMRI trial orders, searched for an efficient design
+    plans         the trial orders, made offline for every participant
+    wordstore     the binary store of the word list
+    stimcache     the word and face stimuli, built before the scanner trigger
+    scoring       the responses of a run, scored after the run
+    responses     the keyboard, read in the background
+    pulses        the MEG/EEG response triggers, pulses of pulse_ms sharing the port with the stimulus triggers
+    trigger_table the trigger codes as lookup tables, and their names for the events file (see triggers.py)
+    transports    where the triggers go: the parallel port, serial, udp, a file
+    journal       the crash-safe journal behind ppc.csv_writer
+    columnar      the parquet copy of the log
+    monitor       the live view of the trials, for the control room
+    fliplog       the measured frame times
+    headless      runs the scripts without psychopy or a screen
+    simulate      runs many simulated participants
+    benchmark     times the per-trial and per-frame logic
+
+The tools are run from the experiment folder, e.g.
+
+    python -m faceword.plans MEG 0123
+    python -m faceword.headless
+"""
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the experiment's own per-trial and per-frame logic, runnable on
+any computer - no window, scanner or parallel port needed.
+
+psychopy is replaced by the stand-in of headless.py, on a real-time clock:
+flips, drawing and dialogs cost nothing and the parallel port is missing, so
+triggers go through the fake path in triggers.py. What is left is the cost of
+our own code:
+
+    * make_trial_list and run_condition of the MEG and EEG_resp profiles (see engine.py),
+      including the response listener, classification and triggers, and
+      loading a session's trials from a plan (plans.py) instead, and
+      loading a session's words from the word store (wordstore.py). The
+      stand-in keyboard gets a rotating 'y', 'b', '1', '2' or nothing every
+      10th frame.
+    * ppc.csv_writer.write() + flush() in normal, threaded and journaled mode,
+      one trial per frame (see ppc.csv_writer_latency)
+    * triggers.setParallelData
+    * the round trip of a code through each trigger transport (see transports.py)
+
+Every run is appended to benchmark_results/history.jsonl so the numbers can
+be followed over time on that computer (the history is not tracked by git,
+see .gitignore), and compared with benchmark_results/baseline.json. The times
+are those of the computer they were measured on, so the baseline is made on
+the lab's stimulus PC, once, and committed from there:
+
+    python -m faceword.benchmark --save-baseline  # the first run: make it the baseline
+    python -m faceword.benchmark                  # later runs: compare with the baseline
+
+Exits with 1 if something got more than 10 % slower (median or p95), so it can
+be run before lab days or in CI, and without a baseline it refuses to run at
+all, rather than pass without comparing anything.
+"""
+
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import ppc
+from faceword import headless
+from faceword import journal
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the experiment folder, above this package
+RESULTS = os.path.join(HERE, 'benchmark_results')
+PROFILES = ('MEG', 'EEG_resp')
+ANSWERS = itertools.cycle(['y', 'b', '1', '2', None])  # the keys pressed, one every 10th frame
+
+
+"""
+STAND-INS
+"""
+def _answer(session, t):
+    """The responder: presses the next of ANSWERS every 10th frame."""
+    if session.flips % 10 == 0:
+        key = next(ANSWERS)
+        if key is not None:
+            session.press(key)
+
+
+class _NoDiskWriter(object):
+    """Stands in for the session's csv_writer in run_condition. Its disk I/O
+    is benchmarked on its own, one trial per frame, like in the experiment;
+    60 back-to-back fsyncs per run would drown our own code."""
+    def write(self, trial):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rewrite(self, trials):
+        pass
+
+
+def prepare_session(experiment, session=1):
+    """Sets up what the experiment's run loop would for :session:, and
+    returns the trials."""
+    from faceword import columnar
+    from faceword import engine
+    from faceword import fliplog
+    from faceword import pulses
+    trials = experiment.make_trial_list('faceWord_exp', session)
+    experiment.build_stimuli(trials)
+    experiment.stimuli.report()
+    experiment.writer = _NoDiskWriter()
+    try:
+        experiment.columns = columnar.ColumnWriter(trials[0], 'bench_sess_%i.parquet' % session)
+    except ImportError:
+        experiment.columns = None  # no pyarrow: no parquet log, like in start_run
+    experiment.flip_log = fliplog.FlipRecorder(engine.FRAME_RATE, 'bench_sess_%i.flips.npy' % session)
+    experiment.trigger_pulses = pulses.PulseScheduler(width_ms=0, gap_ms=0)  # a fake port, and no waiting
+    experiment.set_trigger = experiment.trigger_pulses.stimulus
+    return trials
+
+
+"""
+BENCHMARKS
+"""
+def run_benchmarks(session):
+    """Runs all benchmarks in the headless :session: and returns {name: result from ppc.timer}"""
+    results = {}
+
+    def bench(name, script, namespace, runs=False, repeat=False):
+        print('\n---', name)
+        result = ppc.timer(script, runs=runs, repeat=repeat, namespace=namespace)
+        results[name] = result
+        return result
+
+    from faceword import engine
+    from faceword import plans
+    from faceword import wordstore
+    for modality in PROFILES:
+        experiment = engine.Experiment(modality, dict((key, 'bench') for key in engine.DIALOG),
+                                       os.path.join(HERE, 'wordlist.txt'), plan_folder=None)
+        experiment.open_window()
+        trials = prepare_session(experiment)
+        namespace = {'experiment': experiment, 'trials': trials, 'plans': plans, 'wordstore': wordstore}
+        bench(modality + ' make_trial_list', "experiment.make_trial_list('WordFace_exp', 2)", namespace)
+        plans.save(plans.filename('.', 'bench', 'plan'), {1: experiment.make_trial_list('faceWord_exp', 1)}, experiment.word_store())
+        bench(modality + ' plan load + trials', "plans.load('.', 'bench', 'plan').trials(1)", namespace)
+        bench(modality + ' word store load + session', "wordstore.load(experiment.wordlist).session(1)", namespace)
+
+        flips = session.flips
+        experiment.run_condition(trials, 0.0)
+        frames = session.flips - flips
+        run = bench(modality + ' run_condition (60 trials)', "experiment.run_condition(trials, 0.0)", namespace, repeat=20)
+        print('i.e. about', round(run['median'] / frames * 10 ** 6, 2), 'us of our own code per frame over', frames, 'frames')
+        experiment.writer.close()
+        if experiment.columns is not None:
+            experiment.columns.close()
+        experiment.flip_log.close()
+
+    # One trial per frame rather than back-to-back, like in the experiment,
+    # so the writer thread is not measured against a queue that never drains.
+    print('\n--- csv_writer')
+    for mode, result in ppc.csv_writer_latency(folder='bench_writer', journal=journal.TrialJournal).items():
+        results['csv_writer %s write()+flush()' % mode] = result
+
+    import triggers
+    bench('triggers.setParallelData (fake port)', 'setParallelData(11); setParallelData(0)', {'setParallelData': triggers.setParallelData})
+
+    # Round trip of a code through each trigger transport to a local receiver
+    from faceword import transports
+    print('\n--- trigger transports')
+    for name, result in transports.benchmark().items():
+        results['transport %s' % name] = result
+    return results
+
+
+"""
+TRACK RESULTS OVER TIME
+"""
+class _HideTriggers(object):
+    """Drops the "TRIG 11 (Fake)" lines printed by the fake trigger path."""
+    def __init__(self, stream):
+        self.stream = stream
+        self._hiding = False
+
+    def write(self, text):
+        if text.startswith('TRIG '):
+            self._hiding = True
+        elif self._hiding and text == '\n':
+            self._hiding = False
+        else:
+            self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _commit():
+    try:
+        import subprocess
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE).decode().strip()
+    except Exception:
+        return ''
+
+
+def main(save_baseline=False, tolerance=0.1):
+    baseline_file = os.path.join(RESULTS, 'baseline.json')
+    if not save_baseline and not os.path.exists(baseline_file):
+        raise SystemExit('No baseline to compare with: %s does not exist. Make it on the lab PC with '
+                         'python -m faceword.benchmark --save-baseline and commit it' % baseline_file)
+
+    session = headless.Session(responder=_answer, realtime=True, parallel_port=False)
+    headless.install(session)
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+
+    cwd = os.getcwd()
+    stdout = sys.stdout
+    with tempfile.TemporaryDirectory(prefix='faceword_bench_') as workdir:
+        os.chdir(workdir)  # logs written by the benchmarks end up here
+        sys.stdout = _HideTriggers(stdout)
+        try:
+            results = run_benchmarks(session)
+        finally:
+            sys.stdout = stdout
+            os.chdir(cwd)
+
+    record = {
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': dict((name, dict((key, value) for key, value in result.items() if key != 'samples'))
+                        for name, result in results.items()),
+    }
+    if not os.path.isdir(RESULTS):
+        os.makedirs(RESULTS)
+    with open(os.path.join(RESULTS, 'history.jsonl'), 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+    regressions = []
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        print('\nCompared to the baseline from commit', baseline.get('commit') or '?')
+        for name, result in sorted(record['results'].items()):
+            if name in baseline['results']:
+                print(name + ':', end=' ')
+                if ppc.compare(result, baseline['results'][name], tolerance):
+                    regressions += [name]
+    if save_baseline:
+        with open(baseline_file, 'w') as f:
+            json.dump(record, f, indent=1)
+        print('\nSaved as new baseline:', baseline_file)
+    return regressions
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(save_baseline='--save-baseline' in sys.argv) else 0)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar (Parquet or Arrow) session logs, written next to the ppc.csv_writer
+csv files.
+
+The column types are fixed once from the first trial dictionary that
+make_trial_list builds. During the run, the trials are only appended to typed
+column buffers (floats, integers and categorical labels), and the file is
+written in one go when the run is over. The files are much smaller than the
+csv files, and the analysis can load just the columns it needs:
+
+    columns = columnar.ColumnWriter(trial_list[0], 'data/0001_sess_1.parquet')
+    columns.write(trial)  # after each trial
+    columns.close()       # after the run
+
+    events = columnar.read('data/0001_sess_1.parquet', columns=['onset_img', 'rt'])
+
+Needs pyarrow. Without it, the experiment only writes the csv logs and warns
+that there is no parquet copy (see Experiment.start_run in engine.py). Use a filename ending in .parquet for Parquet or in .arrow for
+the Arrow IPC (feather) format.
+"""
+
+from array import array
+from numbers import Integral, Real
+
+# Fields which are empty strings in the trial list and filled with times later
+FLOAT_FIELDS = ('onset_word', 'offset_word', 'duration_measured_word',
+                'onset_img', 'offset_img', 'duration_measured_img',
+                'pause_trigger_t', 'key_t', 'rt', 'max_ifi')
+# Fields which are empty strings in the trial list and filled with integers later
+INT_FIELDS = ('correct_resp', 'dropped_frames', 'frames_word', 'frames_img')
+
+FLOAT, INT, CATEGORY = 'float', 'int', 'category'
+
+
+def infer_schema(trial):
+    """Returns a list of (name, type) for a trial dictionary."""
+    schema = []
+    for name, value in trial.items():
+        if name in FLOAT_FIELDS:
+            kind = FLOAT
+        elif name in INT_FIELDS:
+            kind = INT
+        elif isinstance(value, Integral) and not isinstance(value, bool):
+            kind = INT
+        elif isinstance(value, Real) and not isinstance(value, bool):
+            kind = FLOAT
+        else:
+            kind = CATEGORY
+        schema += [(name, kind)]
+    return schema
+
+
+class ColumnWriter(object):
+    def __init__(self, schema_trial, filename):
+        """
+        :schema_trial: (dict) a trial from make_trial_list. Its keys and value
+            types become the columns of the file.
+        :filename: (str) the file to write on close(). Ends in .parquet or .arrow
+        """
+        if not filename.endswith(('.parquet', '.arrow')):
+            raise ValueError('filename must end in .parquet or .arrow')
+        __import__('pyarrow')  # fail now rather than after the run
+
+        self.filename = filename
+        self.schema = infer_schema(schema_trial)
+        self._columns = {}
+        self._valid = {}  # for INT columns: 1 where a value was given
+        self._categories = {}  # for CATEGORY columns: label -> code
+        for name, kind in self.schema:
+            if kind == FLOAT:
+                self._columns[name] = array('d')
+            elif kind == INT:
+                self._columns[name] = array('q')
+                self._valid[name] = bytearray()
+            else:
+                self._columns[name] = array('i')
+                self._categories[name] = {}
+        self.rows = 0
+
+    def write(self, trial):
+        """Appends a trial to the column buffers. :trial: a dictionary"""
+        if len(trial) > len(self._columns) and set(trial) - set(self._columns):
+            raise ValueError('The trial has columns which were not in the schema: %s' % sorted(set(trial) - set(self._columns)))
+
+        for name, kind in self.schema:
+            value = trial.get(name, '')
+            missing = value == '' or value is None
+            if kind == FLOAT:
+                self._columns[name].append(float('nan') if missing else value)
+            elif kind == INT:
+                self._columns[name].append(0 if missing else int(value))
+                self._valid[name].append(not missing)
+            else:
+                codes = self._categories[name]
+                if missing:
+                    self._columns[name].append(-1)
+                else:
+                    label = str(value)
+                    if label not in codes:
+                        codes[label] = len(codes)
+                    self._columns[name].append(codes[label])
+        self.rows += 1
+
+    def table(self):
+        """The buffered trials as a pyarrow.Table"""
+        import pyarrow as pa
+
+        arrays = []
+        for name, kind in self.schema:
+            column = self._columns[name]
+            if kind == FLOAT:
+                arrays += [pa.array(column, type=pa.float64(), from_pandas=True)]  # NaN becomes null
+            elif kind == INT:
+                valid = self._valid[name]
+                arrays += [pa.array([value if ok else None for value, ok in zip(column, valid)], type=pa.int64())]
+            else:
+                indices = pa.array([code if code >= 0 else None for code in column], type=pa.int32())
+                dictionary = pa.array(list(self._categories[name]), type=pa.string())
+                arrays += [pa.DictionaryArray.from_arrays(indices, dictionary)]
+        return pa.Table.from_arrays(arrays, names=[name for name, kind in self.schema])
+
+    def close(self):
+        """Writes the file. Call once after the run."""
+        table = self.table()
+        if self.filename.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            pq.write_table(table, self.filename, compression='zstd')
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, self.filename, compression='zstd')
+
+
+def read(filename, columns=None):
+    """
+    Loads a columnar session log as a pandas DataFrame.
+        :filename: (str) a .parquet or .arrow file
+        :columns: (list) optionally only load these columns
+    """
+    if filename.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(filename, columns=columns)
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(filename, columns=columns, memory_map=True)
+    return table.to_pandas()
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The WordFace experiment, for every modality it is run in.
+
+The fMRI, MEG, EEG and behavioural scripts were copies of the same script with
+a few numbers changed. Now the experiment is written once, here, and each
+script only names its profile:
+
+    from faceword import engine
+    engine.main('MEG')
+
+The PROFILES differ in their settings only: the delays between the word, the
+face and the next word, when the pause trigger goes up (SCHEDULE, see
+schedule.py), the response keys, the number of runs, the trigger codes and the
+texts of the dialog and the intro.
+
+Importing this module imports nothing but the standard library. main() imports
+psychopy's core and gui for the participant dialog, and numpy and our own
+modules in a background thread while the dialog waits for the experimenter.
+psychopy.visual and the window come after the dialog. The word list is read
+from its binary store (see wordstore.py), without pandas. To see where the
+time goes before the intro is on the screen:
+
+    python WordFace_exp_scanner_MEG.py --profile-startup
+
+The trial lists need neither psychopy nor a window, e.g. in plans.py and
+schedule.py:
+
+    experiment = engine.Experiment('MEG', {'ID': '0123', ...}, plan_folder=None)
+    trials = experiment.session_trials(1)
+"""
+
+import importlib
+import os
+import random
+import threading
+import time
+
+from faceword import trigger_table
+
+"""
+SET VARIABLES
+"""
+# Monitor parameters
+MON_DISTANCE = 60  # Distance between subject's eyes and monitor
+MON_SIZE = [1200, 1000]  # Pixel-dimensions of your monitor
+FRAME_RATE = 60 # Hz  [120]
+BEHAV_FIXATION = False  # True: show the fixation between the word and the face in the behavioural profiles too, delay_frames_before long. False keeps the old behavioural timing, where the face follows the word at once
+BUFFER_SCREENS = False  # the default of the profiles' buffer_screens: draw each static screen (word, face, fixation) from an offscreen buffer, see stimcache.py
+SAVE_FOLDER = 'faceWord_exp_data'  # Log is saved to this folder. The folder is created if it does not exist.
+PLAN_FOLDER = 'faceWord_exp_plans'  # Trial lists made before the experiment: python -m faceword.plans <script> <ID>
+
+#iMAGE FILES
+IMG_P = 'image_stim_p.png' #yellow positive (aka. happy)
+IMG_N = 'image_stim_n.png' #yellow negative (aka. fearful)
+DURATION = int(0.7*FRAME_RATE) # duration of the word and the face in seconds multiplied by 60 Hz and made into integer
+CONDITION = 'faceWord_exp' #Just a variable. If the script can run several exp. then this can be called in GUI. Not relevant here.
+
+# The word stimulus, and the image size and position. A stimulus per word and image file is built before the trigger, see stimcache.py
+TEXT_STYLE = dict(pos=[0, 0], height=0.7, alignHoriz='center')
+IMAGE_STYLE = dict(mask=None, pos=(0.0, 0.0), size=(14.0, 10.5), ori=1)
+INTRO_HEIGHT = 0.6 # height of the intro text in degrees
+
+#KEYS
+KEYS_QUIT = ['escape','q']  # Keys that quits the experiment
+KEYS_trigger = ['t'] # The MR scanner (or the experimenter) sends a "t" to notify that it is starting
+
+# Intro-dialogue. Get subject-id and other variables. The profiles change the options.
+DIALOG = {'ID':'','exp type':['fMRI','MEG'],'session':[1,2,3,4,5,6],'Scan day': ['Monday','Tuesday','Wednesday'],'gender':['male','female'],'age':''}
+DIALOG_ORDER = ['ID','exp type','Scan day', 'age', 'session','gender']
+
+# Imported in the background while the dialog is open
+PRELOAD = ('numpy', 'ppc', 'faceword.columnar', 'faceword.monitor', 'faceword.fliplog', 'faceword.responses',
+           'faceword.scoring', 'faceword.stimcache', 'faceword.schedule', 'faceword.sequence', 'faceword.plans',
+           'faceword.pulses', 'faceword.wordstore')
+
+
+"""
+PROFILES
+"""
+PROFILES = {}
+PROFILES['fMRI'] = dict(
+    script='WordFace_exp_scanner.py',
+    dialog={},
+    mon_width=20,  # Width of your monitor in cm
+    delays=(180,336), # different time intervals between stimuli mean 4.1 sec x 60 hz refresh rate =246, in order to make less predictable and increase power.
+    schedule=dict(pause_frame=60),  # pause trigger 1 sec into the fixation; responses are looked at after each trial, see schedule.py
+    sequence=dict(tr=1.0, lead=1.0),  # TR in sec and the fixation before the first word; the trial order is chosen for the efficiency of the priming contrast, see sequence.py
+    keys=dict(neg=['y'], pos=['b']),
+    runs=None,  # None: the session chosen in the dialog
+    buffer_screens=BUFFER_SCREENS,  # True: draw the screens from offscreen buffers, e.g. at 120 Hz, see stimcache.py
+    triggers=trigger_table.FMRI_STIMULUS_TRIGGERS,
+    pulse_ms=None,  # no response triggers
+    intro=[u'In this experiment you read words and look at faces',
+           u'Words can be used to predict facial expression',
+           u'Press button with INDEX finger if face is POSITIVE',
+           u'Press button with MIDDLE finger if face is NEGATIVE',
+           u'The experiment starts in a few moments'])
+PROFILES['MEG'] = dict(
+    script='WordFace_exp_scanner_MEG.py',
+    dialog={'Scan day': ['Tuesday','Wednesday','Friday']},
+    mon_width=20,
+    delays=(120,180),
+    schedule=dict(pause_frame=30, respond_from=2),  # pause trigger 30 frames into the fixation; responses from the third frame of the image on, see schedule.py
+    sequence=None,  # random order
+    keys=dict(neg=['2', 'y'], pos=['1', 'b']),
+    runs=6, # Number of sessions to loop over
+    buffer_screens=BUFFER_SCREENS,
+    triggers=trigger_table.STIMULUS_TRIGGERS,
+    pulse_ms=10, # Width of the response triggers in ms
+    intro=[u'In this experiment you will read words and look at faces',
+           u'Words can be used to predict facial expressions',
+           u'Press "b" key with INDEX finger if face is POSITIVE',
+           u'Press "y" key with MIDDLE finger if face is NEGATIVE',
+           u'',
+           u'Press "t" to start the experiment'])
+PROFILES['EEG_resp'] = dict(
+    PROFILES['MEG'],
+    script='WordFace_exp_scanner_EEG_resp.py',
+    dialog={'exp type': ['fMRI','EEG'], 'Scan day': ['Tuesday','Wednesday','Thursday']})
+PROFILES['behav'] = dict(
+    script='WordFace_exp_behav.py',
+    dialog={'exp type': ['fMRI','EEG','behavioral'], 'Scan day': ['Mon','Tue','Wed','Thu','Fri','Sat','Sun'],
+            'gender': ['female','male','other']},
+    mon_width=40,
+    delays=(120,180),
+    schedule=dict(triggers=False, fixation_before=BEHAV_FIXATION),  # no port. The old script drew the fixation before the face without flipping it, see BEHAV_FIXATION
+    sequence=None,
+    keys=dict(neg=['y'], pos=['b']),
+    runs=None,
+    buffer_screens=BUFFER_SCREENS,
+    triggers=None,  # no trigger codes in the log either
+    pulse_ms=None,
+    intro=[u'In this experiment you read words and look at faces',
+           u'Words can be used to predict facial expression',
+           u'Press "B" with INDEX finger if face is POSITIVE',
+           u'Press "Y" with MIDDLE finger if face is NEGATIVE',
+           u'The experiment starts when you press "T"'])
+PROFILES['behav_verbose'] = dict(
+    PROFILES['behav'],
+    script='WordFace_exp_behav_verbose.py',
+    triggers=trigger_table.FMRI_STIMULUS_TRIGGERS)  # the codes are logged, but not sent. The fMRI codes, like the ones left commented out in the old script
+
+
+def profile(name):
+    """The profile called :name:, e.g. 'MEG', or the profile of the script
+    :name:, e.g. 'WordFace_exp_scanner_MEG.py'."""
+    script = os.path.basename(name)
+    for key, settings in PROFILES.items():
+        if name == key or script == settings['script']:
+            return settings
+    raise KeyError('no profile %r, only %s' % (name, sorted(PROFILES)))
+
+
+class Startup(object):
+    """The time each step of the start-up takes, for --profile-startup."""
+    def __init__(self):
+        self.steps = []  # (name, seconds)
+        self.notes = {}  # name: text after the time
+        self._last = time.perf_counter()
+
+    def mark(self, name, note=''):
+        """Ends the step :name:, which started at the previous mark."""
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self.notes[name] = note
+        self._last = now
+
+    def report(self):
+        print('start-up:')
+        for name, seconds in self.steps:
+            print('    %-42s %8.1f ms  %s' % (name, seconds * 1000, self.notes[name]))
+        print('    %-42s %8.1f ms' % ('total', sum(seconds for name, seconds in self.steps) * 1000))
+
+
+class _Preload(object):
+    """Imports modules in a background thread, e.g. while the dialog is open."""
+    def __init__(self, modules):
+        self.modules = modules
+        self.seconds = None
+        self._thread = threading.Thread(target=self._run, name='preload')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        for name in self.modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass  # raised again where the module is needed
+        self.seconds = time.perf_counter() - start
+
+    def join(self):
+        self._thread.join()
+
+
+class Experiment(object):
+    def __init__(self, name, V, wordlist='wordlist.txt', plan_folder=PLAN_FOLDER, profile_startup=False):
+        """
+        A participant's run of the experiment. The window is opened by open_window().
+            :name: the profile, e.g. 'MEG' or 'WordFace_exp_scanner_MEG.py'
+            :V: (dict) the answers of the participant dialog
+            :wordlist: (str) the word list file
+            :plan_folder: (str) where the participant's plan is (see plans.py).
+                None to make the trials of every session
+            :profile_startup: (bool) also time what the stimulus cache saves,
+                before each session (see StimulusCache.report)
+        """
+        from faceword import plans
+
+        self.profile = profile(name)
+        self.V = V
+        self.delays = self.profile['delays']
+        self.KEYS_target = self.profile['keys']
+        self.wordlist = wordlist
+        self._store = None
+        codes = self.profile['triggers']
+        self.TRIGGERS = trigger_table.TriggerTable(IMG_P, IMG_N, self.KEYS_target, codes) if codes else None  # all trigger codes as lookup tables
+        self.plan = plans.load(plan_folder, V['ID'], self.profile['script'], self.word_store()) if plan_folder else None  # None if there is no plan. Refused if made from another word list
+        self.profile_startup = profile_startup
+        self.win = None
+
+    def sessions(self):
+        """The sessions to run: all runs of the profile, or the one chosen in the dialog."""
+        runs = self.profile['runs']
+        return list(range(1, runs + 1)) if runs else [int(self.V['session'])]
+
+    """ TRIAL LISTS """
+
+    def word_store(self):
+        """The word list, see wordstore.py"""
+        if self._store is None:
+            from faceword import wordstore
+            self._store = wordstore.load(self.wordlist)
+        return self._store
+
+    def words(self, session):
+        """The words of :session: in the word list, a tuple per column."""
+        return self.word_store().session(session)
+
+    def session_field(self, session):
+        """The session as the scripts logged it: a string for each run of
+        the MEG and EEG scripts, the number chosen in the dialog otherwise."""
+        return str(session) if self.profile['runs'] else session
+
+    def make_trial_list(self, condition, session, rng=random, search=False):
+        # Factorial design. :rng: draws the random numbers, e.g. a seeded random.Random.
+        # :search: picks the order for the fMRI contrast (see sequence.py), only when the plans are made
+        sample = rng.sample
+        words = self.words(session)
+        V = self.V
+        trial_list = []
+        for word in range(len(words)): # images
+            # define triggers and image stimulus based on word
+            label = words.label[word]
+            if label=='neu':
+                img= sample([IMG_P,IMG_N],1)[0] #image file
+            else:
+                img= IMG_P if label=='pos' else IMG_N #image file
+            delaysR= sample(self.delays,2)
+
+            # Add a dictionary for every trial
+            trial = {
+                'ID': V['ID'],
+                'age': V['age'],
+                'gender': V['gender'],
+                'scan day':V['Scan day'],
+                'condition': condition,
+                'session':self.session_field(session),
+                'word':words.word[word],
+                'word_label':label,
+                'word_score_pc':words.score_pc[word],
+                'word_score_warriner':words.score_warriner[word]}
+            if self.TRIGGERS is not None:
+                TRIG_W, TRIG_BEFORE, TRIG_I = self.TRIGGERS.stimulus[label, img] #trigger codes
+                trial['word_trigger'] = TRIG_W
+                trial['pause_trigger'] = TRIG_BEFORE
+            trial['pause_trigger_t'] = ''
+            trial['img'] = img
+            if self.TRIGGERS is not None:
+                trial['img_trigger'] = TRIG_I
+            trial.update({
+                'onset_word':'' ,# a place to note onsets
+                'offset_word': '',
+                'duration_measured_word':'',
+                'onset_img':'' ,# a place to note onsets
+                'offset_img': '',
+                'duration_measured_img':'',
+                'dropped_frames':'', # filled in from the flip times, see fliplog.py
+                'max_ifi':'',
+                'frames_word':'',
+                'frames_img':'',
+                'duration_frames': DURATION,
+                'delay_frames_before': delaysR[0],
+                'delay_frames_after': delaysR[1],
+                'key_events': '',  # every key of the response window as key:time, to score the trial again from the journal
+                'response': '',
+                'key_t':'',
+                'rt': '',
+                'correct_resp': '',
+                'congruency': ''  # filled in after the run, see scoring.py
+            })
+            trial_list += [trial]
+
+        # Randomize order, or keep the order which is best for the fMRI contrast
+        if search and self.profile['sequence'] is not None:
+            from faceword import sequence
+            trial_list = sequence.arrange(trial_list, FRAME_RATE, seed=rng.getrandbits(64), **self.profile['sequence'])
+        else:
+            trial_list = sample(trial_list, len(trial_list))
+
+        # Add trial numbers and return
+        for i, trial in enumerate(trial_list):
+            trial['no'] = i + 1  # start at 1 instead of 0
+        return trial_list
+
+    def session_trials(self, session, search=False):
+        """
+        The trials of a session: from the participant's plan, or if there is
+        none, made now by make_trial_list with the random numbers the plan would
+        have had (see plans.py). Without a plan the trials are shuffled unless
+        :search: is True, as when the plans are made: the search for the fMRI
+        order takes about a second, too long for the start of a session.
+        """
+        from faceword import plans
+        V = self.V
+        if self.plan is not None:
+            return self.plan.trials(session, {'ID': V['ID'], 'age': V['age'], 'gender': V['gender'], 'scan day': V['Scan day']})
+        rng = random.Random(plans.seed(V['ID'], session))  # its own, so the random module is left alone
+        return self.make_trial_list(CONDITION, session, rng, search)
+
+    """ WINDOW AND STIMULI """
+
+    def open_window(self):
+        """Opens the window and the keyboard, and sets up the trigger port."""
+        from psychopy import visual, monitors
+        from faceword import monitor
+        from faceword import responses
+
+        # Create psychopy window
+        my_monitor = monitors.Monitor('testMonitor', width=self.profile['mon_width'], distance=MON_DISTANCE)  # Create monitor object from the variables above. This is needed to control size of stimuli in degrees.
+        my_monitor.setSizePix(MON_SIZE)
+        self.win = visual.Window(monitor=my_monitor, units='deg', fullscr=True, allowGUI=False, color='black')  # Initiate psychopy Window as the object "win", using the myMon object from last line. Use degree as units!
+
+        #Prepare Fixation cross
+        self.stim_fix = visual.TextStim(self.win, '+')  # Fixation cross is just the character "+". Units are inherited from Window when not explicitly specified.
+        # Visual dot for check of stimulus in e.g. MEG
+        self.stimDot = visual.GratingStim(self.win, size=.5, tex=None, pos=(7, -6),
+                                          color=1, mask='circle', autoLog=False)
+
+        self.listener = responses.ResponseListener(self.KEYS_target['neg'] + self.KEYS_target['pos'], KEYS_QUIT)  # timestamps keys as they arrive, in its own thread
+        # Publish finished trials for the control room: python -m faceword.monitor faceWord_exp_data/live_monitor.mmap
+        self.live = monitor.TrialMonitor(SAVE_FOLDER + '/live_monitor.mmap')
+
+        self.setParallelData = None
+        if self.profile['schedule'].get('triggers', True):
+            from triggers import setParallelData
+            self.setParallelData = setParallelData
+
+    def show_intro(self):
+        # Loop over lines in Intro Text1
+        from psychopy import visual
+        ypos=4
+        xpos=0
+        for intro in self.profile['intro']:
+            ypos=ypos-1
+            introText1 = visual.TextStim(win=self.win, text=intro, pos=[xpos,ypos], height=INTRO_HEIGHT, alignHoriz='center')
+            introText1.draw()
+        self.win.flip()          # Show the stimuli on next monitor update and ...
+
+    def build_stimuli(self, trials):
+        """Builds the word and face stimuli of :trials:, see stimcache.py. Only
+        with --profile-startup is it timed too, as that takes a while and the
+        scanner may be running already."""
+        from faceword import stimcache
+        self.stimuli = stimcache.StimulusCache(self.win, [trial['word'] for trial in trials], [IMG_P, IMG_N], TEXT_STYLE, IMAGE_STYLE,
+                                               dot=self.stimDot, fixation=self.stim_fix, buffered=self.profile['buffer_screens'])
+        if self.profile_startup:
+            self.stimuli.report()
+
+    """ EXPERIMENTAL LOOP """
+
+    def start_run(self, session, trials):
+        """Opens the logs of a run."""
+        import ppc
+        from faceword import columnar
+        from faceword import fliplog
+        from faceword import journal
+        from faceword import pulses
+
+        # Prepare a csv log-file using the ppc3 script
+        ID_sess = str(self.V['ID']) + '_sess_' + str(session)
+        self.writer = ppc.csv_writer(ID_sess, folder=SAVE_FOLDER, threaded=True, journal=journal.TrialJournal, monitor=self.live)  # writer.write(trial) publishes the trial and only queues it; a background thread saves it. Recover a crashed session with journal.py
+        log = self.writer.save_file[:-len('.csv')]
+        try:
+            self.columns = columnar.ColumnWriter(trials[0], log + '.parquet')  # typed, columnar copy of the log for analysis
+        except ImportError:
+            print('WARNING: pyarrow is not installed, so there is no parquet copy of the log, only the csv file')
+            self.columns = None
+        self.flip_log = fliplog.FlipRecorder(FRAME_RATE, log + '.flips.npy', frames=len(trials) * (2 * DURATION + 2 * max(self.delays)))  # time of every flip, to catch dropped frames
+        self.trigger_pulses = None
+        self.set_trigger = self.setParallelData  # what the flips call to set the stimulus triggers
+        if self.profile['pulse_ms'] is not None:
+            from psychopy import core
+            self.trigger_pulses = pulses.PulseScheduler(self.setParallelData, log + '.pulses.csv', width_ms=self.profile['pulse_ms'],
+                                                        clock=core.monotonicClock.getTime,
+                                                        threaded=not getattr(core.monotonicClock, 'virtual', False))  # response triggers of exactly pulse_ms, sent from their own thread
+            self.set_trigger = self.trigger_pulses.stimulus  # the scheduler is the only one writing the port: a stimulus code goes up on its flip, cutting a pulse short if one is up
+
+    def save_trials(self, trials, exp_start):
+        """
+        Scores the responses of the finished trials of a run all at once (see
+        scoring.py). The csv log, which got the trials unscored as they
+        finished, is rewritten with the scored ones and publishes them again as
+        updates, so the monitor shows the responses, and the parquet log (if
+        pyarrow is installed) gets them.
+        """
+        from faceword import scoring
+        scoring.score(trials, self.listener.events, self.listener.windows, self.KEYS_target, IMG_P, exp_start)
+        self.writer.close()
+        self.writer.rewrite(trials)  # the journal gets the scored rows too; the raw keys stay in key_events
+        if self.columns is not None:
+            for trial in trials:
+                self.columns.write(trial)
+
+    def end_run(self, trials, exp_start):
+        """Waits for the writer thread to save the run's log, saves the
+        scored trials and closes the logs."""
+        self.save_trials(trials, exp_start)
+        if self.columns is not None:
+            self.columns.close()
+        self.flip_log.close()
+        if self.trigger_pulses is not None:
+            self.trigger_pulses.close()
+        if self.setParallelData is not None:
+            from triggers import export_events
+            export_events(self.writer.save_file[:-len('.csv')] + '_events.tsv', exp_start, self.TRIGGERS.names())  # BIDS events of every trigger sent, with the profile's codes
+
+    def quit(self, done, exp_start):
+        """Saves the finished trials of the run and quits everything."""
+        from psychopy import core
+        self.end_run(done, exp_start)  # save what is queued before quitting
+        self.listener.stop()
+        self.live.close()
+        self.win.close()
+        core.quit()
+
+    def run_condition(self, trials, exp_start):
+        """
+        Runs a block of trials. This is the presentation of stimuli,
+        collection of responses and saving the trial. Returns the finished
+        trials, to be scored by end_run()
+        """
+        from psychopy import core
+        from faceword import schedule
+
+        win = self.win
+        listener = self.listener
+        flip_log = self.flip_log
+        # One row per frame with the screen, trigger code and what else happens on that flip, see schedule.py
+        frames, screens = schedule.compile_run(trials, **self.profile['schedule'])
+        screens = self.stimuli.screens(screens)
+        # Only the key presses are recorded during the run, and scored after it
+        listener.reset()
+        done = []
+        for i, phase, screen, code, flags in schedule.rows(frames):
+            if flags & schedule.TRIAL_START:
+                trial = trials[i]
+                flip_log.begin(trial['no'])
+                time_flip_word=core.monotonicClock.getTime() #onset of stimulus
+                pause_trigger_t = None
+                no_key_yet = 0
+            if flags & schedule.WORD_OFFSET:
+                offset_word = core.monotonicClock.getTime()  # offset of stimulus
+                self.writer.flush()  # non-blocking: the writer thread saves the previous trials during fixation
+            if flags & schedule.PAUSE:
+                pause_trigger_t = core.monotonicClock.getTime()
+            if flags & schedule.IMG_ONSET:
+                time_flip_img=core.monotonicClock.getTime() #onset of stimulus
+                listener.open_window(time_flip_img)  # only keys pressed from now on are responses to this image
+            if flags & schedule.IMG_OFFSET:
+                offset_img = core.monotonicClock.getTime()  # offset of stimulus
+
+            screens[screen].draw()
+            if code >= 0:
+                win.callOnFlip(self.set_trigger, code)  # pull trigger up, or down again (0) on the flip after
+            if flags & schedule.RESPOND:
+                if no_key_yet == 0 and listener.check():  # the first response key since image onset, timestamped at keypress
+                    no_key_yet = 1
+                    if self.trigger_pulses is not None:
+                        key = listener.response[0]
+                        self.trigger_pulses.pulse(self.TRIGGERS.response[trial['word_label'], trial['img'], key][1])  # 100 = correct, 200 = incorrect; +10 after a neutral word; XX1 pos-response, XX2 neg-response
+                if listener.quit:  # Quit everything if quit-key was pressed
+                    self.quit(done, exp_start)
+            flip_log.flip(win, phase)
+
+            if flags & schedule.TRIAL_END:
+                window_end = core.monotonicClock.getTime()
+                listener.close_window(window_end)  # the key presses from image onset to the end of the fixation are its responses
+
+                #Log values
+                trial['onset_word']=time_flip_word-exp_start
+                trial['offset_word'] = offset_word-exp_start
+                trial['duration_measured_word']=offset_word-time_flip_word
+                trial['onset_img']=time_flip_img-exp_start
+                trial['offset_img'] = offset_img-exp_start
+                trial['duration_measured_img']=offset_img-time_flip_img
+                if pause_trigger_t is not None:
+                    trial['pause_trigger_t']=pause_trigger_t-exp_start
+                trial['key_events'] = ' '.join('%s:%.6f' % (key, t - exp_start) for key, t in listener.keys_between(time_flip_img, window_end))
+
+                if listener.quit:  # Quit everything if quit-key was pressed
+                    self.quit(done, exp_start)
+
+                # Save and publish the trial with its raw keys now. The responses are scored after the run
+                trial.update(flip_log.summary())  # dropped frames and true stimulus durations
+                self.writer.write(trial)  # publishes it to the live monitor too
+                done.append(trial)
+        return done
+
+    def run(self):
+        """
+        Runs the sessions: the intro, then await the scanner trigger and run
+        the trials, for each session.
+        """
+        from psychopy import core, event
+
+        for session in self.sessions():
+            self.show_intro()
+
+            # Take this session's trials from the plan and build their stimuli while the intro is on the screen
+            trials = self.session_trials(session)
+            self.build_stimuli(trials)
+            self.start_run(session, trials)
+
+            #Wait for scanner trigger "t" to continue
+            event.waitKeys(keyList=KEYS_trigger)
+            exp_start=core.monotonicClock.getTime()
+
+            #1 sec of fixation cross before we start
+            for frame in range(1*FRAME_RATE):
+                self.stim_fix.draw()
+                self.win.flip()
+
+            # Run the actual session
+            done = self.run_condition(trials, exp_start)
+            self.end_run(done, exp_start)
+
+        self.listener.stop()
+        self.live.close()
+        #Close the experimental window
+        self.win.close()
+        core.quit()
+
+
+def main(name, profile_startup=False):
+    """
+    Runs the experiment with the profile :name:, e.g. 'MEG'.
+        :profile_startup: (bool) print how long the imports, the dialog and
+            the window took before the intro is shown, and what the stimulus
+            cache saves
+    """
+    startup = Startup()
+    from psychopy import core, gui
+    startup.mark('import psychopy core, gui')
+
+    # Get subject-id and other variables, and import the rest meanwhile
+    preload = _Preload(PRELOAD)
+    V = dict(DIALOG, **profile(name)['dialog'])  # V for "variables"
+    if not gui.DlgFromDict(V, order=DIALOG_ORDER).OK: # dialog box; order is a list of keys
+        core.quit()
+    startup.mark('participant dialog')
+    preload.join()
+    startup.mark('waiting for the background imports', '(%.1f ms in all: %s)' % (preload.seconds * 1000, ', '.join(PRELOAD)))
+
+    experiment = Experiment(name, V, profile_startup=profile_startup)
+    startup.mark('plan', '(none)' if experiment.plan is None else '')
+    if experiment.plan is None and experiment.profile['sequence'] is not None:
+        print('WARNING: no plan for %s, so the trials are shuffled instead of ordered for the fMRI contrast. '
+              'Make the plan beforehand: python -m faceword.plans %s %s' % (V['ID'], experiment.profile['script'], V['ID']))
+    from psychopy import visual, event, monitors  # imported here only to time them apart from the window
+    startup.mark('import psychopy visual, event, monitors')
+    experiment.open_window()
+    startup.mark('window, keyboard and trigger port')
+    if profile_startup:
+        startup.report()
+
+    experiment.run()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Records the time of every win.flip() during a run, to catch dropped frames.
+
+run_condition counts frames (for frame in range(trial['duration_frames'])),
+so if the computer misses a refresh, a 0.7 s word is silently shown for
+longer. With the recorder, every flip in the stimulus and fixation loops is
+timestamped into a preallocated numpy buffer, and each trial gets these
+columns in the log:
+
+    dropped_frames  refreshes missed during the trial (incl. the gap from the
+                    last flip of the previous trial)
+    max_ifi         longest interval between two flips in the trial (seconds)
+    frames_word     how many refreshes the word was really on the screen
+    frames_img      how many refreshes the image was really on the screen
+
+In the experiment script:
+
+    flip_log = fliplog.FlipRecorder(FRAME_RATE, 'data/0001_sess_1.flips.npy', frames=30000)
+    flip_log.begin(trial['no'])        # at the start of a trial
+    flip_log.flip(win, fliplog.WORD)   # instead of win.flip()
+    trial.update(flip_log.summary())   # before writer.write(trial)
+    flip_log.close()                   # after the run: saves the flips
+
+The .npy file holds one row per flip: time (as returned by win.flip(), i.e.
+core.monotonicClock), trial number and phase. Load it with fliplog.load().
+"""
+
+import numpy as np
+
+# Phases of a trial
+WORD, FIX_BEFORE, IMG, FIX_AFTER = 1, 2, 3, 4
+DTYPE = np.dtype([('t', '<f8'), ('trial', '<u2'), ('phase', 'u1')])
+
+
+class FlipRecorder(object):
+    def __init__(self, frame_rate, filename, frames=30000):
+        """
+        :frame_rate: (float) the refresh rate of the monitor in Hz
+        :filename: (str) the .npy file to save the flips to on close()
+        :frames: (int) room for this many flips. Make it at least the number
+            of frames in a run; the buffer grows if it runs out, but that
+            costs time in the middle of a trial.
+        """
+        self.frame_rate = frame_rate
+        self.filename = filename
+        self.n = 0  # number of flips recorded
+        self._trial = 0
+        self._start = 0  # index of the first flip of the current trial
+        self._allocate(frames)
+
+    def _allocate(self, frames):
+        flips = np.zeros(frames, DTYPE)
+        if self.n:
+            flips[:self.n] = self.flips[:self.n]
+        self.flips = flips
+        self._times, self._trials, self._phases = flips['t'], flips['trial'], flips['phase']
+
+    def begin(self, no):
+        """Starts a new trial. :no: the trial number"""
+        self._trial = no
+        self._start = self.n
+
+    def flip(self, win, phase):
+        """Flips the window and records the time. Returns the flip time."""
+        t = win.flip()
+        n = self.n
+        if n == len(self._times):
+            self._allocate(2 * n)
+        self._times[n] = t
+        self._trials[n] = self._trial
+        self._phases[n] = phase
+        self.n = n + 1
+        return t
+
+    def summary(self):
+        """
+        Returns the per-trial columns for the trial since begin() as a
+        dictionary. Values which cannot be measured are '' like in the log.
+        """
+        start, end = self._start, self.n
+        times = self._times[max(start - 1, 0):end]  # from the last flip of the previous trial
+        intervals = np.diff(times)
+        refreshes = np.rint(intervals * self.frame_rate)
+        result = {
+            'dropped_frames': int(np.maximum(refreshes - 1, 0).sum()),
+            'max_ifi': float(intervals.max()) if len(intervals) else '',
+        }
+
+        # A stimulus is on the screen from its first flip until the flip that replaces it
+        phases = self._phases[start:end]
+        for phase, name in ((WORD, 'frames_word'), (IMG, 'frames_img')):
+            shown = np.flatnonzero(phases == phase)
+            result[name] = ''
+            if len(shown) and start + shown[-1] + 1 < end:
+                onset, offset = self._times[start + shown[0]], self._times[start + shown[-1] + 1]
+                result[name] = int(round((offset - onset) * self.frame_rate))
+        return result
+
+    def close(self):
+        """Saves the recorded flips. Call once after the run."""
+        np.save(self.filename, self.flips[:self.n])
+
+
+def load(filename):
+    """Loads the flips saved by FlipRecorder as a numpy record array with
+    the fields t, trial and phase."""
+    return np.load(filename).view(np.recarray)
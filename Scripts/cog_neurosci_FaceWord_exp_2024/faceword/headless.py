@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runs the experiment scripts without a screen, keyboard or parallel port, as
+fast as the computer can, e.g. for dry runs, throughput tests and CI.
+
+psychopy is replaced by a headless stand-in with a virtual clock:
+core.monotonicClock (and every core.Clock) only moves when the window flips,
+by exactly one refresh per flip, or when core.wait() is called. So a 5 minute
+session finishes in well under a second, but every time in the logs is what
+it would have been on a perfect monitor. The scripts are run unchanged and
+write their real csv, journal, parquet and flip logs. The parallel port
+records every code it is set to, with its virtual time.
+
+Nobody presses any keys unless told to. The scanner trigger ("t") and other
+waitKeys() calls are answered at once. To answer trials, pass a responder,
+which is called after every flip and can look at the stimuli on the screen
+(session.shown) and press keys:
+
+    from faceword import headless
+
+    def press_b(session, t):
+        if any(getattr(stim, 'image', None) for stim in session.shown):
+            session.press('b', t + 0.5)
+
+    session = headless.run('WordFace_exp_scanner_MEG.py', info={'ID': 'dry'}, responder=press_b)
+    session.triggers   # [(t, code), ...] incl. the 0's that pull the trigger down
+    session.logs()     # the csv logs of the trials the script wrote
+
+With Session(realtime=True) the clocks run on time.perf_counter() instead,
+and flips and core.wait() return at once: the time in the logs is then the
+time our own code took, e.g. for benchmark.py.
+
+From the command line:
+
+    python -m faceword.headless WordFace_exp_scanner.py WordFace_exp_behav.py
+"""
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the experiment folder, above this package
+SCRIPTS = ('WordFace_exp_scanner.py', 'WordFace_exp_scanner_MEG.py',
+           'WordFace_exp_scanner_EEG_resp.py', 'WordFace_exp_behav.py', 'WordFace_exp_behav_verbose.py')
+INPUT_FILES = ('wordlist.txt', 'image_stim_p.png', 'image_stim_n.png')  # what the scripts open from the working directory
+
+_session = None  # the session the stand-in modules are currently bound to
+
+
+class Session(object):
+    def __init__(self, refresh=60., info=None, responder=None, realtime=False, parallel_port=True):
+        """
+        The virtual clock, keyboard and parallel port of one headless run.
+            :refresh: (float) the refresh rate of the virtual monitor in Hz
+            :info: (dict) answers for gui.DlgFromDict, e.g. {'ID': 'dry', 'session': 2}.
+                Other fields get the first option or 'headless'.
+            :responder: optionally a function(session, t) called after every flip
+            :realtime: (bool) run the clocks on time.perf_counter() instead of
+                the virtual time, which flips and core.wait() then leave alone
+            :parallel_port: (bool) False for a computer without one: setData
+                raises NotImplementedError, so triggers.py fakes the triggers
+        """
+        self.refresh = refresh
+        self.info = info or {}
+        self.responder = responder
+        self.realtime = realtime
+        self.parallel_port = parallel_port
+        self._start = time.perf_counter()
+        self.now = 0.0  # virtual time in seconds
+        self.flips = 0
+        self.shown = []  # the stimuli drawn for the last flip, i.e. what is on the screen
+        self._drawn = []
+        self.triggers = []  # (t, code) for every setData on the parallel port
+        self._keys = []  # (t, key) pressed but not yet collected
+        self.workdir = None
+        self.wall = None  # real seconds the run took
+
+    def press(self, key, t=None):
+        """Presses a key now, or at the virtual time :t:"""
+        self._keys += [(self.now if t is None else t, key)]
+        self._keys.sort()
+
+    @property
+    def now(self):
+        """The time in seconds since the session started, virtual or real."""
+        return time.perf_counter() - self._start if self.realtime else self._now
+
+    @now.setter
+    def now(self, t):
+        self._now = t
+
+    def advance(self, seconds):
+        """Moves the virtual clock on. A real-time clock moves on by itself."""
+        if not self.realtime:
+            self._now += seconds
+
+    def logs(self, pattern='*).csv'):
+        """The files the script wrote. Default is the csv logs of the trials,
+        which end in the date, e.g. "0001_sess_1 (2024-03-05 10-02-33).csv".
+        Others with e.g. session.logs('*.parquet')"""
+        return sorted(glob.glob(os.path.join(self.workdir, '**', pattern), recursive=True))
+
+    # The keyboard, as seen from psychopy.event
+    def _get_keys(self, keyList=None, timeStamped=False):
+        keys, waiting = [], []
+        for t, key in self._keys:
+            if t <= self.now and (keyList is None or key in keyList):
+                keys += [[key, t] if timeStamped else key]
+            else:
+                waiting += [(t, key)]
+        self._keys = waiting
+        return keys
+
+    def _clear_events(self, eventType=None):
+        self._keys = [(t, key) for t, key in self._keys if t > self.now]
+
+    def _wait_keys(self, maxWait=float('inf'), keyList=None, timeStamped=False, **kwargs):
+        for t, key in self._keys:
+            if keyList is None or key in keyList:
+                self.advance(max(t - self.now, 0.0))
+                return self._get_keys([key], timeStamped)[:1]
+        key = keyList[0] if keyList else 'space'  # nobody is waiting for us: press the first key at once
+        return [[key, self.now] if timeStamped else key]
+
+
+"""
+PSYCHOPY STAND-IN
+"""
+class _Clock(object):
+    def __init__(self):
+        self._start = _session.now
+
+    def getTime(self):
+        return _session.now - self._start
+
+    def reset(self, newT=0.0):
+        self._start = _session.now + newT
+
+
+class _MonotonicClock(_Clock):
+    """core.monotonicClock. virtual tells engine.py to send the response
+    pulses without a thread (see pulses.py), unless the clock is real."""
+    def __init__(self):
+        self._start = 0.0
+
+    @property
+    def virtual(self):
+        return not _session.realtime
+
+    def reset(self, newT=0.0):
+        pass
+
+
+class _Stim(object):
+    def __init__(self, win=None, text='', **kwargs):
+        self.win = win
+        self.text = text
+        self.__dict__.update(kwargs)
+
+    def draw(self, win=None):
+        _session._drawn += [self]
+
+
+class _BufferImageStim(_Stim):
+    """Shows what its stimuli would have shown, so responders can look at it."""
+    def __init__(self, win=None, stim=(), **kwargs):
+        _Stim.__init__(self, win)
+        self.stim = list(stim)
+        for child in self.stim:
+            self.text = self.text or child.text
+            if getattr(child, 'image', None):
+                self.image = child.image
+
+
+class _Window(_Stim):
+    def __init__(self, *args, **kwargs):
+        self._callbacks = []
+        self.__dict__.update(kwargs)
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._callbacks += [(function, args, kwargs)]
+
+    def flip(self, clearBuffer=True):
+        _session.advance(1.0 / _session.refresh)
+        _session.flips += 1
+        _session.shown, _session._drawn = _session._drawn, []
+        callbacks, self._callbacks = self._callbacks, []
+        for function, args, kwargs in callbacks:
+            function(*args, **kwargs)
+        if _session.responder:
+            _session.responder(_session, _session.now)
+        return _session.now
+
+    def clearBuffer(self, color=True, depth=False, stencil=False):
+        _session._drawn = []
+
+    def getActualFrameRate(self, *args, **kwargs):
+        return _session.refresh
+
+    def close(self):
+        pass
+
+
+class _Monitor(object):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def setSizePix(self, size):
+        pass
+
+
+class _Dialog(object):
+    def __init__(self, dictionary, order=None, **kwargs):
+        for name, value in dictionary.items():
+            if name in _session.info:
+                dictionary[name] = _session.info[name]
+            else:
+                dictionary[name] = value[0] if isinstance(value, list) else value or 'headless'
+        self.OK = True
+
+
+class _KeyPress(object):
+    def __init__(self, name, tDown):
+        self.name = name
+        self.tDown = tDown
+        self.rt = tDown
+
+
+class _Keyboard(object):
+    """psychopy.hardware.keyboard.Keyboard. virtual tells responses.py that
+    there is no point in reading it from a thread: its time only moves on flips."""
+    virtual = True
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def getKeys(self, keyList=None, waitRelease=True, clear=True):
+        return [_KeyPress(key, t) for key, t in _session._get_keys(keyList, timeStamped=True)]
+
+    def clearEvents(self, eventType=None):
+        _session._clear_events()
+
+
+class _ParallelPort(object):
+    def __init__(self, address=None):
+        self.address = address
+
+    def setData(self, code):
+        if not _session.parallel_port:
+            raise NotImplementedError  # like psychopy on a computer without a parallel port
+        _session.triggers += [(_session.now, code)]
+
+
+def _wait(secs, hogCPUperiod=0.2):
+    _session.advance(secs)
+
+
+def _quit():
+    raise SystemExit
+
+
+def _run_script(path):
+    """Runs a script as __main__, like python would. Afterwards its globals
+    are emptied like at the end of a real process, which closes (and so
+    flushes) the files the script left open, e.g. a csv_writer without flush()."""
+    main = types.ModuleType('__main__')
+    main.__file__ = path
+    saved_main = sys.modules.get('__main__')
+    sys.modules['__main__'] = main
+    try:
+        with open(path, 'rb') as f:
+            code = compile(f.read(), path, 'exec')
+        exec(code, main.__dict__)
+    finally:
+        sys.modules['__main__'] = saved_main
+        main.__dict__.clear()
+
+
+def install(session):
+    """Puts the stand-in psychopy modules, bound to :session:, in sys.modules."""
+    global _session
+    _session = session
+    modules = {
+        'core': dict(Clock=_Clock, monotonicClock=_MonotonicClock(), getTime=lambda: _session.now,
+                     wait=_wait, quit=_quit),
+        'visual': dict(Window=_Window, TextStim=_Stim, ImageStim=_Stim, GratingStim=_Stim, BufferImageStim=_BufferImageStim),
+        'event': dict(getKeys=session._get_keys, clearEvents=session._clear_events, waitKeys=session._wait_keys),
+        'gui': dict(DlgFromDict=_Dialog),
+        'monitors': dict(Monitor=_Monitor),
+        'parallel': dict(ParallelPort=_ParallelPort),
+        'hardware': dict(__path__=[]),
+        'hardware.keyboard': dict(Keyboard=_Keyboard, KeyPress=_KeyPress),
+    }
+    psychopy = types.ModuleType('psychopy')
+    psychopy.__path__ = []  # a package, so "from psychopy import core" works
+    sys.modules['psychopy'] = psychopy
+    for name, attributes in modules.items():
+        module = types.ModuleType('psychopy.' + name)
+        module.__dict__.update(attributes)
+        package, _, attribute = ('psychopy.' + name).rpartition('.')
+        setattr(sys.modules[package], attribute, module)
+        sys.modules['psychopy.' + name] = module
+    sys.modules.pop('triggers', None)  # so it opens the new session's parallel port
+
+
+def run(script, workdir=None, refresh=60., info=None, responder=None):
+    """
+    Runs an experiment script from start to end in a headless session and
+    returns the Session with its triggers, flips and virtual duration (.now).
+        :script: (str) e.g. 'WordFace_exp_scanner.py', relative to this folder
+        :workdir: (str) where the script runs and writes its logs. Default is
+            a new temporary folder. The word list and images are copied there.
+        :refresh: (float) the refresh rate of the virtual monitor in Hz
+        :info: (dict) answers for the participant info dialog
+        :responder: optionally a function(session, t) called after every flip
+    """
+    session = Session(refresh, info, responder)
+    session.workdir = workdir or tempfile.mkdtemp(prefix='faceword_headless_')
+    if not os.path.isdir(session.workdir):
+        os.makedirs(session.workdir)
+    for filename in INPUT_FILES:
+        shutil.copy(os.path.join(HERE, filename), session.workdir)
+
+    saved_modules = dict((name, module) for name, module in sys.modules.items()
+                         if name == 'psychopy' or name.startswith('psychopy.') or name == 'triggers')
+    cwd = os.getcwd()
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    install(session)
+    os.chdir(session.workdir)
+    start = time.perf_counter()
+    try:
+        _run_script(os.path.join(HERE, script))
+    except SystemExit:  # core.quit() at the end of the script
+        pass
+    finally:
+        session.wall = time.perf_counter() - start
+        os.chdir(cwd)
+        for name in [name for name in sys.modules if name == 'psychopy' or name.startswith('psychopy.') or name == 'triggers']:
+            del sys.modules[name]
+        sys.modules.update(saved_modules)
+    return session
+
+
+if __name__ == '__main__':
+    for script in sys.argv[1:] or SCRIPTS:
+        session = run(script)
+        codes = [code for t, code in session.triggers if code]
+        print('%s: %.1f s of experiment in %.2f s, %i flips, %i triggers, logs in %s' % (
+            script, session.now, session.wall, session.flips, len(codes), session.workdir))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A crash-safe, append-only journal of the trials written by ppc.csv_writer.
+
+Every trial is appended to the journal as one binary record the moment it is
+written, and the journal is fsync'ed in groups when csv_writer.flush() is
+called (the scripts do that at the start of the inter-trial fixation). If the
+experiment crashes, the csv file can be rebuilt from the journal, exactly as
+csv_writer would have written it.
+
+Each record is a 9 byte header followed by the payload:
+
+    kind (1 byte)  length (4 bytes)  crc32 (4 bytes)  payload (length bytes)
+
+kind is HEADER (the csv fieldnames) or ROW (the csv values, already converted
+to text like the csv module does). The payload is a UTF-8 JSON list of strings.
+A record which was only half-written when the computer died fails the length
+or crc check and everything from there on is ignored.
+
+When csv_writer.rewrite() replaces the rows of the csv file, e.g. by the
+scored trials after a run, the journal gets the new rows too: a REPLACE record
+(the fieldnames), the rows, and a DONE record (the number of rows). The
+recovered csv is the rows of the last replacement with its DONE record, or
+the rows as they were written if there is none. So the journal and the csv
+file agree, and a crash half way through a replacement leaves the rows before
+it.
+
+Turn it on in the experiment script by giving csv_writer the journal class
+(ppc.py itself does not import this package):
+
+    from faceword import journal
+    writer = ppc.csv_writer(ID_sess, folder=SAVE_FOLDER, journal=journal.TrialJournal)
+
+and recover after a crash from the command line:
+
+    python -m faceword.journal "faceWord_exp_data/0001_sess_1 (2024-03-05 10-02-33).journal"
+"""
+
+import csv
+import json
+import os
+import struct
+import sys
+import zlib
+
+HEADER = 1
+ROW = 2
+REPLACE = 3
+DONE = 4
+_RECORD = struct.Struct('<BII')  # kind, payload length, crc32 of payload
+
+
+class TrialJournal(object):
+    def __init__(self, filename):
+        """
+        Opens (or continues) a journal file for appending.
+            :filename: (str) e.g. "data/subj1 (2013-12-28 09-53-04).journal"
+        """
+        self.filename = filename
+        self._file = open(filename, 'ab', buffering=0)  # unbuffered: every record goes to the OS at once
+        self._pending = False
+
+    def _append(self, kind, values):
+        payload = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._file.write(_RECORD.pack(kind, len(payload), zlib.crc32(payload) & 0xffffffff) + payload)
+        self._pending = True
+
+    def write_header(self, fieldnames):
+        """Records the csv header. :fieldnames: list of column names"""
+        self._append(HEADER, list(fieldnames))
+
+    def write_row(self, fieldnames, trial):
+        """Records a trial as the csv row DictWriter would write for it."""
+        self._append(ROW, [_to_text(trial.get(key, '')) for key in fieldnames])
+
+    def rewrite(self, fieldnames, trials):
+        """Records that all rows so far are replaced by :trials:, like
+        csv_writer.rewrite() does with the csv file, and commits it."""
+        self._append(REPLACE, list(fieldnames))
+        for trial in trials:
+            self.write_row(fieldnames, trial)
+        self._append(DONE, [str(len(trials))])
+        self.commit()
+
+    def commit(self):
+        """Forces everything appended since the last commit to the disk.
+        Only costs an fsync if something was appended."""
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = False
+
+    def close(self):
+        self.commit()
+        self._file.close()
+
+
+def _to_text(value):
+    """What the csv module writes for a value."""
+    return '' if value is None else str(value)
+
+
+def read(filename):
+    """
+    Yields (kind, values) for every intact record in a journal. Stops quietly
+    at the first truncated or corrupted record, i.e. where a crash happened.
+    """
+    with open(filename, 'rb') as f:
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            kind, length, crc = _RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) & 0xffffffff != crc or kind not in (HEADER, ROW, REPLACE, DONE):
+                return
+            yield kind, json.loads(payload.decode('utf-8'))
+
+
+def recover(filename, csv_file=None):
+    """
+    Rebuilds the csv file from a journal and returns its filename: the rows
+    of the last finished replacement, or else the rows as they were written.
+        :filename: (str) the .journal file
+        :csv_file: (str) where to write the csv. Defaults to the journal's
+            name ending in ".recovered.csv" so a partial csv is not overwritten.
+    """
+    if csv_file is None:
+        csv_file = os.path.splitext(filename)[0] + '.recovered.csv'
+
+    header, rows = None, []
+    replacement = None  # (fieldnames, rows) of a replacement without its DONE record yet
+    for kind, values in read(filename):
+        if kind == HEADER:
+            header = values
+        elif kind == REPLACE:
+            replacement = (values, [])
+        elif kind == DONE:
+            header, rows = replacement
+            replacement = None
+        elif replacement is not None:
+            replacement[1].append(values)
+        else:
+            rows.append(values)
+
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)  # same dialect as csv.DictWriter in ppc.csv_writer
+        if header is not None:
+            writer.writerow(header)
+        writer.writerows(rows)
+    print('recovered', len(rows), 'trials from', filename, 'to', csv_file)
+    return csv_file
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        sys.exit('usage: python -m faceword.journal <file.journal> [<out.csv>]')
+    recover(*sys.argv[1:])
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live view of a running session from another process, e.g. in the control room.
+
+The experiment publishes every finished trial into a fixed-size ring buffer in
+a memory-mapped file. Publishing is a couple of struct.pack_into calls into
+memory: no file I/O, no locks, so it costs the stimulus PC a few microseconds.
+A reader attaches to the same file and shows the progress.
+
+In the experiment script:
+
+    live = monitor.TrialMonitor(SAVE_FOLDER + '/live_monitor.mmap')
+    writer = ppc.csv_writer(ID_sess, folder=SAVE_FOLDER, monitor=live)  # publishes on write()
+
+The trials are published unscored as they finish. When the run ends and they
+are scored, writer.rewrite() publishes them again as updates (update=True):
+the same trials, now with their responses, not new ones.
+
+In the control room (the file must be reachable, e.g. a shared folder):
+
+    python -m faceword.monitor faceWord_exp_data/live_monitor.mmap
+
+Layout: a 32 byte header (magic, number of slots, slot size, start time, and
+the sequence counter = number of trials published), then the slots. There is
+one writer. Each slot is guarded by its own sequence number (a seqlock): it is
+odd while the slot is being written and even when done, so a reader can tell
+a torn read and skip it.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+
+MAGIC = b'FWMON002'
+_HEADER = struct.Struct('<8sIIdQ')  # magic, slots, slot size, start time, sequence
+_SEQ = struct.Struct('<Q')
+_SEQ_OFFSET = 24  # offset of the sequence counter in the header
+_RECORD = struct.Struct('<Qiiddddddb?d8s24s4s')
+FIELDS = ('no', 'session', 'onset_word', 'onset_img', 'duration_measured_word', 'duration_measured_img',
+          'key_t', 'rt', 'correct_resp', 'update', 'published', 'response', 'word', 'word_label')
+NAN = float('nan')
+
+
+def _number(value, kind=float, missing=NAN):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):  # '' before a response was given
+        return missing
+
+
+class TrialMonitor(object):
+    def __init__(self, filename, slots=512):
+        """
+        Creates the ring buffer file, or resets it if it is already there.
+            :filename: (str) the memory-mapped file
+            :slots: (int) how many trials the ring holds before it wraps around
+        """
+        self.filename = filename
+        self.slots = slots
+        size = _HEADER.size + slots * _RECORD.size
+        folder = os.path.dirname(filename)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        if not os.path.exists(filename) or os.path.getsize(filename) != size:
+            with open(filename, 'wb') as f:
+                f.write(b'\0' * size)
+        self._file = open(filename, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+        _HEADER.pack_into(self._map, 0, MAGIC, slots, _RECORD.size, time.time(), 0)
+        self.sequence = 0
+
+    def publish(self, trial, update=False):
+        """
+        Puts a finished trial in the ring.
+            :trial: a dictionary
+            :update: (bool) True if the trial was published before and this
+                is the same trial again, e.g. scored
+        """
+        n = self.sequence
+        offset = _HEADER.size + (n % self.slots) * _RECORD.size
+        _SEQ.pack_into(self._map, offset, 2 * n + 1)  # slot is being written
+        _RECORD.pack_into(
+            self._map, offset, 2 * n + 1,
+            _number(trial.get('no'), int, 0), _number(trial.get('session'), int, 0),
+            _number(trial.get('onset_word')), _number(trial.get('onset_img')),
+            _number(trial.get('duration_measured_word')), _number(trial.get('duration_measured_img')),
+            _number(trial.get('key_t')), _number(trial.get('rt')),
+            _number(trial.get('correct_resp'), int, -1), update, time.time(),
+            str(trial.get('response', '')).encode('utf-8')[:8],
+            str(trial.get('word', '')).encode('utf-8')[:24],
+            str(trial.get('word_label', '')).encode('utf-8')[:4])
+        _SEQ.pack_into(self._map, offset, 2 * n + 2)  # slot is done
+        self.sequence = n + 1
+        _SEQ.pack_into(self._map, _SEQ_OFFSET, self.sequence)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class MonitorReader(object):
+    def __init__(self, filename):
+        """Attaches read-only to a ring buffer made by TrialMonitor."""
+        self._file = open(filename, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slots, slot_size, self.started, sequence = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or slot_size != _RECORD.size:
+            raise ValueError('%s is not a live monitor file' % filename)
+        self.next = 0
+        self.missed = 0  # trials overwritten before they were read
+
+    def poll(self):
+        """Returns the trials published since the last poll as dictionaries."""
+        started, sequence = struct.unpack_from('<dQ', self._map, 16)
+        if started != self.started or sequence < self.next:  # the experiment was restarted
+            self.started, self.next = started, 0
+        if sequence - self.next > self.slots:
+            self.missed += sequence - self.slots - self.next
+            self.next = sequence - self.slots
+
+        trials = []
+        while self.next < sequence:
+            n = self.next
+            offset = _HEADER.size + (n % self.slots) * _RECORD.size
+            values = _RECORD.unpack_from(self._map, offset)
+            if values[0] != 2 * n + 2 or _SEQ.unpack_from(self._map, offset)[0] != 2 * n + 2:
+                break  # being written or already overwritten: try again next poll
+            trial = dict(zip(FIELDS, values[1:]))
+            for name in ('response', 'word', 'word_label'):
+                trial[name] = trial[name].rstrip(b'\0').decode('utf-8', 'replace')
+            trials += [trial]
+            self.next += 1
+        return trials
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def show(filename, interval=0.25):
+    """Prints every trial as it comes in, and again once it is scored, with
+    the running accuracy and mean RT of the scored trials. Stop with ctrl+c."""
+    while not os.path.exists(filename):
+        time.sleep(interval)
+    reader = MonitorReader(filename)
+    correct = answered = 0
+    rts = 0.0
+    try:
+        while True:
+            for trial in reader.poll():
+                if trial['no'] == 1 and not trial['update']:  # a new run
+                    correct = answered = 0
+                    rts = 0.0
+                if not trial['update']:
+                    print('session %(session)i  trial %(no)2i  %(word_label)3s %(word)-15s' % trial)
+                    continue
+                if trial['correct_resp'] >= 0:
+                    answered += 1
+                    correct += trial['correct_resp']
+                    rts += trial['rt']
+                print('session %(session)i  trial %(no)2i  %(word_label)3s %(word)-15s  scored: '
+                      'response %(response)-6s rt %(rt).3f  correct %(correct_resp)2i' % trial
+                      + ('  |  accuracy %.2f  mean rt %.3f' % (correct / float(answered), rts / answered) if answered else ''))
+            if reader.missed:
+                print('(missed %i trials)' % reader.missed)
+                reader.missed = 0
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        reader.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m faceword.monitor <live_monitor.mmap>')
+    show(sys.argv[1])
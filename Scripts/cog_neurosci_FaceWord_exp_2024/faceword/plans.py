@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Every session's trials of a participant, made before the experiment.
+
+make_trial_list draws the trial order, the two delays of each trial and the
+face after each neutral word with the random module, unseeded, when the
+session starts - in the MEG and EEG scripts between two runs, after the
+participant has pressed "t". A plan is the trial lists of all sessions of
+wordlist.txt, made beforehand with the make_trial_list of the script's
+profile (see engine.py) and saved as a single numpy .npz file per
+participant and script:
+
+    python -m faceword.plans WordFace_exp_scanner_MEG.py 0123 0124
+    -> faceWord_exp_plans/0123_WordFace_exp_scanner_MEG.npz, ...
+
+The experiment loads the participant's plan once at the start (about a
+millisecond) and takes each session's trials from it (a few hundred
+microseconds, against milliseconds for make_trial_list):
+
+    plan = plans.load(PLAN_FOLDER, V['ID'], 'WordFace_exp_scanner_MEG.py')
+    trials = plan.trials(session, {'ID': V['ID'], 'age': V['age'], ...})
+
+The random numbers of a session are seeded with the participant ID and the
+session (seed()), and a plan made again is the same plan. The fMRI trial
+order is searched for here, and only here (see sequence.py): it takes about
+a second per session. A participant without a plan file gets the same trials
+made on the spot, except that the fMRI trials are shuffled, as they were
+before the search.
+
+A plan keeps the size and CRC-32 of the word list it was made from (see
+wordstore.py). load() refuses a plan of another word list, so a changed
+wordlist.txt means making the plans again.
+"""
+
+import hashlib
+import numbers
+import os
+import time
+
+import numpy as np
+
+SESSION = 'plan_session'  # the field of the plan's trials that holds the session of each trial
+
+
+def seed(participant, session):
+    """The seed of the random module for a participant's session."""
+    return int(hashlib.sha256(('%s/%s' % (participant, session)).encode('utf-8')).hexdigest()[:16], 16)
+
+
+def filename(folder, participant, script):
+    """The plan file of :participant: for :script:, e.g. 'WordFace_exp_scanner_MEG.py'."""
+    return os.path.join(folder, '%s_%s.npz' % (participant, os.path.splitext(os.path.basename(script))[0]))
+
+
+def _field_type(values):
+    if all(isinstance(value, numbers.Integral) and not isinstance(value, bool) for value in values):
+        return 'i4'
+    if all(isinstance(value, numbers.Real) and not isinstance(value, bool) for value in values):
+        return 'f8'
+    if all(isinstance(value, str) for value in values):
+        return 'U%i' % max(1, max(len(value) for value in values))
+    raise TypeError('cannot put %r in a plan' % sorted(set(type(value).__name__ for value in values)))
+
+
+def _array(columns, rows):
+    """A structured array of :rows: from {field: values}."""
+    array = np.zeros(rows, [(key, _field_type(values)) for key, values in columns.items()])
+    for key, values in columns.items():
+        array[key] = values
+    return array
+
+
+def pack(sessions, words):
+    """
+    The trials of all sessions as numpy arrays: 'trials', a row per trial
+    with the fields that differ between trials, 'fixed', a single row with
+    the fields which are the same in all trials (mostly the empty ones
+    filled in during the session), 'keys', the order of the fields in
+    the trial dictionaries, and 'words', the size and CRC-32 of the word list.
+        :sessions: {session: list of trials from make_trial_list}
+        :words: the WordStore the trials were made from
+    """
+    trials = [trial for session in sorted(sessions) for trial in sessions[session]]
+    keys = list(trials[0])
+    varying, fixed = {SESSION: [session for session in sorted(sessions) for trial in sessions[session]]}, {}
+    for key in keys:
+        values = [trial[key] for trial in trials]
+        if all(value == values[0] and type(value) is type(values[0]) for value in values):
+            fixed[key] = values[:1]
+        else:
+            varying[key] = values
+    return {'trials': _array(varying, len(trials)), 'fixed': _array(fixed, 1), 'keys': np.array(keys),
+            'words': np.array([words.source_size, words.source_crc], dtype='i8')}
+
+
+class Plan(object):
+    def __init__(self, arrays):
+        """:arrays: from pack()"""
+        self.array = arrays['trials']
+        self.keys = arrays['keys'].tolist()
+        self.varying = self.array.dtype.names[1:]
+        fixed = arrays['fixed']
+        fixed = dict(zip(fixed.dtype.names, fixed.tolist()[0])) if fixed.dtype.names else {}
+        self.template = dict((key, fixed.get(key)) for key in self.keys)  # the fields in the order of make_trial_list
+        self.sessions = sorted(set(self.array[SESSION].tolist()))
+        self.words = tuple(arrays['words'].tolist()) if 'words' in arrays else None  # (size, crc32) of the word list
+
+    def is_of(self, words):
+        """Whether the plan was made from the word list of the WordStore :words:."""
+        return self.words == (words.source_size, words.source_crc)
+
+    def trials(self, session, fields=None):
+        """
+        New trial dictionaries of :session:, like make_trial_list returns them.
+            :fields: (dict) values to fill in, e.g. the participant's age
+        """
+        rows = self.array[self.array[SESSION] == session]
+        if not len(rows):
+            raise KeyError('the plan has no session %s, only %s' % (session, self.sessions))
+        template = dict(self.template, **fields) if fields else self.template
+        trials = []
+        for row in rows.tolist():
+            trial = template.copy()
+            trial.update(zip(self.varying, row[1:]))
+            trials.append(trial)
+        return trials
+
+
+def save(path, sessions, words):
+    """Writes the plan of :sessions: ({session: trials}), made from the
+    WordStore :words:, to :path:."""
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **pack(sessions, words))
+    os.replace(path + '.tmp', path)  # never a half-written plan
+
+
+def load(folder, participant, script, words=None):
+    """
+    The participant's Plan for :script:, or None if none was made.
+        :words: the WordStore of the word list. Raises ValueError if the plan
+            was made from another one
+    """
+    path = filename(folder, participant, script)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        plan = Plan(arrays)
+    if words is not None and not plan.is_of(words):
+        raise ValueError('%s was made from another word list, make it again: python -m faceword.plans %s %s' % (
+            path, os.path.basename(script), participant))
+    return plan
+
+
+def make(script, participant, sessions=None):
+    """
+    Makes the trials of every session like :script: would, with the
+    session_trials of its profile and the search for the fMRI trial order
+    (see sequence.py), and returns {session: trials} and the
+    WordStore they were made from. The
+    participant fields (age, gender, ...) are left empty; the script fills
+    them in.
+        :script: (str) e.g. 'WordFace_exp_scanner_MEG.py', or a profile of engine.py, e.g. 'MEG'
+        :participant: (str) the ID of the participant
+        :sessions: the sessions to make. Default is all in wordlist.txt
+    """
+    from faceword import engine
+
+    V = dict((key, '') for key in engine.DIALOG)  # the script fills in the participant's answers
+    V['ID'] = participant
+    experiment = engine.Experiment(script, V, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wordlist.txt'),
+                                   plan_folder=None)  # make them, do not look them up
+    made = {}
+    for session in sessions or experiment.word_store().sessions:
+        made[session] = experiment.session_trials(session, search=True)
+    return made, experiment.word_store()
+
+
+if __name__ == '__main__':
+    import argparse
+    from faceword import engine
+    from ppc import _percentile
+
+    parser = argparse.ArgumentParser(description='Makes the plans of participants for an experiment script')
+    parser.add_argument('script', help='e.g. WordFace_exp_scanner_MEG.py, or its profile: MEG')
+    parser.add_argument('participants', nargs='+', help='participant IDs, as typed in the dialog')
+    parser.add_argument('--folder', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'faceWord_exp_plans'),
+                        help='where the script looks for plans (its PLAN_FOLDER)')
+    args = parser.parse_args()
+    args.script = engine.profile(args.script)['script']
+
+    for participant in args.participants:
+        path = filename(args.folder, participant, args.script)
+        made, words = make(args.script, participant)
+        save(path, made, words)
+
+        loading, session = [], []
+        for i in range(100):
+            start = time.perf_counter()
+            plan = load(args.folder, participant, args.script)
+            loading.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            plan.trials(plan.sessions[0], {'ID': participant})
+            session.append(time.perf_counter() - start)
+        print('%s: %i sessions, %i trials, %.1f kB; loads in %.0f us, then a session\'s trials in %.0f us (medians)' % (
+            path, len(plan.sessions), len(plan.array), os.path.getsize(path) / 1024.,
+            _percentile(sorted(loading), 50) * 10 ** 6, _percentile(sorted(session), 50) * 10 ** 6))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trigger pulses with an exact width, sent from a dedicated thread, and the
+one writer of the trigger port while a run has them.
+
+With win.callOnFlip the trigger is pulled up on one flip and down on the
+next, so a pulse is one refresh wide (16.7 ms at 60 Hz, 8.3 ms at 120 Hz), and
+a response trigger, which is pulled up at once, stays up until whenever the
+next flip happens. A PulseScheduler instead pulls the code up, waits exactly
+width_ms and pulls it down again, in its own high-priority thread, so the
+frame loop is never held up:
+
+    trigger_pulses = pulses.PulseScheduler(setParallelData, 'data/0001_sess_1.pulses.csv')
+    trigger_pulses.pulse(112, 10)  # returns at once
+    trigger_pulses.close()         # after the run: sends what is queued and saves the log
+
+Pulses which are asked for while another is still up are queued and sent one
+after the other (with gap_ms of zeros in between), never on top of each
+other. For every pulse the log has the code, the requested time and width, the
+actual up and down times, on the scheduler's clock (core.monotonicClock in the
+experiment, like the trigger log of triggers.py), and the stimulus code which
+cut it short, if any (see below).
+
+The stimulus triggers, which go up and down with the flips, go through the
+scheduler too, so two threads never write the port at the same time:
+
+    win.callOnFlip(trigger_pulses.stimulus, 21)  # instead of setParallelData
+
+A pulse waits until the stimulus trigger on the port has been pulled down
+(at most a frame). A stimulus code which comes while a pulse is up goes up at
+once, on its flip, and so cuts the pulse short: for MEG/EEG the onset of the
+stimulus matters more than the width of the response pulse. The pulse is then
+not pulled down by its own 0 but by the stimulus code, and its down time in
+the log is when the stimulus code went up. A 0 of the stimulus triggers while
+none of theirs is up leaves the pulse alone.
+
+Test the timing on any computer with a fake port:
+
+    python -m faceword.pulses
+"""
+
+import sys
+import threading
+import time
+
+_STOP = 'stop'
+LOG_COLUMNS = ('code', 'requested', 'width', 'up', 'down', 'cut_by')
+
+# Who set a code on the port, passed on to set_data (see triggers.setParallelData)
+STIMULUS = 0
+PULSE = 1
+
+
+class FakePort(object):
+    """A parallel port which only records (time, code, source) for every setData."""
+    def __init__(self):
+        self.data = []
+
+    def setData(self, code, source=STIMULUS):
+        self.data.append((time.perf_counter(), code, source))
+
+
+def _raise_priority():
+    """Makes the calling thread as urgent as the OS lets us. Returns True if it worked."""
+    try:
+        if sys.platform.startswith('win'):
+            import ctypes
+            THREAD_PRIORITY_TIME_CRITICAL = 15
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_TIME_CRITICAL))
+        import os
+        os.sched_setscheduler(threading.get_native_id(), os.SCHED_FIFO, os.sched_param(50))  # needs root or CAP_SYS_NICE
+        return True
+    except (AttributeError, OSError):
+        return False
+
+
+def _sleep_until(deadline, spin=0.002):
+    """Sleeps until time.perf_counter() reaches :deadline:. The last :spin:
+    seconds are spent busy-waiting, as sleep() can overshoot by a millisecond."""
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class PulseScheduler(object):
+    def __init__(self, set_data=None, filename=None, width_ms=10, gap_ms=1, queue_size=100, clock=time.perf_counter,
+                 stimulus_timeout=0.1, threaded=True):
+        """
+        Starts the pulse thread.
+            :set_data: function which sets the port, called as set_data(code,
+                source) with source STIMULUS or PULSE, e.g. triggers.setParallelData.
+                Default is a FakePort (see .port)
+            :filename: optionally a csv file to save the log to on close()
+            :width_ms: (float) default pulse width in milliseconds
+            :gap_ms: (float) minimum time the port is 0 between two pulses
+            :queue_size: how many pulses may wait before pulse() blocks
+            :clock: function returning the time for the log, e.g. core.monotonicClock.getTime
+            :stimulus_timeout: (float) longest a pulse waits for a stimulus
+                trigger to be pulled down, in seconds (in case it never is)
+            :threaded: (bool) False for a virtual clock (headless.py), which
+                only moves with the flips: a pulse then goes up and down at
+                once, as soon as the port is free, without a thread
+        """
+        import queue
+
+        if set_data is None:
+            self.port = FakePort()
+            set_data = self.port.setData
+        self._set_data = set_data
+        self.filename = filename
+        self.width_ms = width_ms
+        self.gap_ms = gap_ms
+        self.clock = clock
+        self.stimulus_timeout = stimulus_timeout
+        self.log = []  # (code, requested, width, up, down, cut_by) for every pulse sent. cut_by is None unless a stimulus code cut it short
+        self.priority = None  # whether the thread got a high priority
+        self._closed = False
+        self._error = None
+        self._port = threading.Condition()  # guards the port and the fields below
+        self._stimulus_up = False  # a stimulus code is on the port
+        self._pulse_up = False  # a pulse is on the port (or was cut short and is not over yet)
+        self._cut = None  # (stimulus code, time) which cut the pulse short
+        self.threaded = threaded
+        self._waiting = []  # pulses waiting for the port, if not threaded
+        if threaded:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name='pulses')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def pulse(self, code, width_ms=None):
+        """Sends :code: for :width_ms: as soon as the port is free. Returns at once."""
+        if self._error is not None:
+            raise self._error
+        item = (code, (self.width_ms if width_ms is None else width_ms) / 1000., self.clock())
+        if self.threaded:
+            self._queue.put(item)
+        else:
+            self._waiting.append(item)
+            self._send_waiting()
+
+    def stimulus(self, code):
+        """
+        Sets a stimulus trigger (or pulls it down with 0), e.g. from
+        win.callOnFlip. If a pulse is up, the code cuts it short.
+        """
+        with self._port:
+            if self._pulse_up and self._cut is None:
+                if code == 0 and not self._stimulus_up:
+                    return  # the stimulus trigger is down already; leave the pulse up
+                self._cut = (code, self.clock())
+            self._set_data(code, STIMULUS)
+            self._stimulus_up = code != 0
+            self._port.notify_all()
+        if not self.threaded:
+            self._send_waiting()
+
+    def _send_waiting(self, force=False):
+        """Sends the waiting pulses, if not threaded, when no stimulus code is up (or if :force:)."""
+        while self._waiting and (force or not self._stimulus_up):
+            code, width, requested = self._waiting.pop(0)
+            self._set_data(code, PULSE)
+            up = self.clock()
+            self._set_data(0, PULSE)
+            self.log.append((code, requested, width, up, self.clock(), None))
+
+    def _run(self):
+        self.priority = _raise_priority()
+        free = 0.0  # when the port may go up again (time.perf_counter)
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            code, width, requested = item
+            try:
+                _sleep_until(free)
+                with self._port:
+                    self._port.wait_for(lambda: not self._stimulus_up, self.stimulus_timeout)
+                    self._pulse_up = True
+                    self._cut = None
+                    self._set_data(code, PULSE)
+                    start, up = time.perf_counter(), self.clock()
+                _sleep_until(start + width)
+                with self._port:
+                    if self._cut is None:
+                        self._set_data(0, PULSE)
+                        cut_by, down = None, self.clock()
+                    else:  # a stimulus code pulled it down already
+                        cut_by, down = self._cut
+                    self._pulse_up = False
+                    end = time.perf_counter()
+                self.log.append((code, requested, width, up, down, cut_by))
+                free = end + self.gap_ms / 1000.
+            except Exception as error:  # raised in the main thread on next pulse() or close()
+                self._error = error
+                with self._port:
+                    self._pulse_up = False
+
+    def close(self):
+        """Sends the queued pulses, stops the thread and saves the log.
+        Call it in every quit-path. It is safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.threaded:
+            self._queue.put(_STOP)
+            self._thread.join()
+        else:
+            self._send_waiting(force=True)
+        if self.filename:
+            self.save(self.filename)
+        if self._error is not None:
+            raise self._error
+
+    def save(self, filename):
+        """Saves the log as csv."""
+        import csv
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(LOG_COLUMNS)
+            writer.writerows(self.log)
+
+    def report(self):
+        """Prints how late the pulses went up and how far their widths were off."""
+        from ppc import _percentile
+
+        if not self.log:
+            print('no pulses sent')
+            return
+        whole = [pulse for pulse in self.log if pulse[5] is None]
+        latency = sorted(up - requested for code, requested, width, up, down, cut_by in self.log)
+        error = sorted(abs(down - up - width) for code, requested, width, up, down, cut_by in whole) or [0.0]
+        print(len(self.log), 'pulses,', len(self.log) - len(whole), 'cut short by a stimulus code,',
+              'high priority' if self.priority else 'normal priority')
+        for name, values in (('up after request (incl. waiting for the previous pulse)', latency), ('width error of the whole pulses', error)):
+            print('    %s: median %.3f ms, p99 %.3f ms, worst %.3f ms' % (
+                name, _percentile(values, 50) * 1000, _percentile(values, 99) * 1000, values[-1] * 1000))
+
+
+def test(pulses=200, width_ms=10):
+    """
+    Sends pulses to a FakePort at random moments, some while the previous
+    pulse is still up, and prints the timing.
+    """
+    import random
+    scheduler = PulseScheduler(width_ms=width_ms)
+    for i in range(pulses):
+        scheduler.pulse(random.choice([101, 102, 111, 112, 201, 202, 211, 212]))
+        time.sleep(random.uniform(0, 3 * width_ms / 1000.))
+    scheduler.close()
+    scheduler.report()
+
+    # No pulse may start before the previous one went down
+    codes = [code for t, code, source in scheduler.port.data]
+    assert codes[1::2] == [0] * pulses and 0 not in codes[0::2], 'pulses overlapped'
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Collects key presses in a background thread, timestamped when they arrive.
+
+psychopy.event.getKeys only sees the keys when the frame loop asks for them,
+so key times are only as good as the frame grid, and asking on every frame
+costs time in the loop. The ResponseListener reads psychopy.hardware.keyboard
+(psychtoolbox timestamps the keys in its own thread, on core.monotonicClock)
+every millisecond in a thread of its own. It keeps every key in a deque and
+latches the first valid key of each response window, so the frame loop only
+has to look at a flag:
+
+    listener = responses.ResponseListener(['y', 'b'], quit_keys=KEYS_QUIT)
+    listener.open_window(time_flip_img)   # at the onset of the face
+    if listener.check():                  # in the frame loop: None until a key came
+        key, time_key = listener.response
+    if listener.quit:                     # a quit key was pressed
+        ...
+    listener.close_window(core.monotonicClock.getTime())  # after the post-image fixation
+
+Keys pressed before the window opened do not count, like after
+event.clearEvents(). All keys of the run are in listener.events as (key, t)
+and the windows in listener.windows as (start, end), for scoring.py.
+
+The times are only this good with the psychtoolbox keyboard backend (the
+default when psychtoolbox is installed). With the old event backend the keys
+still only arrive when the window flips.
+"""
+
+import collections
+import threading
+import time
+
+
+class ResponseListener(object):
+    def __init__(self, keys, quit_keys=(), interval=0.001, threaded=None, keyboard=None):
+        """
+        Starts listening.
+            :keys: the response keys, e.g. ['y', 'b', '1', '2']
+            :quit_keys: keys which set the quit flag, e.g. ['escape', 'q']
+            :interval: (float) seconds between two looks at the keyboard
+            :threaded: (bool) read the keyboard in a thread. If False, it is
+                read whenever check() or close_window() is called. Default is
+                True, except for keyboards with a virtual clock (headless.py)
+            :keyboard: a psychopy.hardware.keyboard.Keyboard. Default is a
+                new one on core.monotonicClock
+        """
+        if keyboard is None:
+            from psychopy import core
+            from psychopy.hardware import keyboard as hardware_keyboard
+            keyboard = hardware_keyboard.Keyboard(clock=core.monotonicClock)
+        self._keyboard = keyboard
+        self.keys = frozenset(keys)
+        self.quit_keys = frozenset(quit_keys)
+        self._key_list = sorted(self.keys | self.quit_keys)
+        self.interval = interval
+        self.events = collections.deque()  # (key, t) of every key that arrived
+        self.windows = []  # (start, end) of every closed window
+        self.response = None  # (key, t) of the first valid key in the open window
+        self.quit = False
+        self._window = None  # when the open window started
+        self._stopped = False
+
+        self.threaded = not getattr(keyboard, 'virtual', False) if threaded is None else threaded
+        if self.threaded:
+            self._thread = threading.Thread(target=self._run, name='responses')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self.poll()
+            time.sleep(self.interval)
+
+    def poll(self):
+        """Takes the keys which arrived since last time from the keyboard."""
+        for key in self._keyboard.getKeys(keyList=self._key_list, waitRelease=False, clear=True):
+            self.events.append((key.name, key.tDown))
+            if key.name in self.quit_keys:
+                self.quit = True
+            elif self._window is not None and self.response is None and key.tDown >= self._window:
+                self.response = (key.name, key.tDown)
+
+    def open_window(self, start):
+        """Starts a response window. Keys pressed before :start: (a
+        core.monotonicClock time) are ignored."""
+        self.response = None
+        self._window = start
+
+    def check(self):
+        """Returns the latched (key, t) of the open window, or None."""
+        if not self.threaded:
+            self.poll()
+        return self.response
+
+    def close_window(self, end):
+        """Ends the response window at :end: (a core.monotonicClock time) and
+        returns its (key, t), or None."""
+        self.check()
+        self.windows.append((self._window, end))
+        self._window = None
+        return self.response
+
+    def keys_between(self, start, end):
+        """The (key, t) of every key pressed from :start: until before :end:."""
+        return [(key, t) for key, t in list(self.events) if start <= t < end]
+
+    def reset(self):
+        """Forgets the keys and windows so far, e.g. at the start of a run."""
+        self.events.clear()
+        del self.windows[:]
+        self.response = None
+
+    def stop(self):
+        self._stopped = True
+        if self.threaded:
+            self._thread.join()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A run compiled into one row per frame before it starts.
+
+compile_run() turns the trial list into a numpy structured array with a row for
+every flip of the run: which trial and phase it belongs to (the phases of
+fliplog.py), which screen to draw, which trigger code to set on the flip and
+what else happens on it (flags). run_condition is then a single loop over the
+rows, without counting frames or keeping track of triggers to pull down:
+
+    frames, screens = schedule.compile_run(trials, **SCHEDULE)
+    for i, phase, screen, code, flags in schedule.rows(frames):
+        ...
+
+The trigger of the word and the image goes up on their second frame
+(trigger_frame) and the pause trigger on frame pause_frame of the fixation
+before the image. Every trigger is pulled down on the next flip. Without
+fixation_before, the fixation before the image is not flipped at all, as in the
+old behavioural script: the image follows the word at once.
+
+The same schedule can be checked offline, e.g. before a lab day:
+
+    python -m faceword.schedule WordFace_exp_scanner_MEG.py --participants 0001 0002
+
+which compiles every session of the script for each participant with the
+trials the script will run (Experiment.session_trials of its profile, see
+engine.py): the participant's plan from faceWord_exp_plans if there is one
+(see plans.py), otherwise the shuffled order the script falls back to. It
+prints the total duration, the trigger spacing and any overlapping or
+missing triggers.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from faceword.fliplog import WORD, FIX_BEFORE, IMG, FIX_AFTER
+
+DTYPE = np.dtype([('trial', 'u2'), ('phase', 'u1'), ('screen', 'u2'), ('trigger', 'i2'), ('flags', 'u1')])
+FIELDS = DTYPE.names
+NO_TRIGGER = -1  # leave the port as it is
+
+# flags
+TRIAL_START = 1  # first frame of the word
+WORD_OFFSET = 2  # first frame of the fixation before the image
+PAUSE = 4  # the pause trigger goes up
+IMG_ONSET = 8  # first frame of the image
+IMG_OFFSET = 16  # first frame of the fixation after the image
+RESPOND = 32  # look for responses (and quit keys) on this frame
+TRIAL_END = 64  # last frame of the trial: save it after this flip
+
+FIXATION = ('fixation', None)  # screen 0
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the experiment folder, above this package
+
+
+def compile_run(trials, pause_frame=None, trigger_frame=1, respond_from=None, triggers=True, fixation_before=True):
+    """
+    Returns the frames of a run as a structured array (DTYPE) and the list of
+    screens, (kind, key) for each screen id: ('fixation', None), ('word',
+    word) or ('image', image file) - see StimulusCache.screens().
+        :trials: the trial list from make_trial_list
+        :pause_frame: (int) frame of the fixation before the image on which the
+            pause trigger goes up. None for no pause trigger
+        :trigger_frame: (int) frame of the word and the image on which their
+            triggers go up
+        :respond_from: (int) frame of the image from which responses are
+            looked for on every frame until the end of the trial. None to only
+            look at the end of the trial
+        :triggers: (bool) False for no triggers at all
+        :fixation_before: (bool) False to go from the word to the image without
+            flipping the delay_frames_before of fixation
+    """
+    lengths = [(trial['duration_frames'], trial['delay_frames_before'] if fixation_before else 0,
+                trial['duration_frames'], trial['delay_frames_after']) for trial in trials]
+    frames = np.zeros(sum(sum(phases) for phases in lengths), DTYPE)
+    frames['trigger'] = NO_TRIGGER
+    screens = [FIXATION]
+    screen_ids = {FIXATION: 0}
+
+    def screen(kind, key):
+        if (kind, key) not in screen_ids:
+            screen_ids[kind, key] = len(screens)
+            screens.append((kind, key))
+        return screen_ids[kind, key]
+
+    start = 0
+    raised = []  # frames on which a trigger goes up
+    for i, (trial, (word, before, image, after)) in enumerate(zip(trials, lengths)):
+        frames['trial'][start:start + word + before + image + after] = i
+        phases = ((WORD, word, screen('word', trial['word'])), (FIX_BEFORE, before, 0),
+                  (IMG, image, screen('image', trial['img'])), (FIX_AFTER, after, 0))
+        onsets = {}
+        for phase, length, screen_id in phases:
+            frames['phase'][start:start + length] = phase
+            frames['screen'][start:start + length] = screen_id
+            onsets[phase] = start
+            start += length
+
+        frames['flags'][onsets[WORD]] |= TRIAL_START
+        frames['flags'][onsets[FIX_BEFORE]] |= WORD_OFFSET
+        frames['flags'][onsets[IMG]] |= IMG_ONSET
+        frames['flags'][onsets[FIX_AFTER]] |= IMG_OFFSET
+        frames['flags'][start - 1] |= TRIAL_END
+        if respond_from is not None:
+            frames['flags'][onsets[IMG] + respond_from:start] |= RESPOND
+
+        if triggers:
+            for phase, length, code in ((WORD, word, trial['word_trigger']), (IMG, image, trial['img_trigger'])):
+                if trigger_frame < length:
+                    frames['trigger'][onsets[phase] + trigger_frame] = code
+                    raised.append(onsets[phase] + trigger_frame)
+            if pause_frame is not None and pause_frame < before:
+                frames['trigger'][onsets[FIX_BEFORE] + pause_frame] = trial['pause_trigger']
+                frames['flags'][onsets[FIX_BEFORE] + pause_frame] |= PAUSE
+                raised.append(onsets[FIX_BEFORE] + pause_frame)
+
+    # Pull every trigger down on the next flip, unless another goes up there (see check())
+    down = np.array(raised, dtype=int) + 1
+    down = down[down < len(frames)]
+    down = down[frames['trigger'][down] == NO_TRIGGER]
+    frames['trigger'][down] = 0
+    return frames, screens
+
+
+def rows(frames):
+    """The frames as tuples of plain Python numbers, for the frame loop."""
+    return zip(*[frames[name].tolist() for name in FIELDS])
+
+
+def check(frames, frame_rate, min_spacing_ms=None, pause=True):
+    """
+    Checks a compiled run and prints its duration and trigger spacing.
+    Returns a list of problems (empty if all is well):
+        * triggers which go up while the previous one is still up
+        * triggers closer than min_spacing_ms (default: two frames)
+        * trials without their word, image (or, if :pause:, pause) trigger
+        :frames: from compile_run()
+        :frame_rate: (float) of the monitor the run is for
+    """
+    problems = []
+    codes = frames['trigger'].astype(int)
+    up = np.flatnonzero(codes > 0)
+    set_frames = np.flatnonzero(codes != NO_TRIGGER)
+    print('%i trials, %i frames = %.1f s at %s Hz, %i triggers' % (
+        len(np.unique(frames['trial'])), len(frames), len(frames) / float(frame_rate), frame_rate, len(up)))
+    if len(up) == 0:
+        return problems
+
+    # Every trigger must be pulled down (set to 0) before the next one goes up
+    following = np.searchsorted(set_frames, up, side='right')
+    following = following[following < len(set_frames)]
+    overlapping = following[codes[set_frames[following]] != 0]
+    for i in set_frames[overlapping]:
+        problems.append('frame %i: trigger %i goes up while the previous one is still up' % (i, codes[i]))
+
+    spacing = np.diff(up) * 1000. / frame_rate
+    min_spacing_ms = 2000. / frame_rate if min_spacing_ms is None else min_spacing_ms
+    if len(spacing):
+        print('trigger spacing: min %.1f ms, median %.1f ms' % (spacing.min(), np.median(spacing)))
+        for i in np.flatnonzero(spacing < min_spacing_ms - 1e-9):
+            problems.append('frame %i: trigger %i only %.1f ms after the previous one' % (up[i + 1], codes[up[i + 1]], spacing[i]))
+
+    expected = (WORD, IMG, FIX_BEFORE) if pause else (WORD, IMG)
+    raised = set(zip(frames['trial'][up].tolist(), frames['phase'][up].tolist()))
+    for trial in np.unique(frames['trial']).tolist():
+        for phase in expected:
+            if (trial, phase) not in raised:
+                problems.append('trial %i: no %s trigger' % (trial + 1, {WORD: 'word', IMG: 'image', FIX_BEFORE: 'pause'}[phase]))
+    return problems
+
+
+def check_script(script, participants=('',), sessions=None, plan_folder=None):
+    """
+    Compiles the runs of an experiment script offline, with the trials and
+    SCHEDULE of its profile (see engine.py), and checks them. Returns the
+    problems of all participants and sessions.
+        :script: (str) e.g. 'WordFace_exp_scanner_MEG.py', or its profile, e.g. 'MEG'
+        :participants: the participant IDs, as typed in the dialog. Their
+            trials are those of their plans if they have one
+        :sessions: the sessions to check. Default is all in wordlist.txt
+        :plan_folder: (str) where the plans are. Default is the
+            PLAN_FOLDER of the experiment folder, where the scripts look
+    """
+    from faceword import engine
+
+    plan_folder = plan_folder or os.path.join(HERE, engine.PLAN_FOLDER)
+    problems = []
+    for participant in participants:
+        V = dict((key, '') for key in engine.DIALOG)
+        V['ID'] = participant
+        experiment = engine.Experiment(script, V, os.path.join(HERE, 'wordlist.txt'), plan_folder=plan_folder)
+        settings = experiment.profile['schedule']
+        name = 'participant %s' % participant if participant else 'no participant'
+        for session in sessions or experiment.word_store().sessions:
+            print('\n--- %s, %s, session %i: %s' % (script, name, session,
+                                                  'planned trials' if experiment.plan is not None else 'no plan, shuffled trials'))
+            frames, screens = compile_run(experiment.session_trials(session), **settings)
+            problems += ['%s, session %i, %s' % (name, session, problem) for problem in
+                         check(frames, engine.FRAME_RATE, pause=settings.get('pause_frame') is not None)]
+    for problem in problems:
+        print(problem)
+    print('\n%s: %s' % (script, '%i problems' % len(problems) if problems else 'OK'))
+    return problems
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Checks the frames and triggers of the runs of experiment scripts')
+    parser.add_argument('scripts', nargs='*', default=['WordFace_exp_scanner.py', 'WordFace_exp_scanner_MEG.py', 'WordFace_exp_scanner_EEG_resp.py'],
+                        help='e.g. WordFace_exp_scanner_MEG.py, or its profile: MEG')
+    parser.add_argument('--participants', nargs='+', default=[''], help='participant IDs, as typed in the dialog')
+    parser.add_argument('--plans', default=None, help='where the participants\' plans are (default: the scripts\' PLAN_FOLDER)')
+    args = parser.parse_args()
+    problems = []
+    for script in args.scripts:
+        problems += check_script(script, args.participants, plan_folder=args.plans)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scores the responses of a whole run at once, after the run.
+
+During the run, the scripts only record the raw key presses and the response
+windows (image onset to the end of the post-image fixation, see
+responses.py). When the run is over, score() finds the first response key of
+every window with numpy.searchsorted and fills in the response columns of all
+trials in one go.
+
+The window starts at the image onset (onset_img in the log) and ends where
+the next trial's word comes on, so a key at the very end belongs to neither
+trial. That is how the MEG and EEG scripts always did it. The fMRI and
+behavioural scripts used to clear the keyboard at the word onset and take the
+first key after the fixation, so a key pressed before the face came on (to
+the word, or in the fixation after it) was the response, with a negative rt.
+Now it is not, and the next key in the window is.
+
+The response columns:
+
+    response        the key, or '' if there was none
+    key_t           time of the key press from the start of the experiment
+    rt              time of the key press from the image onset
+    correct_resp    1 if the key matches the face, else 0
+    congruency      'congruent' if the word predicted the face, 'incongruent'
+                    if it predicted the other face, 'neutral' after a neutral
+                    word. Filled in for every trial, answered or not
+
+In the experiment script, before the trials are written:
+
+    scoring.score(trials, listener.events, listener.windows, KEYS_target, IMG_P, exp_start)
+"""
+
+import numpy as np
+
+
+def score(trials, events, windows, keys_target, img_p, exp_start=0.0):
+    """
+    Fills in the response columns of :trials: in place and returns them.
+        :trials: list of trial dictionaries, in the order they were shown
+        :events: (key, t) of every key press of the run, t on core.monotonicClock
+        :windows: (start, end) of the response window of each trial, in the
+            same order. Windows beyond the trials (a trial cut short by a quit
+            key) are ignored
+        :keys_target: {'pos': [keys], 'neg': [keys]}, like KEYS_target in the scripts
+        :img_p: (str) the happy face image. Any other image is the fearful face
+        :exp_start: (float) core.monotonicClock time the experiment started
+    """
+    if not trials:
+        return trials
+    windows = np.array(windows[:len(trials)], dtype=float).reshape(-1, 2)
+    if len(windows) < len(trials):
+        raise ValueError('%i trials but only %i response windows' % (len(trials), len(windows)))
+
+    # Only the response keys, in the order they were pressed
+    pos_keys, neg_keys = list(keys_target['pos']), list(keys_target['neg'])
+    names = np.array([key for key, t in events], dtype=object)
+    times = np.array([t for key, t in events], dtype=float)
+    keep = np.isin(names, pos_keys + neg_keys)
+    order = np.argsort(times[keep], kind='stable')
+    names, times = names[keep][order], times[keep][order]
+
+    # The first key at or after each window start, if it came before the window end
+    first = np.searchsorted(times, windows[:, 0], side='left')
+    answered = first < len(times)
+    first[~answered] = 0
+    if len(times):
+        answered &= times[first] < windows[:, 1]
+    key = names[first] if len(times) else np.full(len(trials), '', dtype=object)
+    time_key = times[first] if len(times) else np.zeros(len(trials))
+
+    happy = np.array([trial['img'] == img_p for trial in trials])
+    labels = np.array([trial['word_label'] for trial in trials])
+    correct = np.isin(key, pos_keys) == happy
+    congruency = np.where(labels == 'neu', 'neutral',
+                          np.where((labels == 'pos') == happy, 'congruent', 'incongruent'))
+
+    key_t = (time_key - exp_start).tolist()
+    rt = (time_key - windows[:, 0]).tolist()
+    correct, answered, key, congruency = correct.tolist(), answered.tolist(), key.tolist(), congruency.tolist()
+    for i, trial in enumerate(trials):
+        if answered[i]:
+            trial['response'] = key[i]
+            trial['key_t'] = key_t[i]
+            trial['rt'] = rt[i]
+            trial['correct_resp'] = int(correct[i])
+        else:
+            trial['response'] = trial['key_t'] = trial['rt'] = trial['correct_resp'] = ''
+        trial['congruency'] = congruency[i]
+    return trials
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trial orders for the fMRI session, picked for the efficiency of the priming
+contrast of Imaging_analysis_script.ipynb:
+
+    (pos_priming + neg_priming) - no_priming
+
+make_trial_list used to shuffle the trials with random.sample and give every
+trial its two delays in random order. arrange() instead draws hundreds of
+candidate orders (and delay orders) which respect a few constraints,
+
+    * no more than max_run words of the same label in a row
+    * every label -> label transition about equally often (the counts differ
+      by at most max_imbalance)
+    * half of the trials of each label get the long delay before the image,
+      so the pause stays counterbalanced across the conditions
+
+and scores each of them like the first-level model would see it: the events
+are convolved with the Glover HRF (nilearn's default), sampled at the scans,
+a constant and the cosine drifts of the 0.01 Hz high-pass filter are
+projected out, and the efficiency of the contrast is 1 / c (X'X)^-1 c'. All
+candidates of a batch are scored at once in numpy, several thousand per
+second. After the random orders, small changes of the best one are tried
+(a hill climb), and the most efficient order is kept:
+
+    trial_list = sequence.arrange(trial_list, FRAME_RATE, **SEQUENCE)
+
+The search is 5000 orders, about a second per session. It is run when the
+plans are made (see plans.py), never when a session starts; without a plan
+the trials are shuffled. Four times as many orders find orders only about
+1 % more efficient.
+
+The model has the word regressors (word_pos, word_neg, word_neu) and the
+three priming regressors. The notebook also has image_pos and image_neg, but
+every image is a priming event of one kind or another, so these two add up
+to the priming regressors and cannot be told apart from them.
+
+See how much better than a plain shuffle the chosen orders are, for every
+session of wordlist.txt:
+
+    python -m faceword.sequence
+"""
+
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+LABELS = ('pos', 'neg', 'neu')
+REGRESSORS = ('word_pos', 'word_neg', 'word_neu', 'pos_priming', 'neg_priming', 'no_priming')
+CONTRAST = np.array([0., 0., 0., 1., 1., -1.])  # (pos_priming + neg_priming) - no_priming
+
+
+def glover_hrf(frame_rate, seconds=32.):
+    """The Glover HRF (as in nilearn) at every frame, summing to 1."""
+    t = np.arange(int(seconds * frame_rate)) / float(frame_rate)
+
+    def gamma_pdf(shape, scale):
+        return np.exp((shape - 1) * np.log(np.maximum(t, 1e-12)) - t / scale - math.lgamma(shape) - shape * math.log(scale))
+    hrf = gamma_pdf(6 / .9, .9) - .35 * gamma_pdf(12 / .9, .9)
+    return hrf / hrf.sum()
+
+
+def cosine_drifts(n_scans, tr, high_pass=0.01):
+    """A constant and the cosine drift regressors of nilearn's high-pass filter."""
+    order = int(np.floor(2 * n_scans * tr * high_pass))
+    scans = np.arange(n_scans)
+    drifts = [np.cos(np.pi * (scans + .5) * k / n_scans) for k in range(1, order + 1)]
+    return np.column_stack(drifts + [np.ones(n_scans)])
+
+
+class DesignScorer(object):
+    def __init__(self, frame_rate, n_scans, tr=1.0, high_pass=0.01, hrf_seconds=32.):
+        """
+        Scores many trial orders of one run at once.
+            :frame_rate: (int) of the monitor, the onsets are in frames
+            :n_scans: (int) volumes of the run
+            :tr: (float) repetition time in seconds (1 s in the notebook)
+            :high_pass: (float) cut-off of the drift regressors in Hz
+            :hrf_seconds: (float) length of the HRF
+        """
+        self.frame_rate = frame_rate
+        self.n_scans = n_scans
+        self.tr_frames = tr * frame_rate
+        self.hrf = glover_hrf(frame_rate, hrf_seconds)
+        self._boxcars = {}  # duration in frames: response to an event of that duration
+        self._scans = np.arange(int(math.ceil(len(self.hrf) / self.tr_frames)) + 1)
+        drifts, _ = np.linalg.qr(cosine_drifts(n_scans, tr, high_pass))
+        self._drifts = drifts  # orthonormal, to project the drifts out of the regressors
+
+    def response(self, duration):
+        """The HRF response to an event of :duration: frames, at every frame after its onset."""
+        if duration not in self._boxcars:
+            self._boxcars[duration] = np.convolve(self.hrf, np.ones(duration))[:len(self.hrf)]
+        return self._boxcars[duration]
+
+    def design(self, onsets, regressors, durations):
+        """
+        The design matrices, (candidates, scans, regressors).
+            :onsets: (candidates, events) onsets in frames from the first scan
+            :regressors: (candidates, events) column of each event in REGRESSORS
+            :durations: (events,) or (candidates, events) durations in frames
+        """
+        onsets = np.asarray(onsets)
+        batch, events = onsets.shape
+        durations, kinds = np.unique(np.broadcast_to(durations, onsets.shape), return_inverse=True)
+        n_regressors = len(REGRESSORS)
+        length = len(self.hrf)
+
+        # The responses to each duration, with a 0 at the end for lags beyond the HRF
+        responses = np.zeros((len(durations), length + 1))
+        for i, duration in enumerate(durations.tolist()):
+            responses[i, :length] = self.response(duration)
+
+        # The scans within the HRF of each event, and how many frames after the onset they are
+        first = np.ceil(onsets / self.tr_frames).astype(int)
+        lags = np.rint(first * self.tr_frames - onsets).astype(int)[..., None] + np.rint(self._scans * self.tr_frames).astype(int)
+        weights = responses.ravel()[kinds.reshape(onsets.shape)[..., None] * (length + 1) + np.minimum(lags, length)]
+        scans = np.minimum(first[..., None] + self._scans, self.n_scans)  # one extra scan for those after the run
+
+        index = (np.arange(batch)[:, None, None] * (self.n_scans + 1) + scans) * n_regressors + np.asarray(regressors)[..., None]
+        X = np.bincount(index.ravel(), weights.ravel(), minlength=batch * (self.n_scans + 1) * n_regressors)
+        return X.reshape(batch, self.n_scans + 1, n_regressors)[:, :-1]
+
+    def efficiency(self, X, contrast=CONTRAST):
+        """1 / c (X'X)^-1 c' of each design matrix, with the drifts projected out."""
+        DtX = np.matmul(self._drifts.T, X)
+        XtX = np.matmul(X.transpose(0, 2, 1), X) - np.matmul(DtX.transpose(0, 2, 1), DtX)
+        variance = np.linalg.solve(XtX, np.broadcast_to(contrast, X.shape[::2])[..., None])[..., 0].dot(contrast)
+        with np.errstate(divide='ignore'):
+            return np.where(variance > 0, 1. / variance, 0.)
+
+
+def label_codes(trials):
+    """The label of every trial as an index into LABELS."""
+    return np.array([LABELS.index(trial['word_label']) for trial in trials])
+
+
+def longest_runs(labels):
+    """The longest run of the same label in each row of :labels:."""
+    same = labels[:, 1:] == labels[:, :-1]
+    # Length of the run ending at each position: count up, reset where the label changes
+    positions = np.arange(same.shape[1]) + 1
+    resets = np.maximum.accumulate(np.where(same, 0, positions), axis=1)
+    return (positions - resets).max(axis=1) + 1 if same.shape[1] else np.ones(len(labels), dtype=int)
+
+
+def transition_counts(labels):
+    """How often each label -> label transition occurs in each row, (rows, labels ** 2)."""
+    n = len(LABELS)
+    pairs = labels[:, :-1] * n + labels[:, 1:] + np.arange(len(labels))[:, None] * n * n
+    return np.bincount(pairs.ravel(), minlength=len(labels) * n * n).reshape(len(labels), n * n)
+
+
+def allowed(labels, max_run=3, max_imbalance=4):
+    """Which rows of :labels: (the label codes in the order shown) respect
+    the constraints. None for no limit."""
+    keep = np.ones(len(labels), dtype=bool)
+    if max_run is not None:
+        keep &= longest_runs(labels) <= max_run
+    if max_imbalance is not None:
+        counts = transition_counts(labels)
+        keep &= counts.max(axis=1) - counts.min(axis=1) <= max_imbalance
+    return keep
+
+
+def draw(codes, batch, rng, max_run=3, max_imbalance=4):
+    """
+    A batch of random orders and long-delay-first choices which respect the
+    constraints (see the top of this file). Returns (orders, long_first): the
+    trial indices in the order they are shown, and for each trial (in the
+    original order) whether the longer of its two delays comes before the
+    image. Fewer than :batch: rows if some orders broke the constraints.
+    """
+    orders = rng.random((batch, len(codes))).argsort(axis=1)
+    orders = orders[allowed(codes[orders], max_run, max_imbalance)]
+
+    # Within each label, a random half of the trials have the long delay first
+    keys = rng.random((len(orders), len(codes)))
+    long_first = np.zeros(keys.shape, dtype=bool)
+    for label in np.unique(codes).tolist():
+        members = np.flatnonzero(codes == label)
+        ranks = keys[:, members].argsort(axis=1).argsort(axis=1)
+        long_first[:, members] = ranks < len(members) // 2
+    return orders, long_first
+
+
+def neighbours(codes, order, long_first, batch, rng, max_run=3, max_imbalance=4):
+    """
+    Small changes of one candidate, like draw(): half of them swap the
+    places of two trials, the other half move the long delay from one trial
+    to another of the same label (so it stays balanced).
+    """
+    n = len(codes)
+    orders = np.tile(order, (batch, 1))
+    long_first = np.tile(long_first, (batch, 1))
+    rows = np.arange(batch // 2)
+    a, b = rng.integers(0, n, len(rows)), rng.integers(0, n, len(rows))
+    orders[rows, a], orders[rows, b] = orders[rows, b], orders[rows, a]
+
+    # A random trial with and one without the long delay first, of a random label
+    rows = np.arange(batch // 2, batch)
+    label = codes[rng.integers(0, n, len(rows))]
+    same = codes == label[:, None]
+    keys = rng.random((len(rows), n))
+    give, take = same & long_first[rows], same & ~long_first[rows]
+    rows, keys = rows[give.any(axis=1) & take.any(axis=1)], keys[give.any(axis=1) & take.any(axis=1)]
+    long_first[rows, np.where(give[rows - batch // 2], keys, -1).argmax(axis=1)] = False
+    long_first[rows, np.where(take[rows - batch // 2], keys, -1).argmax(axis=1)] = True
+
+    keep = allowed(codes[orders], max_run, max_imbalance)
+    return orders[keep], long_first[keep]
+
+
+def score(scorer, trials, orders, long_first, lead=0):
+    """The efficiency of each (order, long_first) candidate for :trials:,
+    :lead: frames after the first scan."""
+    codes = label_codes(trials)
+    word = np.array([trial['duration_frames'] for trial in trials])
+    before = np.array([trial['delay_frames_before'] for trial in trials])
+    after = np.array([trial['delay_frames_after'] for trial in trials])
+    short, long = np.minimum(before, after), np.maximum(before, after)
+    before, after = np.where(long_first, long, short), np.where(long_first, short, long)
+    before, after = np.take_along_axis(before, orders, 1), np.take_along_axis(after, orders, 1)
+    word = word[orders]
+    image = word  # the image is shown as long as the word
+
+    # Onsets in frames from the first scan: word, fixation, image, fixation
+    lengths = word + before + image + after
+    onset_word = lead + np.cumsum(lengths, axis=1) - lengths
+    onset_image = onset_word + word + before
+
+    labels = codes[orders]
+    onsets = np.concatenate([onset_word, onset_image], axis=1)
+    regressors = np.concatenate([labels, labels + len(LABELS)], axis=1)
+    durations = np.concatenate([word, image], axis=1)
+    return scorer.efficiency(scorer.design(onsets, regressors, durations))
+
+
+def arrange(trials, frame_rate, tr=1.0, lead=0., candidates=500, refine=4500, batch=500,
+            max_run=3, max_imbalance=4, seed=None):
+    """
+    Returns the trials in the most efficient order found, with the long
+    delay before the image in half of each label's trials. The search scores
+    :candidates: random orders which respect the constraints, then
+    :refine: small changes of the best one so far (a hill climb). Prints how
+    long it took and how the order compares to plain shuffles.
+        :trials: from make_trial_list, in any order. Only word_label,
+            duration_frames and the two delay_frames are used
+        :frame_rate: (int) of the monitor
+        :tr: (float) repetition time in seconds
+        :lead: (float) seconds from the scanner trigger to the first word
+        :candidates: (int) how many random orders to score
+        :refine: (int) how many changes of the best order to score
+        :batch: (int) how many orders to score at once
+        :max_run: (int) most words of the same label in a row. None for no limit
+        :max_imbalance: (int) most the transition counts may differ. None for no limit
+        :seed: for the search. Default is drawn from the random module.
+            make_trial_list draws it from the session's own random.Random
+    """
+    rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+    codes = label_codes(trials)
+    lead = int(round(lead * frame_rate))
+    frames = lead + sum(2 * trial['duration_frames'] + trial['delay_frames_before'] + trial['delay_frames_after'] for trial in trials)
+    scorer = DesignScorer(frame_rate, int(math.ceil(frames / (tr * frame_rate))), tr)
+
+    start = time.perf_counter()
+    best, best_order, best_long_first = -np.inf, None, None
+    scored = drawn = 0
+    while scored < candidates + refine:
+        if scored < candidates:
+            orders, long_first = draw(codes, batch, rng, max_run, max_imbalance)
+        else:
+            orders, long_first = neighbours(codes, best_order, best_long_first, batch, rng, max_run, max_imbalance)
+        drawn += batch
+        if not len(orders):
+            if drawn >= 100 * (candidates + refine):
+                raise ValueError('none of %i orders had runs of at most %s and transitions within %s of each other' % (
+                    drawn, max_run, max_imbalance))
+            continue
+        efficiency = score(scorer, trials, orders, long_first, lead)
+        i = int(efficiency.argmax())
+        if efficiency[i] > best:
+            best, best_order, best_long_first = efficiency[i], orders[i], long_first[i]
+        scored += len(orders)
+    seconds = time.perf_counter() - start
+
+    # The old way: random.sample of the trials, the delays as make_trial_list drew them
+    drawn_first = np.array([trial['delay_frames_before'] > trial['delay_frames_after'] for trial in trials])
+    shuffled = score(scorer, trials, rng.random((batch, len(trials))).argsort(axis=1), np.tile(drawn_first, (batch, 1)), lead)
+    print('sequence: %i orders (of %i drawn) scored in %.2f s, %i per second' % (scored, drawn, seconds, scored / seconds))
+    print('    efficiency %.4g, %.2f x the median shuffled order (best of %i shuffles %.2f x)' % (
+        best, best / np.median(shuffled), batch, shuffled.max() / np.median(shuffled)))
+
+    for trial, long_first in zip(trials, best_long_first.tolist()):
+        delays = sorted((trial['delay_frames_before'], trial['delay_frames_after']))
+        trial['delay_frames_before'], trial['delay_frames_after'] = delays[::-1] if long_first else delays
+    return [trials[index] for index in best_order.tolist()]
+
+
+if __name__ == '__main__':
+    from faceword import wordstore
+
+    # The fMRI script: 60 Hz, 0.7 s word and face, delays of 180 and 336 frames, 1 s of fixation first
+    store = wordstore.load('wordlist.txt')
+    for session in store.sessions:
+        print('\n--- session %i' % session)
+        labels = store.session(session).label
+        trials = [dict(word_label=label, duration_frames=42, delay_frames_before=before, delay_frames_after=516 - before)
+                  for label, before in zip(labels, random.choices((180, 336), k=len(labels)))]
+        arrange(trials, 60, lead=1., refine=int(sys.argv[1]) if len(sys.argv) > 1 else 4500)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulated participants for the WordFace experiment.
+
+A Participant watches the screen of a headless run (see headless.py) and
+presses a key for every face: 'b' for the happy face (IMG_P), 'y' for the
+fearful face (IMG_N). Reaction times are lognormal. A participant can be wrong
+or miss a face completely (lapses), and a valenced word which predicts the face
+(congruent prime) makes the answer faster and more accurate than a neutral
+word; a word which predicts the other face makes it slower and less accurate.
+
+The sessions are run through the real scripts, i.e. the real make_trial_list,
+run_condition, response classification and logging, across a process pool:
+
+    python -m faceword.simulate 1000                       # 1000 participants, fMRI script
+    python -m faceword.simulate 200 --script WordFace_exp_scanner_MEG.py --workers 8
+
+The participants are called 1, 2, 3, ... and take their trials from their
+plans, like real participants (see plans.py). Make the plans once, before
+simulating, or the fMRI trials are shuffled instead of ordered for the
+contrast:
+
+    python -m faceword.plans WordFace_exp_scanner.py $(seq 1 1000)
+
+The trials of all participants are saved in the format of
+Data/all_models_events.csv (an image and a word row per trial) as
+simulated_data/events.csv, for testing the analysis on data with a known
+effect.
+"""
+
+import csv
+import math
+import os
+import random
+import shutil
+import time
+
+from faceword import headless
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the experiment folder, above this package
+KEYS = {'p': 'b', 'n': 'y'}  # happy face: index finger, fearful face: middle finger
+SESSIONS = {'WordFace_exp_scanner_MEG.py': (1,), 'WordFace_exp_scanner_EEG_resp.py': (1,)}  # these run all 6 sessions in one go
+EVENT_COLUMNS = ('onset', 'duration', 'trial_type', 'response_time', 'word', 'response',
+                 'correct_resp', 'gender', 'age', 'sub', 'block', 'year')
+
+
+def read_labels(filename=os.path.join(HERE, 'wordlist.txt')):
+    """Returns {word: 'pos', 'neg' or 'neu'} from the word list."""
+    with open(filename) as f:
+        return dict((row['word'], row['label']) for row in csv.DictReader(f, delimiter='\t'))
+
+
+class Participant(object):
+    def __init__(self, rt_median=0.65, rt_sigma=0.25, accuracy=0.95, lapses=0.03,
+                 priming=0.05, priming_accuracy=0.02, seed=None, labels=None):
+        """
+        A responder for headless.run().
+            :rt_median: (float) median reaction time in seconds after a neutral word
+            :rt_sigma: (float) sigma of the log reaction time
+            :accuracy: (float) probability of the right key after a neutral word
+            :lapses: (float) probability of not answering at all
+            :priming: (float) seconds faster after a congruent word, slower after an incongruent one
+            :priming_accuracy: (float) accuracy gained after a congruent word, lost after an incongruent one
+            :seed: seed of the participant's random numbers
+            :labels: {word: label}. Default is read from wordlist.txt
+        """
+        self.rt_median = rt_median
+        self.rt_sigma = rt_sigma
+        self.accuracy = accuracy
+        self.lapses = lapses
+        self.priming = priming
+        self.priming_accuracy = priming_accuracy
+        self.random = random.Random(seed)
+        self.labels = labels or read_labels()
+        self._prime = 'neu'
+        self._face = None  # the face on the screen, if any
+
+    def __call__(self, session, t):
+        face = None
+        for stim in session.shown:
+            image = getattr(stim, 'image', None)
+            if image:
+                face = 'p' if image.endswith('_p.png') else 'n'
+            elif stim.text in self.labels:
+                self._prime = self.labels[stim.text]
+        if face and not self._face:
+            self.respond(session, t, face)
+        self._face = face
+
+    def respond(self, session, onset, face):
+        """Presses a key for a face which appeared at :onset:"""
+        if self.random.random() < self.lapses:
+            return
+        congruence = 0 if self._prime == 'neu' else (1 if self._prime[0] == face else -1)
+        rt = self.random.lognormvariate(math.log(self.rt_median), self.rt_sigma) - congruence * self.priming
+        correct = self.random.random() < self.accuracy + congruence * self.priming_accuracy
+        key = KEYS[face] if correct else KEYS['n' if face == 'p' else 'p']
+        session.press(key, onset + max(rt, 0.1))
+
+
+def _number(text, kind):
+    """'' (no response) becomes None, i.e. an empty field"""
+    return kind(text) if text != '' else None
+
+
+def events(log_file, sub, gender, age, year):
+    """
+    Converts a session log (csv from ppc.csv_writer) to rows like
+    Data/all_models_events.csv: the image rows of each block, then its word rows.
+    """
+    with open(log_file) as f:
+        trials = list(csv.DictReader(f))
+    rows = []
+    for block in sorted(set(trial['session'] for trial in trials), key=int):
+        block_trials = [trial for trial in trials if trial['session'] == block]
+        for kind in ('img', 'word'):
+            for trial in block_trials:
+                rows += [{
+                    'onset': float(trial['onset_' + kind]),
+                    'duration': float(trial['duration_measured_' + kind]),
+                    'trial_type': 'image_' + ('pos' if trial['img'].endswith('_p.png') else 'neg')
+                                  if kind == 'img' else 'word_' + trial['word_label'],
+                    'response_time': _number(trial['rt'], float),
+                    'word': trial['word'],
+                    'response': trial['response'],
+                    'correct_resp': _number(trial['correct_resp'], int),
+                    'gender': gender,
+                    'age': age,
+                    'sub': sub,
+                    'block': int(block),
+                    'year': year,
+                }]
+    return rows
+
+
+def simulate_participant(job):
+    """
+    Runs all sessions of one simulated participant through the experiment
+    script and returns their event rows. Runs in a worker process.
+        :job: (sub, script, folder, plan_folder, keep_logs, seed, parameters of the Participant)
+    """
+    from faceword import engine
+    from faceword import plans
+
+    sub, script, folder, plan_folder, keep_logs, seed, parameters = job
+    rng = random.Random(seed)
+    random.seed(rng.random())  # the trial lists have their own random numbers, seeded with the participant ID, see plans.py
+    gender, age, year = rng.choice(['male', 'female']), rng.randint(19, 35), time.localtime().tm_year
+    participant = Participant(seed=rng.random(), **parameters)
+
+    workdir = os.path.join(folder, 'sub-%04i' % sub)
+    plan = plans.filename(plan_folder, str(sub), script)
+    if os.path.exists(plan):  # where the script looks for it
+        if not os.path.isdir(os.path.join(workdir, engine.PLAN_FOLDER)):
+            os.makedirs(os.path.join(workdir, engine.PLAN_FOLDER))
+        shutil.copy(plan, os.path.join(workdir, engine.PLAN_FOLDER))
+    logs = []
+    for session in SESSIONS.get(script, (1, 2, 3, 4, 5, 6)):
+        info = {'ID': str(sub), 'gender': gender, 'age': str(age), 'session': session}
+        run = headless.run(script, workdir=workdir, info=info, responder=participant)
+        logs += [log_file for log_file in run.logs() if log_file not in logs]  # the sessions share the workdir: only this session's new logs
+    rows = []
+    for log_file in logs:
+        rows += events(log_file, sub, gender, age, year)
+    if not keep_logs and os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    return rows
+
+
+def simulate(participants=100, script='WordFace_exp_scanner.py', folder='simulated_data',
+             plan_folder=os.path.join(HERE, 'faceWord_exp_plans'), workers=None, chunksize=1,
+             keep_logs=False, seed=0, **parameters):
+    """
+    Simulates participants across a process pool and saves their trials as
+    folder/events.csv. Returns the filename.
+        :participants: (int) how many participants to simulate
+        :script: (str) the experiment script to run them through
+        :folder: (str) where to put events.csv (and the logs of each participant)
+        :plan_folder: (str) where the plans of the participants are, see plans.py
+        :workers: (int) number of processes. Default is the number of CPUs
+        :chunksize: (int) participants sent to a worker at a time
+        :keep_logs: (bool) keep the logs the script wrote for each participant
+        :seed: the simulation is the same for the same seed
+        :parameters: passed on to Participant, e.g. priming=0.08
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from faceword import plans
+
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    folder = os.path.abspath(folder)
+    plan_folder = os.path.abspath(plan_folder)
+    jobs = [(sub, script, folder, plan_folder, keep_logs, '%s-%i' % (seed, sub), parameters)
+            for sub in range(1, participants + 1)]
+    planned = sum(os.path.exists(plans.filename(plan_folder, str(sub), script)) for sub in range(1, participants + 1))
+    if planned < participants:
+        print('%i of %i participants have no plan in %s; their trials are made as the sessions start, the fMRI trials shuffled. '
+              'Make the plans first: python -m faceword.plans %s 1 ... %i' % (
+                  participants - planned, participants, plan_folder, script, participants))
+
+    start = time.perf_counter()
+    filename = os.path.join(folder, 'events.csv')
+    with open(filename, 'w', newline='') as f, ProcessPoolExecutor(workers) as pool:
+        writer = csv.DictWriter(f, EVENT_COLUMNS, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writeheader()
+        for rows in pool.map(simulate_participant, jobs, chunksize=chunksize):
+            writer.writerows(rows)
+    print('simulated', participants, 'participants in', round(time.perf_counter() - start, 1), 's:', filename)
+    return filename
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Simulate participants of the WordFace experiment.')
+    parser.add_argument('participants', type=int, nargs='?', default=100)
+    parser.add_argument('--script', default='WordFace_exp_scanner.py')
+    parser.add_argument('--folder', default='simulated_data')
+    parser.add_argument('--plans', default=os.path.join(HERE, 'faceWord_exp_plans'), help='where the participants\' plans are')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=1, help='participants sent to a worker at a time')
+    parser.add_argument('--keep-logs', action='store_true')
+    parser.add_argument('--seed', default='0')
+    args = parser.parse_args()
+    simulate(args.participants, args.script, args.folder, args.plans, args.workers, args.chunksize, args.keep_logs, args.seed)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The word and face stimuli of a session, built before the scanner trigger.
+
+Setting stim_text.text lays the text out again, and setting stim_image.image
+loads the image file and uploads it to the graphics card - at the start of
+every trial's word and image. A StimulusCache builds one TextStim for every
+word of the session and one ImageStim for each face while the intro text is
+on the screen, so a trial only looks its stimuli up:
+
+    stimuli = stimcache.StimulusCache(win, words.word, [IMG_P, IMG_N], TEXT_STYLE, IMAGE_STYLE)
+    stimuli.report()                  # what this saves per trial; takes a while, so only with --profile-startup
+    event.waitKeys(keyList=KEYS_trigger)
+
+    stim_word = stimuli.text[trial['word']]
+    stim_img = stimuli.image[trial['img']]
+
+The screens of a trial never change while they are shown, so the frame loops
+draw whole screens: the word with the photodiode dot, the face with the dot,
+and the fixation cross.
+
+    stimuli = stimcache.StimulusCache(..., dot=stimDot, fixation=stim_fix, buffered=True)
+    screen_word = stimuli.word_screen[trial['word']]
+    screen_word.draw()                # instead of stim_word.draw(); stimDot.draw()
+
+With buffered=True each screen is rendered once into a visual.BufferImageStim
+texture, and drawing it is a single textured quad per frame instead of
+laying out glyphs and drawing the dot, which keeps the draw time (and so the
+flip jitter, see fliplog.py) down at 120 Hz. With buffered=False the screens
+draw their stimuli one by one, like before. The experiment draws unbuffered
+unless its profile sets buffer_screens=True, see engine.py.
+"""
+
+import time
+
+
+class _Screen(object):
+    """Stimuli which are drawn together, one by one."""
+    def __init__(self, stims):
+        self.stims = stims
+
+    def draw(self, win=None):
+        for stim in self.stims:
+            stim.draw()
+
+
+class StimulusCache(object):
+    def __init__(self, win, words, images, text_style, image_style, dot=None, fixation=None, buffered=False):
+        """
+        Builds the stimuli.
+            :win: the psychopy window
+            :words: the words of the session, e.g. words.word
+            :images: the image files, e.g. [IMG_P, IMG_N]
+            :text_style: (dict) the other arguments of visual.TextStim, e.g.
+                dict(pos=[0, 0], height=0.7, alignHoriz='center')
+            :image_style: (dict) the other arguments of visual.ImageStim
+            :dot: optionally a stimulus shown with every word and face, e.g. stimDot
+            :fixation: optionally the fixation cross, e.g. stim_fix
+            :buffered: (bool) render each screen once into a BufferImageStim
+        """
+        from psychopy import visual
+
+        self.win = win
+        self.text_style = text_style
+        self.image_style = image_style
+        self.text = {}  # word: TextStim
+        self.image = {}  # image file: ImageStim
+
+        start = time.perf_counter()
+        for word in words:
+            if word not in self.text:
+                self.text[word] = visual.TextStim(win=win, text=word, **text_style)
+        self.text_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for image in images:
+            if image not in self.image:
+                self.image[image] = visual.ImageStim(win, image=image, **image_style)
+        self.image_seconds = time.perf_counter() - start
+
+        # Whole screens: word + dot, face + dot, fixation
+        start = time.perf_counter()
+        self.buffered = buffered
+        extra = [dot] if dot is not None else []
+        self.word_screen = dict((word, self._screen([stim] + extra)) for word, stim in self.text.items())
+        self.image_screen = dict((image, self._screen([stim] + extra)) for image, stim in self.image.items())
+        self.fixation_screen = self._screen([fixation]) if fixation is not None else None
+        if buffered:
+            win.clearBuffer()  # the captured screens must not show on the next flip
+        self.screen_seconds = time.perf_counter() - start
+
+    def screens(self, keys):
+        """The screens for a list of (kind, key) from schedule.compile_run(),
+        so screen ids can be drawn with screens[id].draw()."""
+        lookup = {'word': self.word_screen, 'image': self.image_screen}
+        return [self.fixation_screen if kind == 'fixation' else lookup[kind][key] for kind, key in keys]
+
+    def _screen(self, stims):
+        if self.buffered:
+            from psychopy import visual
+            return visual.BufferImageStim(self.win, stim=stims)
+        return _Screen(stims)
+
+    def report(self, repeat=5):
+        """
+        Prints what the cache cost to build and what it saves at the start
+        of each trial: re-setting the text and image of a single stimulus
+        (as before) against a dictionary lookup. Returns the medians in seconds.
+        """
+        from psychopy import visual
+        from ppc import _percentile
+
+        text = visual.TextStim(win=self.win, **self.text_style)
+        image = visual.ImageStim(self.win, **self.image_style)
+        set_text, set_image, lookup = [], [], []
+        for i in range(repeat):
+            for word in self.text:
+                start = time.perf_counter()
+                text.text = word
+                set_text.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                self.text[word]
+                lookup.append(time.perf_counter() - start)
+            for filename in self.image:
+                start = time.perf_counter()
+                image.image = filename
+                set_image.append(time.perf_counter() - start)
+
+        medians = {'set_text': _percentile(sorted(set_text), 50), 'set_image': _percentile(sorted(set_image), 50),
+                   'lookup': _percentile(sorted(lookup), 50)}
+        print('stimulus cache: %i words in %.1f ms, %i images in %.1f ms, %s screens in %.1f ms' % (
+            len(self.text), self.text_seconds * 1000, len(self.image), self.image_seconds * 1000,
+            'buffered' if self.buffered else 'unbuffered', self.screen_seconds * 1000))
+        print('    per trial before: text %.3f ms + image %.3f ms, now: 2 lookups of %.3f us (medians)' % (
+            medians['set_text'] * 1000, medians['set_image'] * 1000, medians['lookup'] * 10 ** 6))
+        return medians
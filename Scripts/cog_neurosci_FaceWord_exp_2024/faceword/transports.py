@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ways of getting the trigger codes out of the stimulus PC. triggers.py sends
+every code through one of these:
+
+    parallel              the parallel port (psychopy.parallel), like in the MEG lab
+    serial:<device>       a serial TTL box, e.g. serial:/dev/ttyUSB0 or serial:COM3
+                          (one byte per code; needs pyserial)
+    udp:<host>:<port>     a UDP datagram per code to a recording PC, e.g. udp:192.168.1.10:5005.
+                          The host defaults to 127.0.0.1 and the port to 5005, so
+                          udp:192.168.1.10, udp::6000 and udp work too
+    file:<filename>       a line per code in a text file ("time<TAB>code")
+    fake                  only prints the codes, like before
+
+Each lab picks its transport with the FACEWORD_TRIGGERS environment variable,
+e.g. FACEWORD_TRIGGERS=udp:192.168.1.10:5005. Default is the parallel port,
+and if the computer has none, fake.
+
+All transports have setData(code) (0 pulls the trigger down, like the
+parallel port) and close(). Compare their latency and jitter, each measured
+round-trip against a local loopback stand-in:
+
+    python -m faceword.transports
+"""
+
+import os
+import platform
+import socket
+import struct
+import sys
+import time
+
+ENVIRONMENT_VARIABLE = 'FACEWORD_TRIGGERS'
+UDP_PACKET = struct.Struct('<Hd')  # code, time.time() when it was sent
+
+
+class ParallelTransport(object):
+    def __init__(self, address=None):
+        """
+        :address: the port. Default is /dev/parport0 on Linux and 0xDFF8
+            on Windows (the MEG stim PC).
+        """
+        from psychopy import parallel
+        if address is None:
+            address = '/dev/parport0' if 'Linux' in platform.platform() else 0xDFF8
+        self.port = parallel.ParallelPort(address=address)
+        self.setData = self.port.setData
+
+    def close(self):
+        pass
+
+
+class SerialTransport(object):
+    def __init__(self, device, baudrate=115200):
+        """
+        :device: (str) e.g. '/dev/ttyUSB0' or 'COM3'
+        :baudrate: (int) as the TTL box expects
+        """
+        import serial  # pyserial, which comes with psychopy
+        self.port = serial.Serial(device, baudrate=baudrate, timeout=0, write_timeout=0.01)
+        self._timeout = serial.SerialTimeoutException
+        self.timeouts = []  # (time.time(), code) of every code which did not get out
+
+    def setData(self, code):
+        """Writes the code. If the box does not take it within the write
+        timeout, the code is lost but the run goes on: it is printed and kept
+        in .timeouts. A lost 0 leaves the previous code up until the next one."""
+        try:
+            self.port.write(bytes([code & 0xff]))
+        except self._timeout:
+            self.timeouts.append((time.time(), code))
+            print('WARNING: serial trigger %i timed out on %s (%i so far)' % (code, self.port.port, len(self.timeouts)))
+
+    def close(self):
+        self.port.close()
+
+
+class UDPTransport(object):
+    def __init__(self, host='127.0.0.1', port=5005):
+        """
+        Sends every code as a datagram of a 2-byte code and the 8-byte
+        time.time() it was sent (little-endian, see UDP_PACKET).
+        """
+        self.address = (host, int(port))
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def setData(self, code):
+        self.socket.sendto(UDP_PACKET.pack(code, time.time()), self.address)
+
+    def close(self):
+        self.socket.close()
+
+
+class FileTransport(object):
+    def __init__(self, filename):
+        """Appends "time.time()<TAB>code" lines to :filename:, unbuffered."""
+        self.filename = filename
+        self._file = open(filename, 'ab', buffering=0)
+
+    def setData(self, code):
+        self._file.write(b'%.6f\t%i\n' % (time.time(), code))
+
+    def close(self):
+        self._file.close()
+
+
+class FakeTransport(object):
+    def setData(self, code=1):
+        if code > 0:
+            # logging.exp('TRIG %d (Fake)' % code)
+            print('TRIG %d (Fake)' % code)
+
+    def close(self):
+        pass
+
+
+def open_transport(spec=None):
+    """
+    Opens the transport described by :spec: (see the top of this file),
+    or by the FACEWORD_TRIGGERS environment variable if it is None.
+    The parallel port falls back to fake if this computer has none.
+    """
+    spec = spec or os.environ.get(ENVIRONMENT_VARIABLE, 'parallel')
+    kind, _, argument = spec.partition(':')
+    if kind == 'parallel':
+        transport = ParallelTransport(argument or None)
+        try:  # Figure out whether to flip pins or fake it
+            transport.setData(128)
+        except NotImplementedError:
+            return FakeTransport()
+        transport.setData(0)
+        return transport
+    elif kind == 'serial':
+        return SerialTransport(argument)
+    elif kind == 'udp':
+        host, _, port = argument.partition(':')
+        if port and not port.isdigit():
+            raise ValueError('The UDP port must be a number, not %r in %r. Use udp:<host>:<port>' % (port, spec))
+        return UDPTransport(host or '127.0.0.1', port or 5005)
+    elif kind == 'file':
+        return FileTransport(argument or 'triggers.log')
+    elif kind == 'fake':
+        return FakeTransport()
+    raise ValueError('Unknown trigger transport %r. Use parallel, serial:<device>, udp:<host>:<port>, file:<filename> or fake' % spec)
+
+
+"""
+LATENCY BENCHMARK
+"""
+def _loopbacks(folder):
+    """
+    Yields (name, transport, receive) for every transport that can be tested
+    here. receive() blocks until the code sent last has arrived at the other end.
+    """
+    # UDP to a socket on this computer
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    yield 'udp', UDPTransport(*receiver.getsockname()), lambda: receiver.recv(UDP_PACKET.size)
+    receiver.close()
+
+    # A file which another handle reads
+    filename = os.path.join(folder, 'triggers.log')
+    transport = FileTransport(filename)
+    reader = open(filename, 'rb')
+
+    def read_line():
+        while not reader.readline():
+            pass
+    yield 'file', transport, read_line
+    reader.close()
+
+    # A serial TTL box stand-in: a pseudo-terminal
+    try:
+        import serial  # pyserial
+        import termios
+        import tty
+    except ImportError as error:
+        print('serial: skipped (%s)' % error)
+    else:
+        master, slave = os.openpty()
+        tty.setraw(slave, termios.TCSANOW)
+        transport = SerialTransport(os.ttyname(slave))
+        yield 'serial', transport, lambda: os.read(master, 1)
+        os.close(master)
+        os.close(slave)
+
+    # The parallel port has no loopback, so only the time setData takes
+    try:
+        transport = open_transport('parallel')
+    except ImportError as error:
+        print('parallel: skipped (%s)' % error)
+    else:
+        if isinstance(transport, ParallelTransport):
+            yield 'parallel (setData only)', transport, lambda: None
+        else:
+            print('parallel: skipped (no parallel port)')
+
+
+def benchmark(codes=1000):
+    """
+    Sends :codes: trigger codes through each transport and measures the time
+    until they arrive at a local stand-in receiver. Prints the latency
+    distribution and the jitter (standard deviation), and returns
+    {transport: statistics in seconds} like ppc.timer.
+    """
+    import math
+    import tempfile
+    from ppc import _percentile
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name, transport, receive in _loopbacks(folder):
+            for i in range(50):  # warm up
+                transport.setData(i % 255 + 1)
+                receive()
+            latencies = []
+            for i in range(codes):
+                start = time.perf_counter()
+                transport.setData(i % 255 + 1)
+                receive()
+                latencies.append(time.perf_counter() - start)
+            transport.close()
+
+            latencies.sort()
+            mean = sum(latencies) / codes
+            results[name] = {'min': latencies[0], 'median': _percentile(latencies, 50), 'p95': _percentile(latencies, 95),
+                             'p99': _percentile(latencies, 99), 'max': latencies[-1], 'mean': mean,
+                             'jitter': math.sqrt(sum((latency - mean) ** 2 for latency in latencies) / codes),
+                             'repeat': codes, 'runs': 1, 'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+            print('%-24s median %7.1f us  p99 %7.1f us  max %8.1f us  jitter %6.1f us' % tuple(
+                [name] + [results[name][key] * 10 ** 6 for key in ('median', 'p99', 'max', 'jitter')]))
+    return results
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
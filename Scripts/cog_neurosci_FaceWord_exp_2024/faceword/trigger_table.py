@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The trigger codes of the experiment, written down once and compiled into flat
+lookup tables at startup.
+
+The codes follow this scheme:
+
+    word        11 pos, 12 neg, 13 neu
+    pause       31 pos, 32 neg (before the predicted face),
+                51 / 52 after a neutral word, before a happy / fearful face
+    image       21 pos, 22 neg (predicted by the word),
+                41 / 42 after a neutral word, happy / fearful face
+    response    100 correct or 200 incorrect
+                + 10 after a neutral word
+                + 1 for the positive key or 2 for the negative key
+
+The fMRI profile keeps its older scheme for the neutral words (FMRI_STIMULUS_TRIGGERS):
+pause 41 / 42 and image 21 / 22, the same image codes as after a valenced word.
+
+In the experiment (see engine.py):
+
+    TRIGGERS = trigger_table.TriggerTable(IMG_P, IMG_N, KEYS_target)
+    TRIG_W, TRIG_BEFORE, TRIG_I = TRIGGERS.stimulus[label, img]      # in make_trial_list
+    correct, code = TRIGGERS.response[label, img, key]               # when a key is pressed
+
+Check the tables against the if-chains the scripts used before:
+
+    python -m faceword.trigger_table
+"""
+
+# word label: (word trigger, {face: (pause trigger, image trigger)}). Faces: 'p' happy, 'n' fearful
+STIMULUS_TRIGGERS = {
+    'pos': (11, {'p': (31, 21)}),
+    'neg': (12, {'n': (32, 22)}),
+    'neu': (13, {'p': (51, 41), 'n': (52, 42)}),
+}
+FMRI_STIMULUS_TRIGGERS = {
+    'pos': (11, {'p': (31, 21)}),
+    'neg': (12, {'n': (32, 22)}),
+    'neu': (13, {'p': (41, 21), 'n': (42, 22)}),
+}
+RESPONSE_CORRECT = 100
+RESPONSE_INCORRECT = 200
+RESPONSE_AFTER_NEUTRAL = 10
+RESPONSE_KEY = {'pos': 1, 'neg': 2}
+
+
+class TriggerTable(object):
+    def __init__(self, img_p, img_n, keys_target, stimulus_triggers=STIMULUS_TRIGGERS):
+        """
+        Compiles the trigger scheme for the image files and response keys of a script.
+            :img_p: (str) the happy face image, e.g. 'image_stim_p.png'
+            :img_n: (str) the fearful face image
+            :keys_target: {'pos': [keys], 'neg': [keys]}, like KEYS_target in the scripts
+            :stimulus_triggers: the word, pause and image codes, e.g. FMRI_STIMULUS_TRIGGERS
+        """
+        images = {'p': img_p, 'n': img_n}
+        self._images = images
+        self.word = {}  # label: word trigger
+        self.stimulus = {}  # (label, image): (word trigger, pause trigger, image trigger)
+        self.response = {}  # (label, image, key): (correct_resp, response trigger)
+        for label, (word_trigger, faces) in stimulus_triggers.items():
+            self.word[label] = word_trigger
+            for face, (pause_trigger, image_trigger) in faces.items():
+                self.stimulus[label, images[face]] = (word_trigger, pause_trigger, image_trigger)
+
+            # Every face can follow every word when it comes to the response
+            for face, image in images.items():
+                for valence, keys in keys_target.items():
+                    correct = valence[0] == face
+                    code = ((RESPONSE_CORRECT if correct else RESPONSE_INCORRECT) +
+                            (RESPONSE_AFTER_NEUTRAL if label == 'neu' else 0) + RESPONSE_KEY[valence])
+                    for key in keys:
+                        self.response[label, image, key] = (int(correct), code)
+
+    def names(self):
+        """
+        What each code means, e.g. {11: 'word/pos', 41: 'image/neu/pos', 101:
+        'response/pos/correct'}, for triggers.export_events. A code which is
+        used for more than one thing (the fMRI image codes) gets all its
+        names, joined by '|'.
+        """
+        faces = dict((image, 'pos' if face == 'p' else 'neg') for face, image in self._images.items())
+        names = {}
+
+        def name(code, text):
+            if text not in names.setdefault(code, []):
+                names[code].append(text)
+
+        for label, word_trigger in self.word.items():
+            name(word_trigger, 'word/%s' % label)
+        for (label, image), (word_trigger, pause_trigger, image_trigger) in sorted(self.stimulus.items()):
+            after = 'neu/%s' % faces[image] if label == 'neu' else label
+            name(pause_trigger, 'pause/%s' % after)
+            name(image_trigger, 'image/%s' % after)
+        for (label, image, key), (correct, code) in sorted(self.response.items()):
+            valence = 'pos' if code % 10 == RESPONSE_KEY['pos'] else 'neg'
+            name(code, 'response/%s%s/%s' % ('neu/' if label == 'neu' else '', valence, 'correct' if correct else 'incorrect'))
+        return dict((code, '|'.join(texts)) for code, texts in names.items())
+
+
+def _legacy_response(word_trigger, img, key, IMG_P, IMG_N, KEYS_target):
+    """The response branches of run_condition before the table, for verify()."""
+    if key in KEYS_target['neg']:
+        if word_trigger == 13:
+            if img == IMG_N:
+                return 1, 112
+            elif img == IMG_P:
+                return 0, 212
+        else:
+            if img == IMG_N:
+                return 1, 102
+            elif img == IMG_P:
+                return 0, 202
+    elif key in KEYS_target['pos']:
+        if word_trigger == 13:
+            if img == IMG_P:
+                return 1, 111
+            elif img == IMG_N:
+                return 0, 211
+        else:
+            if img == IMG_P:
+                return 1, 101
+            elif img == IMG_N:
+                return 0, 201
+    return None
+
+
+def _legacy_stimulus(label, img, IMG_P, IMG_N):
+    """The trigger if-chain of make_trial_list before the table, for verify()."""
+    if label == 'pos':
+        TRIG_I, TRIG_W, TRIG_BEFORE = 21, 11, 31
+    if label == 'neg':
+        TRIG_I, TRIG_W, TRIG_BEFORE = 22, 12, 32
+    if label == 'neu':
+        TRIG_W = 13
+        if img == IMG_P:
+            TRIG_I, TRIG_BEFORE = 41, 51
+        else:
+            TRIG_I, TRIG_BEFORE = 42, 52
+    return TRIG_W, TRIG_BEFORE, TRIG_I
+
+
+def verify(IMG_P='image_stim_p.png', IMG_N='image_stim_n.png', KEYS_target=None):
+    """
+    Checks every (word label, image, key) against the old if-chains of the MEG
+    and EEG scripts. Raises AssertionError on the first difference.
+    """
+    KEYS_target = KEYS_target or dict(neg=['2', 'y'], pos=['1', 'b'])
+    table = TriggerTable(IMG_P, IMG_N, KEYS_target)
+
+    for (label, img), triggers in table.stimulus.items():
+        assert triggers == _legacy_stimulus(label, img, IMG_P, IMG_N), (label, img)
+    assert sorted(table.stimulus) == sorted([('pos', IMG_P), ('neg', IMG_N), ('neu', IMG_P), ('neu', IMG_N)])
+
+    checked = 0
+    for label in STIMULUS_TRIGGERS:
+        for img in (IMG_P, IMG_N):
+            for key in ['y', 'b', '1', '2', 'z', 'escape', 'q', 't']:
+                legacy = _legacy_response(table.word[label], img, key, IMG_P, IMG_N, KEYS_target)
+                assert table.response.get((label, img, key)) == legacy, (label, img, key)
+                checked += 1
+    print('trigger table OK:', len(table.stimulus), 'stimulus and', checked, 'response combinations match')
+
+
+if __name__ == '__main__':
+    verify()
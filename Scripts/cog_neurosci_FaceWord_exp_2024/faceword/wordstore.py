@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The word list as a small binary file of fixed-width records, read without pandas.
+
+Reading wordlist.txt with pandas costs the pandas import (about half a second)
+and a parse, for 360 rows, and make_trial_list then looked every field up
+element by element through pandas Series. The converter packs the word list
+once into wordlist.words next to it: a header, an index of where each
+session's records start, and one struct-packed record per word, sorted by
+session:
+
+    python -m faceword.wordstore wordlist.txt      # -> wordlist.words, run from the experiment folder
+
+load() reads the whole file in one go and unpacks the records of a session
+into plain tuples, one per column:
+
+    store = wordstore.load('wordlist.txt')    # converts it first if needed
+    words = store.session(1)
+    words.word[0], words.label[0], words.score_pc[0]
+    store.sessions                            # [1, 2, 3, 4, 5, 6]
+
+The header has the size and CRC-32 of the text file it was made from. If
+wordlist.txt has changed since, load() converts it again, so the store can
+never be older than the word list. As it is made again whenever needed, the
+store is not kept in git (see .gitignore); only wordlist.txt is.
+"""
+
+import csv
+import io
+import os
+import struct
+import zlib
+
+MAGIC = b'WORDSTR1'
+FIELDS = ('word', 'score_pc', 'score_warriner', 'label', 'session')
+_HEADER = struct.Struct('<8sIIHHII')  # magic, records, sessions, word width, label width, source size, source crc32
+_SESSION = struct.Struct('<iII')  # session, first record, records
+
+
+def _record(word_width, label_width):
+    return struct.Struct('<%isdd%isi' % (word_width, label_width))
+
+
+def store_filename(source):
+    """The store of the word list :source:, e.g. 'wordlist.txt' -> 'wordlist.words'."""
+    return os.path.splitext(source)[0] + '.words'
+
+
+def pack(text):
+    """
+    The store of a tab separated word list as bytes.
+        :text: (bytes) the contents of e.g. wordlist.txt, with the columns of FIELDS
+    """
+    rows = list(csv.DictReader(io.StringIO(text.decode('utf-8')), delimiter='\t'))
+    missing = [field for field in FIELDS if rows and field not in rows[0]]
+    if missing:
+        raise ValueError('the word list has no %s column' % ', '.join(missing))
+    words = [row['word'].encode('utf-8') for row in rows]
+    labels = [row['label'].encode('utf-8') for row in rows]
+    sessions = [int(row['session']) for row in rows]
+    word_width = max([len(word) for word in words] + [1])
+    label_width = max([len(label) for label in labels] + [1])
+    record = _record(word_width, label_width)
+
+    order = sorted(range(len(rows)), key=lambda i: sessions[i])  # stable: the order within a session is kept
+    index, records = [], []
+    for i in order:
+        if not index or index[-1][0] != sessions[i]:
+            index.append([sessions[i], len(records), 0])
+        index[-1][2] += 1
+        records.append(record.pack(words[i], float(rows[i]['score_pc']), float(rows[i]['score_warriner']),
+                                   labels[i], sessions[i]))
+    header = _HEADER.pack(MAGIC, len(records), len(index), word_width, label_width, len(text), zlib.crc32(text))
+    return header + b''.join(_SESSION.pack(*entry) for entry in index) + b''.join(records)
+
+
+def convert(source, filename=None):
+    """Writes the store of the word list :source: to :filename: (default:
+    next to it, see store_filename()) and returns the bytes."""
+    with open(source, 'rb') as f:
+        data = pack(f.read())
+    filename = filename or store_filename(source)
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(filename + '.tmp', filename)
+    return data
+
+
+class Words(object):
+    """The words of a session, one tuple per column (see FIELDS)."""
+    def __init__(self, records):
+        columns = list(zip(*records)) or [()] * len(FIELDS)
+        self.word = tuple(word.rstrip(b'\0').decode('utf-8') for word in columns[0])
+        self.score_pc = columns[1]
+        self.score_warriner = columns[2]
+        self.label = tuple(label.rstrip(b'\0').decode('utf-8') for label in columns[3])
+        self.session = columns[4]
+
+    def __len__(self):
+        return len(self.word)
+
+
+class WordStore(object):
+    def __init__(self, data):
+        """:data: (bytes) from pack()"""
+        magic, records, sessions, word_width, label_width, self.source_size, self.source_crc = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('not a word store')
+        self._data = data
+        self._record = _record(word_width, label_width)
+        self._start = _HEADER.size + sessions * _SESSION.size
+        self._index = dict((session, (first, count)) for session, first, count in
+                           _SESSION.iter_unpack(data[_HEADER.size:self._start]))
+        self.sessions = sorted(self._index)
+        self._words = {}  # session: Words
+
+    def session(self, session):
+        """The Words of :session:"""
+        if session not in self._words:
+            if session not in self._index:
+                raise KeyError('the word list has no session %s, only %s' % (session, self.sessions))
+            first, count = self._index[session]
+            start = self._start + first * self._record.size
+            self._words[session] = Words(self._record.iter_unpack(self._data[start:start + count * self._record.size]))
+        return self._words[session]
+
+    def is_of(self, text):
+        """Whether the store was made from :text: (bytes)."""
+        return len(text) == self.source_size and zlib.crc32(text) == self.source_crc
+
+
+def load(source='wordlist.txt'):
+    """
+    The WordStore of the word list :source:. Converts it first if there is
+    no store yet, or if the word list has changed since. If the store cannot
+    be written (e.g. a read-only folder), the word list is used from memory.
+    """
+    filename = store_filename(source)
+    with open(source, 'rb') as f:
+        text = f.read()
+    if os.path.exists(filename):
+        with open(filename, 'rb') as f:
+            store = WordStore(f.read())
+        if store.is_of(text):
+            return store
+    data = pack(text)
+    try:
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(filename + '.tmp', filename)
+    except OSError:
+        pass
+    return WordStore(data)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from ppc import _percentile
+
+    for source in sys.argv[1:] or ['wordlist.txt']:
+        data = convert(source)
+        store = WordStore(data)
+        loading = []
+        for i in range(200):
+            start = time.perf_counter()
+            load(source).session(store.sessions[0])
+            loading.append(time.perf_counter() - start)
+        print('%s: %i sessions, %i words, %i bytes; loads a session in %.0f us (median)' % (
+            store_filename(source), len(store.sessions), sum(len(store.session(s)) for s in store.sessions),
+            len(data), _percentile(sorted(loading), 50) * 10 ** 6))
+
+        start = time.perf_counter()
+        import pandas as pd
+        imported = time.perf_counter() - start
+        start = time.perf_counter()
+        wordlist = pd.read_csv(source, sep='\t')
+        wordlist[wordlist.session == store.sessions[0]].reset_index(drop=True)
+        print('    pandas: import %.0f ms, then read_csv and a session %.1f ms' % (
+            imported * 1000, (time.perf_counter() - start) * 1000))
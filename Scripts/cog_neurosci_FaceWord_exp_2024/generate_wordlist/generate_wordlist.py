@@ -7,21 +7,23 @@ Created on Tue Oct  8 14:53:40 2019
 """
 
 import pandas as pd
-from pliers.stimuli import ComplexTextStim
-from pliers.extractors import PredefinedDictionaryExtractor, merge_results
 from matplotlib import pyplot as plt
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import seaborn as sns
-from numpy import repeat, array
+from numpy import array
+import balance
+import lexicon
+import ratings
 
 ###### READ IN THE BINDER AND RUN PCA ON VALENCE DIMENSIONS #######
 # Plug in working directory and path to Binder database
 wd = '/Users/au571533/Dropbox/DeixisSurvey2/AdvCogNeuro_2019'
 path_to_binder = '/Users/au571533/Dropbox/DeixisSurvey2/prolific2_material/WordSet1_Ratings.xlsx'
 
-# Import the binder
-binder_data = pd.read_excel(path_to_binder)
+# Import the binder columns we use (converted from the workbook the first
+# time, and whenever it changes, see ratings.py)
+binder_data = pd.DataFrame(ratings.load(path_to_binder, ['Word', 'Pleasant', 'Unpleasant', 'Happy', 'Sad', 'LEN', 'L10 FREQ']))
 
 # Run PCA with two components (we will only use one here)
 pca = PCA(n_components=2) # define structure
@@ -34,17 +36,13 @@ binder_data[['PC1', 'PC2']] = pd.DataFrame(data = pca_model, columns = ['PC1', '
 pca.explained_variance_ratio_
 
 ###### FIND SENTIMENT SCORES FROM WARRINER AND APPEND #######
-# Find sentiment scores in Warriner database using pliers
-val_ext = PredefinedDictionaryExtractor(variables = ['affect/V.Mean.Sum'])
-word_stim = ComplexTextStim(text = ' '.join(binder_data['Word']), unit = 'word')
-result = val_ext.transform(stim = word_stim)
-result_df = merge_results(result, extractor_names = 'drop')
-result_df.stim_name = result_df.stim_name.str[5:-1]
+# Find sentiment scores in Warriner database, from the local lexicon (made
+# with pliers' dictionaries the first time, see lexicon.py)
+norms = lexicon.load(wd + '/lexicon.npz', variables = ['affect/V.Mean.Sum'])
+binder_data['affect_V.Mean.Sum'] = norms.lookup(binder_data['Word'], 'affect_V.Mean.Sum')
 
 ###### CREATE WORD LIST #####################
-# Merge with original database
-binder_data = binder_data.merge(result_df.iloc[:,[7,9]], 
-                                left_on='Word', right_on='stim_name', how = 'outer')
+# Keep the words with a Warriner score
 binder_data = binder_data[binder_data['affect_V.Mean.Sum'].isna() == False]
 
 
@@ -55,24 +53,25 @@ neg_word_df = binder_data[binder_data['affect_V.Mean.Sum'] < 5].tail(n = 120)
 neu_word_df = binder_data[(binder_data['affect_V.Mean.Sum'] < 6) & 
                             (binder_data['affect_V.Mean.Sum'] > 5)].head(n = 120)
 
-# Shuffle and subset
-pos_word_df = pos_word_df.sample(frac = 1).reset_index(drop=True)
-neg_word_df = neg_word_df.sample(frac = 1).reset_index(drop=True)
-neu_word_df = neu_word_df.sample(frac = 1).reset_index(drop=True)
-pos_word_df = pos_word_df[['Word','PC1', 'affect_V.Mean.Sum']]
-neg_word_df = neg_word_df[['Word','PC1', 'affect_V.Mean.Sum']]
-neu_word_df = neu_word_df[['Word','PC1', 'affect_V.Mean.Sum']]
+# Label and subset (word length and frequency are kept for balancing)
+pos_word_df = pos_word_df.assign(label = 'pos')
+neg_word_df = neg_word_df.assign(label = 'neg')
+neu_word_df = neu_word_df.assign(label = 'neu')
+selected_df = pd.concat([pos_word_df, neg_word_df, neu_word_df], axis = 0)
+selected_df = selected_df[['Word','PC1', 'affect_V.Mean.Sum', 'LEN', 'L10 FREQ', 'label']].reset_index(drop=True)
+
+# Split into 6 sessions with 20 words of each label, with as alike valence
+# distributions as possible (see balance.py). Add 'LEN' and 'L10 FREQ' to
+# balance word length and frequency as well
+balance_on = ['PC1', 'affect_V.Mean.Sum']
+sessions, balance_cost = balance.balance(selected_df[balance_on].values, 6, strata = selected_df.label.values, seed = 2019)
+selected_df['session'] = sessions + 1
 
 # Create sessions with 60 words each and append to common database
 all_words_df = pd.DataFrame()
 for c in range(6):
-    
-    session_df = pd.concat([pos_word_df.loc[range(20 * c, 20 * c + 20)], 
-                            neg_word_df.loc[range(20 * c, 20 * c + 20)],
-                            neu_word_df.loc[range(20 * c, 20 * c + 20)]], axis = 0) 
-    session_df['label'] = repeat(['pos', 'neg', 'neu'], repeats = 20)
-    session_df['session'] = c + 1 
-    all_words_df = all_words_df.append(session_df)
+    session_df = selected_df[selected_df.session == c + 1]
+    all_words_df = pd.concat([all_words_df, session_df[['Word','PC1', 'affect_V.Mean.Sum', 'label', 'session']]], axis = 0)
 
 # Save format
 all_words_df.columns = ['word', 'score_pc', 'score_warriner', 'label', 'session']
@@ -100,6 +99,9 @@ all_words_summary = all_words_summary.reset_index()
 all_words_summary.columns = list(['_'.join(col).strip() for col in all_words_summary.columns.values])
 all_words_summary.columns.values[[0,1]] = array(['session','label'])
 
+# Largest difference between sessions, per label
+balance.report(all_words_df, ['score_pc', 'score_warriner'])
+
 # Store summary info in tsv file
 all_words_summary.to_csv(wd + 'summary_info_sessions.txt', sep = '\t') 
 
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The norms of pliers' predefined dictionaries (Warriner's affect ratings, ...)
+as a local lexicon file, looked up for many words at once.
+
+generate_wordlist.py found the Warriner valence of the Binder words with
+pliers: a ComplexTextStim of all 535 words, PredefinedDictionaryExtractor on
+every word, the stim names cut back to words with .str[5:-1], and an outer
+merge. That takes pliers, its dictionary download and a while, on every run.
+A Lexicon is the dictionaries' columns as one numpy .npz file: the words,
+lower case and sorted, and a float array of their norms. It is made once,
+with pliers, and then read without it:
+
+    python lexicon.py affect/V.Mean.Sum        # -> lexicon.npz
+
+    norms = lexicon.load('lexicon.npz', ['affect/V.Mean.Sum'])
+    binder_data['affect_V.Mean.Sum'] = norms.lookup(binder_data['Word'], 'affect_V.Mean.Sum')
+
+Variables are named like in PredefinedDictionaryExtractor ('dictionary/column')
+and come out with the names of its results ('dictionary_column'). Like the
+extractor, the lookup is not case sensitive, and words which are not in the
+dictionary get NaN. load() adds the variables which are not in the file yet
+(which needs pliers, once).
+"""
+
+import os
+
+import numpy as np
+
+
+def column(variable):
+    """The name of :variable: in the results, e.g. 'affect/V.Mean.Sum' -> 'affect_V.Mean.Sum'."""
+    return variable.replace('/', '_', 1)
+
+
+def fetch(variables):
+    """
+    The norms of :variables: from pliers' predefined dictionaries, as a Lexicon.
+        :variables: e.g. ['affect/V.Mean.Sum', 'affect/A.Mean.Sum']
+    """
+    import pandas as pd
+    from pliers.datasets.text import fetch_dictionary
+
+    lexicon = Lexicon(np.array([], 'U1'), np.zeros((0, 0)), [])
+    dictionaries = {}
+    for variable in variables:
+        dictionary, name = variable.split('/', 1)
+        dictionaries.setdefault(dictionary, []).append(name)
+    for dictionary, names in dictionaries.items():
+        data = fetch_dictionary(dictionary)
+        data.index = data.index.astype(str).str.lower()  # as the extractor does, unless case_sensitive
+        data = data[~data.index.duplicated()]
+        values = data[names].apply(pd.to_numeric, errors='coerce').values
+        order = np.argsort(data.index.values.astype(str))
+        lexicon = lexicon.merge(Lexicon(data.index.values.astype(str)[order], values[order],
+                                        ['%s_%s' % (dictionary, name) for name in names]))
+    return lexicon
+
+
+class Lexicon(object):
+    def __init__(self, words, values, columns):
+        """
+            :words: (array of str) lower case and sorted
+            :values: (n words x n columns) the norms, NaN where a word has none
+            :columns: the names of the columns, e.g. ['affect_V.Mean.Sum']
+        """
+        self.words = words
+        self.values = values
+        self.columns = list(columns)
+
+    def merge(self, other):
+        """A Lexicon with the words and columns of both (this one's columns first)."""
+        words = np.union1d(self.words, other.words)
+        values = np.full((len(words), len(self.columns) + len(other.columns)), np.nan)
+        values[np.searchsorted(words, self.words), :len(self.columns)] = self.values
+        values[np.searchsorted(words, other.words), len(self.columns):] = other.values
+        return Lexicon(words, values, self.columns + other.columns)
+
+    def lookup(self, words, columns=None):
+        """
+        The norms of :words: (NaN for words which are not in the lexicon).
+            :words: (str or list/Series of str)
+            :columns: a column (returns an array of a value per word) or a list
+                of columns (returns n words x n columns). Default is all columns
+        """
+        single = isinstance(columns, str)
+        columns = [columns] if single else self.columns if columns is None else list(columns)
+        missing = [name for name in columns if name not in self.columns]
+        if missing:
+            raise KeyError('the lexicon has no %s, only %s' % (', '.join(missing), ', '.join(self.columns)))
+        words = np.char.lower(np.atleast_1d(np.asarray(words, dtype=str)))
+        rows = np.searchsorted(self.words, words).clip(max=max(len(self.words) - 1, 0))
+        found = (self.words[rows] == words) if len(self.words) else np.zeros(len(words), bool)
+        out = np.full((len(words), len(columns)), np.nan)
+        out[found] = self.values[rows[found]][:, [self.columns.index(name) for name in columns]]
+        return out[:, 0] if single else out
+
+    def save(self, filename):
+        with open(filename + '.tmp', 'wb') as f:
+            np.savez(f, words=self.words, values=self.values, columns=np.array(self.columns))
+        os.replace(filename + '.tmp', filename)  # never a half-written lexicon
+
+
+def load(filename='lexicon.npz', variables=()):
+    """
+    The Lexicon in :filename:. The :variables: (e.g. ['affect/V.Mean.Sum'])
+    which are not in it yet are fetched with pliers and saved to it first.
+    """
+    if os.path.exists(filename):
+        with np.load(filename) as arrays:
+            lexicon = Lexicon(arrays['words'], arrays['values'], arrays['columns'].tolist())
+    else:
+        lexicon = Lexicon(np.array([], 'U1'), np.zeros((0, 0)), [])
+    missing = [variable for variable in variables if column(variable) not in lexicon.columns]
+    if missing:
+        lexicon = lexicon.merge(fetch(missing))
+        lexicon.save(filename)
+    return lexicon
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Adds the norms of pliers\' predefined dictionaries to a lexicon file')
+    parser.add_argument('variables', nargs='*', default=['affect/V.Mean.Sum'], help='e.g. affect/V.Mean.Sum')
+    parser.add_argument('--file', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicon.npz'))
+    args = parser.parse_args()
+
+    lexicon = load(args.file, args.variables)
+    start = time.perf_counter()
+    lexicon = load(args.file, args.variables)
+    loaded = time.perf_counter() - start
+    words = lexicon.words[np.random.permutation(len(lexicon.words))[:1000]]
+    start = time.perf_counter()
+    lexicon.lookup(words)
+    print('%s: %i words, %s; loads in %.1f ms, looks up 1000 words in %.1f ms' % (
+        args.file, len(lexicon.words), ', '.join(lexicon.columns), loaded * 1000, (time.perf_counter() - start) * 1000))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The Binder ratings workbook as typed columns, one numpy file each, read
+through memory maps.
+
+generate_wordlist.py read the whole of WordSet1_Ratings.xlsx with
+pd.read_excel on every run, for the 7 of its 80 columns it uses, and parsing
+the workbook is the slowest step of the pipeline. convert() reads it once and
+writes each column as a .npy file (float, int or fixed width text) to a
+folder next to it, with a meta.json of the column names, their files and
+types, and the SHA-256 of the workbook:
+
+    python ratings.py WordSet1_Ratings.xlsx      # -> WordSet1_Ratings.columns/
+
+load() memory maps only the columns asked for, and converts the workbook
+again first if there is no folder yet, or if the workbook has changed since
+(its hash is not the one in meta.json):
+
+    binder_data = pd.DataFrame(ratings.load(path_to_binder, ['Word', 'Pleasant', 'Unpleasant', 'Happy', 'Sad']))
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+META = 'meta.json'
+
+
+def folder_of(source):
+    """The folder of the columns of :source:, e.g. 'WordSet1_Ratings.xlsx' -> 'WordSet1_Ratings.columns'."""
+    return os.path.splitext(source)[0] + '.columns'
+
+
+def digest(source):
+    """The SHA-256 of the file :source:, as hex."""
+    sha = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _typed(values):
+    """A column of a DataFrame as a numpy array that can be memory mapped."""
+    if values.dtype.kind in 'biuf':
+        return values.to_numpy()
+    text = values.fillna('').astype(str).to_numpy()
+    return text.astype('U%i' % max([1] + [len(value) for value in text]))
+
+
+def write(frame, folder, sha256=''):
+    """
+    Writes each column of the DataFrame :frame: to :folder:, with the
+    meta.json of the columns.
+        :sha256: of the file the frame was read from
+    """
+    meta = {'sha256': sha256, 'rows': len(frame), 'columns': []}
+    if os.path.isdir(folder + '.tmp'):
+        shutil.rmtree(folder + '.tmp')
+    os.makedirs(folder + '.tmp')
+    for number, name in enumerate(frame.columns):
+        array = _typed(frame[name])
+        filename = '%03i.npy' % number  # the names have spaces, e.g. 'L10 FREQ'
+        np.save(os.path.join(folder + '.tmp', filename), array)
+        meta['columns'].append({'name': str(name), 'file': filename, 'dtype': array.dtype.str})
+    with open(os.path.join(folder + '.tmp', META), 'w') as f:
+        json.dump(meta, f, indent=1)
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+    os.rename(folder + '.tmp', folder)  # never a half-written folder
+
+
+def convert(source, folder=None):
+    """Reads the workbook :source: and writes its columns to :folder:
+    (default: next to it, see folder_of())."""
+    import pandas as pd
+
+    write(pd.read_excel(source), folder or folder_of(source), digest(source))
+
+
+def _meta(folder):
+    try:
+        with open(os.path.join(folder, META)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(source, columns=None):
+    """
+    {column: memory mapped array} of the workbook :source:, in the order of
+    :columns: (default: all). Converts the workbook first if it has no
+    columns folder yet, or if it has changed since.
+    """
+    folder = folder_of(source)
+    meta = _meta(folder)
+    if meta is None or meta['sha256'] != digest(source):
+        convert(source, folder)
+        meta = _meta(folder)
+    files = dict((column['name'], column['file']) for column in meta['columns'])
+    columns = list(files) if columns is None else columns
+    missing = [name for name in columns if name not in files]
+    if missing:
+        raise KeyError('%s has no column %s' % (source, ', '.join(missing)))
+    return dict((name, np.load(os.path.join(folder, files[name]), mmap_mode='r')) for name in columns)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    for source in sys.argv[1:] or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'WordSet1_Ratings.xlsx')]:
+        start = time.perf_counter()
+        convert(source)
+        converted = time.perf_counter() - start
+        start = time.perf_counter()
+        data = load(source, ['Word', 'Pleasant', 'Unpleasant', 'Happy', 'Sad'])
+        print('%s: %i columns, %i rows; read_excel and convert %.0f ms, then load 5 columns %.1f ms' % (
+            folder_of(source), len(_meta(folder_of(source))['columns']), len(data['Word']),
+            converted * 1000, (time.perf_counter() - start) * 1000))
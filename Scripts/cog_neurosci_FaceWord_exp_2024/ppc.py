@@ -10,15 +10,16 @@ functions in use in the ppc3_template.py and in ppc2_timing.py.
 
 Jonas Lindeløv
 
+Needs Python 3 (e.g. timeit's globals, os.replace, tempfile.TemporaryDirectory
+and atexit.unregister). The python 2 branches are gone.
+
 TO DO:
  * add UTC times in csvWriter?
  * Remove sound or make it a dummy-one which drops back to psychopy
  * Use PEP8 names instead of camelCase
 """
 
-# Check python version
 import sys
-python3 = sys.version_info[0] == 3
 
 
 class Sound(object):
@@ -48,43 +49,131 @@ class Sound(object):
         self._winsound.Beep(frequency, duration / float(1000))
 
 
-def timer(script, setup='', timeScale=False, runs=False):
+def _percentile(ordered, q):
+    """The q'th percentile (0-100) of a sorted list, interpolating between samples."""
+    position = (len(ordered) - 1) * q / 100.
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def timer(script, setup='', timeScale=False, runs=False, repeat=False, save=False, baseline=False, tolerance=0.1, namespace=None):
     """
-    Times code snippets and returns average duration in seconds.
+    Times code snippets and prints the distribution of the duration of one run:
+    min, median, 95th and 99th percentile and max. For frame-critical code the
+    tail (p99, max) is what matters, not the average.
+    Returns a dictionary with the statistics (in seconds) and all the samples.
 
     :script: a string to be timed
     :setup: a comma-separated string specifying methods and variables to be imported from __main__
     :timeScale: the unit for seconds. 10**-9 = nanoseconds. If False, the scale is automagically determined as s, ms, us or ns
-    :runs: how many times to run the script. If False, the number of runs is automagically determine from 3 testruns, trying to keep the total test duration around a second but at least 10 runs and at most 10**6 runs.
+    :runs: how many times to run the script per sample. If False, it is the smallest number which makes a sample last at least 50 us, so slower code is timed one call at a time.
+    :repeat: how many samples to take. If False, enough to last around a second but at least 30 and at most 10**4.
+    :save: optionally a filename to save the results to as JSON
+    :baseline: optionally a filename of earlier saved results (or the returned dictionary). Prints a REGRESSION if the median or p95 got more than :tolerance: slower.
+    :tolerance: allowed slow-down relative to the baseline. 0.1 = 10 %.
+    :namespace: optionally a dictionary to run the script in, instead of importing :setup: from __main__
+
+    Garbage collection is done before sampling and is off while sampling.
+    The time of an empty loop is subtracted, but never below zero.
     """
-    if setup:
+    if setup and namespace is None:
         setup = 'from __main__ import ' + setup
+    elif namespace is not None:
+        setup = ''
 
+    import gc
+    import time
     import timeit
-    timeit.timeit(number=10**7)  # get the computer's attention/ressources. First run is slower.
+    timing = timeit.Timer(script, setup=setup, timer=time.perf_counter, globals=namespace)
+
+    # Warm up caches and the CPU clock on the actual script for ~0.1 s.
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.1:
+        timing.timeit(number=1)
 
-    # optional: determine appropriate number of runs from 3 test runs
+    # optional: determine appropriate number of runs per sample
     if not runs:
-        result = timeit.timeit(script, setup=setup, number=3)
-        runs = int(3 / result) if result > 0 else 10 ** 6
-        if runs > 10 ** 6:
-            runs = 10 ** 6  # a million at most
-        if runs < 10:
-            runs = 10  # ten at least
-
-    # Actually do the timing
-    baseline = timeit.timeit(setup=setup, number=runs)  # the time it takes to run an empty script
-    result = timeit.timeit(script, setup=setup, number=runs)  # Run the test!
-    mean = (result - baseline) / runs  # in seconds
+        runs = 1
+        while runs < 10 ** 6 and timing.timeit(number=runs) < 5 * 10 ** -5:
+            runs *= 10  # at most a million
+    if not repeat:
+        repeat = min(max(int(1 / (timing.timeit(number=runs) or 10 ** -9)), 30), 10 ** 4)
+
+    # Per-run cost of the timing loop itself
+    empty = timeit.Timer(setup=setup, timer=time.perf_counter, globals=namespace)
+    overhead = min(empty.timeit(number=runs) for i in range(5)) / runs
+
+    # Actually do the timing. Garbage is collected once up front and the
+    # collector stays off, so no sample pays for the garbage of the others.
+    samples = []
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            samples += [max(timing.timeit(number=runs) / runs - overhead, 0.0)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    ordered = sorted(samples)
+    result = {
+        'script': script,
+        'setup': setup,
+        'runs': runs,
+        'repeat': repeat,
+        'min': ordered[0],
+        'median': _percentile(ordered, 50),
+        'p95': _percentile(ordered, 95),
+        'p99': _percentile(ordered, 99),
+        'max': ordered[-1],
+        'mean': sum(samples) / repeat,
+        'overhead': overhead,
+        'samples': samples,
+        'python': sys.version.split()[0],
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
 
     # Optional: determine appropriate timeScale for reporting
+    median = result['median']
     if not timeScale:
-        timeScale = 1 if mean > 1 else 10**-3 if mean > 10**-3 else 10**-6 if mean > 10**-6 else 10**-9
+        timeScale = 1 if median > 1 else 10**-3 if median > 10**-3 else 10**-6 if median > 10**-6 else 10**-9
     unit = 's' if timeScale == 1 else 'ms' if timeScale == 10**-3 else 'us' if timeScale == 10**-6 else 'ns' if timeScale == 10**-9 else '*' + str(timeScale)
 
     # Print results
     print('\n\'', script, '\'')
-    print('AVERAGE:', round(mean / timeScale, 3), unit, 'from', runs, 'runs')
+    print(' '.join('%s: %s' % (name.upper(), round(result[name] / timeScale, 3)) for name in ('min', 'median', 'p95', 'p99', 'max')),
+          unit, 'from', repeat, 'samples of', runs, 'runs')
+
+    if save:
+        import json
+        with open(save, 'w') as f:
+            json.dump(result, f, indent=1)
+    if baseline:
+        result['regression'] = compare(result, baseline, tolerance)
+    return result
+
+
+def compare(result, baseline, tolerance=0.1):
+    """
+    Compares a result from timer() with a baseline and prints the relative
+    change of median, p95 and p99. Returns True if the median or p95 got more
+    than :tolerance: slower.
+
+    :result: a dictionary from timer()
+    :baseline: a dictionary from timer() or the filename of one saved as JSON
+    :tolerance: allowed slow-down. 0.1 = 10 %.
+    """
+    if not isinstance(baseline, dict):
+        import json
+        with open(baseline) as f:
+            baseline = json.load(f)
+
+    changes = dict((name, result[name] / baseline[name] - 1 if baseline[name] else 0.0) for name in ('median', 'p95', 'p99'))
+    regression = changes['median'] > tolerance or changes['p95'] > tolerance
+    print('REGRESSION' if regression else 'OK', 'compared to baseline from', baseline.get('date', '?') + ':',
+          ' '.join('%s %+.1f %%' % (name, change * 100) for name, change in sorted(changes.items())))
+    return regression
 
 
 def deg2cm(angle, distance):
@@ -100,8 +189,13 @@ def deg2cm(angle, distance):
     return math.tan(math.radians(angle)) * distance  # trigonometry
 
 
+# Markers put on the csv_writer queue next to the trials in threaded mode
+_SYNC = 'sync'
+_STOP = 'stop'
+
+
 class csv_writer(object):
-    def __init__(self, filename_prefix='', folder='', column_order=[]):
+    def __init__(self, filename_prefix='', folder='', column_order=[], threaded=False, queue_size=100, journal=None, monitor=None):
         """
         Take a dictionary and write it to a csv file as a row.
         Writing is very fast - less than a microsecond.
@@ -109,6 +203,22 @@ class csv_writer(object):
         :filename_prefix: (str) would usually be the id of the participant
         :folder: (str) optionally use/create a folder.
         :column_order: (list) The columns to put first in the csv. Some or all.
+        :threaded: (bool) If True, write() only puts a copy of the trial on a queue
+            and returns at once. A background thread encodes the rows and saves
+            them to disk, so neither write() nor flush() ever blocks the frame loop.
+            Remember to call close() before core.quit() so nothing is lost.
+        :queue_size: (int) In threaded mode, the number of trials that may wait
+            in the queue before write() blocks.
+        :journal: (class) Optionally also append every trial to a crash-safe
+            journal next to the csv file, e.g. faceword.journal.TrialJournal.
+            It is called with the journal's filename and needs the methods
+            write_header, write_row, rewrite, commit and close. flush() then only
+            fsyncs the journal instead of reopening the csv. After a crash,
+            run "python -m faceword.journal <file.journal>" to rebuild the csv.
+        :monitor: (monitor.TrialMonitor) Optionally publish every trial to this
+            live monitor when it is written, so it can be followed from another
+            process (see monitor.py). Costs a few microseconds, no I/O.
+            rewrite() publishes the trials again, as updates.
 
         Use like:
 
@@ -121,13 +231,20 @@ class csv_writer(object):
 
             # Optional: forces save of hitherto collected data to disk.
             # writer.flush()
+
+            # Before quitting: saves everything and closes the file.
+            writer.close()
         """
 
         import os
         import time
 
         self.column_order = column_order
+        self.threaded = threaded
+        self.monitor = monitor
         self._header_written = False
+        self._closed = False
+        self._error = None
 
         # Create folder if it doesn't exist
         if folder:
@@ -138,20 +255,46 @@ class csv_writer(object):
         # Generate self.save_file and self.writer
         self.save_file = '%s%s (%s).csv' % (folder, filename_prefix, time.strftime('%Y-%m-%d %H-%M-%S', time.localtime()))  # Filename for csv. E.g. "myFolder/subj1_cond2 (2013-12-28 09-53-04).csv"
         self._setup_file()
+        self._journal_class = journal
+        self.journal = None
+        if journal:
+            self.journal = journal(self.save_file[:-len('.csv')] + '.journal')
+
+        # Start the background writer. It is a daemon so a forgotten close()
+        # can't hang the experiment; atexit drains it on a normal core.quit().
+        if threaded:
+            import atexit
+            import queue
+            import threading
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name='csv_writer')
+            self._thread.daemon = True
+            self._thread.start()
+            atexit.register(self.close)
 
     def _setup_file(self):
-        """Setting up the self.writer depends on python version."""
+        """Opens the csv file for appending and sets up self.writer."""
         import csv
 
-        if python3:
-            self._file = open(self.save_file, 'a', newline='')
-        else:
-            self._file = open(self.save_file, 'wb')
+        self._file = open(self.save_file, 'a', newline='')
 
         self.writer = csv.DictWriter(self._file, fieldnames=self.column_order)  # The writer function to csv. It appends a single row to file
 
     def write(self, trial):
         """Saves a trial to buffer. :trial: a dictionary"""
+        if self._closed:  # in threaded mode no thread would take it off the queue any more
+            raise ValueError('write() to a closed csv_writer: %s' % self.save_file)
+        if self.monitor is not None:
+            self.monitor.publish(trial)
+        if self.threaded:
+            if self._error is not None:
+                raise self._error
+            self._queue.put(dict(trial))  # a copy, so the caller may reuse the dict
+            return
+        self._write_row(trial)
+
+    def _write_row(self, trial):
+        """Encodes a trial as a csv row in the file buffer."""
         # Write header and add fieldnames on first trial
         if self.writer.fieldnames is None:
             self.writer.fieldnames = list(trial.keys())
@@ -167,19 +310,176 @@ class csv_writer(object):
         # Write header if it hasn't been
         if not self._header_written:
             self.writer.writeheader()
+            if self.journal:
+                self.journal.write_header(self.writer.fieldnames)
             self._header_written = True
 
         # Now write data
-        self.writer.writerow(trial)  # Works both in python2 and python3
-        
+        self.writer.writerow(trial)
+        if self.journal:
+            self.journal.write_row(self.writer.fieldnames, trial)
+
+    def _sync(self):
+        """Pushes the file buffer all the way to the disk. With a journal,
+        only the journal needs to reach the disk."""
+        if self.journal:
+            self.journal.commit()
+            return
+        import os
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _run(self):
+        """The background thread in threaded mode. Takes everything that has
+        queued up since last time, encodes it and fsyncs when asked to."""
+        import queue
+
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                try:
+                    if item is _STOP:
+                        return
+                    elif item is _SYNC:
+                        self._sync()
+                    else:
+                        self._write_row(item)
+                except Exception as error:  # raised in the main thread on next write() or close()
+                    self._error = error
+
     def flush(self):
         """Saves current content to file.
         This will happen automatically when the script terminates.
         Only do this if you fear a hard crash. It's mostly fast (< 1 ms) but can be slow (up to 30 ms)
+        In threaded mode it only asks the writer thread to save, so it returns at once.
+        With a journal it fsyncs the journal (all trials since last flush in one go).
+        A good time to call it is at the start of the inter-trial fixation.
         """
+        if self.threaded:
+            if not self._closed:
+                self._queue.put(_SYNC)
+            return
+        if self.journal:
+            self.journal.commit()
+            return
         self._file.close()
         self._setup_file()
 
+    def close(self):
+        """Waits for all queued trials to be written, saves them to disk and
+        closes the file. Call it in every quit-path, before core.quit().
+        It is safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.threaded:
+            self._queue.put(_STOP)
+            self._thread.join()
+            import atexit
+            atexit.unregister(self.close)  # so a closed writer is not kept alive until exit
+        import os
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if self.journal:
+            self.journal.close()
+        if self._error is not None:
+            raise self._error
+
+    def rewrite(self, trials):
+        """
+        Replaces the rows of the csv file by :trials:, e.g. the same trials
+        once their responses are scored. Call it after close(). The columns
+        stay those of the file, and the new file replaces the old one in one
+        go, so a crash leaves either of them, never half a file. The journal
+        records the replacement just before, so a csv recovered from it is
+        the new rows too (see journal.py). With a monitor, the trials are published
+        again as updates of the ones published by write().
+        """
+        import csv
+        import os
+
+        fieldnames = self.writer.fieldnames or (list(trials[0].keys()) if trials else [])
+        tmp = self.save_file + '.tmp'
+        f = open(tmp, 'w', newline='')
+        try:
+            with f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(trials)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:  # e.g. a trial with a column the file does not have: the old file stays
+            os.remove(tmp)
+            raise
+        if self.journal:
+            journal = self._journal_class(self.journal.filename)  # closed by close(), so open it again to append
+            journal.rewrite(fieldnames, trials)
+            journal.close()
+        os.replace(tmp, self.save_file)
+        if self.monitor is not None:
+            for trial in trials:
+                self.monitor.publish(trial, update=True)
+
+
+def csv_writer_latency(trials=120, gap=1 / 60., folder=None, journal=None):
+    """
+    Measures how long csv_writer.write() and .flush() block the caller, as seen
+    from the frame loop, in normal, threaded and journaled mode. Prints mean, 99th
+    percentile and worst case. A trial is written and flushed like in the
+    experiment scripts. Returns {mode: statistics in seconds} with the same
+    keys as timer() so results can be compared with compare().
+        :trials: number of trials to write in each mode.
+        :gap: seconds between trials, i.e. the frames shown in between.
+        :folder: where to put the test files. Default is a temporary folder.
+        :journal: the journal class for the journaled mode, see csv_writer.
+            Without it, only normal and threaded mode are measured.
+    """
+    import tempfile
+    import time
+
+    # A trial looking like the ones in the WordFace scripts
+    trial = dict([('field_%i' % i, 'value') for i in range(20)] +
+                 [('onset_%i' % i, 123.4567891234) for i in range(9)])
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temporary:
+        folder = folder or temporary
+        modes = ((False, None), (True, None)) + (((True, journal),) if journal else ())
+        for threaded, journal_class in modes:
+            writer = csv_writer('latency_test', folder=folder, threaded=threaded, journal=journal_class)
+            durations = []
+            for i in range(trials):
+                trial['no'] = i + 1
+                start = time.perf_counter()
+                writer.write(trial)
+                writer.flush()
+                durations += [time.perf_counter() - start]
+                time.sleep(gap)
+            start = time.perf_counter()
+            writer.close()
+            close_duration = time.perf_counter() - start
+
+            # Print summary
+            durations.sort()
+            mode = ('threaded' if threaded else 'normal') + (' with journal' if journal_class else '')
+            results[mode] = {'min': durations[0], 'median': _percentile(durations, 50), 'p95': _percentile(durations, 95),
+                             'p99': _percentile(durations, 99), 'max': durations[-1], 'mean': sum(durations) / trials,
+                             'repeat': trials, 'runs': 1, 'close': close_duration,
+                             'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+            print(mode, 'csv_writer: write() + flush() blocked for')
+            print('    average', round(results[mode]['mean'] * 1000, 3), 'ms, 99th percentile',
+                  round(results[mode]['p99'] * 1000, 3), 'ms, worst',
+                  round(durations[-1] * 1000, 3), 'ms from', trials, 'trials')
+            print('    close() took', round(close_duration * 1000, 3), 'ms')
+    return results
+
 
 def getActualFrameRate(frames=1000):
     """
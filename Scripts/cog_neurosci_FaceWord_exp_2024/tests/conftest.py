@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+The tests import the experiment's modules as the scripts do: the faceword
+package, ppc and triggers from the experiment folder, and the word list tools
+from generate_wordlist/.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+EXPERIMENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for folder in (EXPERIMENT, os.path.join(EXPERIMENT, 'generate_wordlist')):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
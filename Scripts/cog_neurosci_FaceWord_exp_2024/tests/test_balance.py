@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Splitting the words into alike sessions, see balance.py.
+
+    python -m pytest tests/test_balance.py
+"""
+
+import numpy as np
+
+import balance
+
+
+def _words(n_per_label=60, seed=3):
+    rng = np.random.default_rng(seed)
+    labels = np.repeat(['pos', 'neg', 'neu'], n_per_label)
+    values = np.column_stack([rng.normal(size=len(labels)), rng.gamma(2., size=len(labels))])
+    return values, labels
+
+
+def test_sessions_get_the_same_labels():
+    values, labels = _words()
+    groups, cost = balance.balance(values, 6, strata=labels, seed=1)
+    counts = np.array([[np.sum((groups == group) & (labels == label)) for group in range(6)] for label in ('pos', 'neg', 'neu')])
+    assert (counts == 10).all()
+    strata = np.unique(labels, return_inverse=True)[1]
+    assert np.isclose(cost, balance.cost(balance.features(values, strata), groups, strata))
+
+
+def test_better_than_random_splits():
+    values, labels = _words()
+    strata = np.unique(labels, return_inverse=True)[1]
+    X = balance.features(values, strata)
+    groups, cost = balance.balance(values, 6, strata=labels, seed=1)
+    rng = np.random.default_rng(0)
+    random_costs = [balance.cost(X, balance._deal(strata, 6, rng), strata) for i in range(20)]
+    assert cost < min(random_costs) / 10
+
+    means = balance.differences(values, groups, labels)
+    assert all((difference[:, 0] < 0.2).all() for difference in means.values())  # session means within 0.2 SD
+
+
+def test_exchange_keeps_the_cost_it_reports():
+    values, labels = _words(30)
+    strata = np.unique(labels, return_inverse=True)[1]
+    X = balance.features(values, strata, moments=3)
+    rng = np.random.default_rng(2)
+    groups = balance._deal(strata, 5, rng)
+    before = balance.cost(X, groups, strata)
+    balance.exchange(X, groups, strata, rng, batch=4)
+    assert balance.cost(X, groups, strata) < before
+    assert np.bincount(groups).tolist() == [18] * 5  # swaps keep the session sizes
+
+
+def test_same_seed_same_split():
+    values, labels = _words()
+    assert (balance.balance(values, 6, strata=labels, seed=5)[0] == balance.balance(values, 6, strata=labels, seed=5)[0]).all()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The benchmark suite of benchmark.py, without running the benchmarks.
+
+    python -m pytest tests/test_benchmark.py
+"""
+
+import os
+
+import pytest
+
+from faceword import benchmark
+
+
+def test_refuses_to_run_without_a_baseline(monkeypatch, tmp_path):
+    monkeypatch.setattr(benchmark, 'RESULTS', str(tmp_path))
+    with pytest.raises(SystemExit) as error:
+        benchmark.main()
+    assert 'No baseline' in str(error.value) and '--save-baseline' in str(error.value)
+    assert os.listdir(str(tmp_path)) == []  # nothing was run
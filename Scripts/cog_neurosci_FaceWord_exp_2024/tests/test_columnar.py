@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The typed, columnar copy of the session log, see columnar.py.
+
+    python -m pytest tests/test_columnar.py
+"""
+
+import math
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from faceword import columnar
+
+
+def _trial(no, **fields):
+    """A trial as make_trial_list makes it: the times and responses still empty."""
+    trial = {'ID': '0123', 'session': '2', 'no': no, 'word': 'word%i' % no, 'word_label': 'pos' if no % 2 else 'neg',
+             'word_score_pc': no / 4., 'delay_frames_before': 120, 'onset_img': '', 'rt': '', 'correct_resp': '',
+             'dropped_frames': '', 'response': ''}
+    trial.update(fields)
+    return trial
+
+
+def test_schema_from_the_first_trial():
+    assert dict(columnar.infer_schema(_trial(1))) == {
+        'ID': 'category', 'session': 'category', 'no': 'int', 'word': 'category', 'word_label': 'category',
+        'word_score_pc': 'float', 'delay_frames_before': 'int', 'onset_img': 'float', 'rt': 'float',
+        'correct_resp': 'int', 'dropped_frames': 'int', 'response': 'category'}
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.arrow'])
+def test_round_trip(tmp_path, extension):
+    filename = str(tmp_path / ('0123_sess_2' + extension))
+    columns = columnar.ColumnWriter(_trial(1), filename)
+    columns.write(_trial(1, onset_img=2.7, rt=0.65, correct_resp=1, dropped_frames=0, response='b'))
+    columns.write(_trial(2, onset_img=9.1))  # not answered
+    columns.write(_trial(3, onset_img=15.5, rt=0.5, correct_resp=0, dropped_frames=2, response='y'))
+    columns.close()
+
+    events = columnar.read(filename)
+    assert list(events.columns) == list(_trial(1))
+    assert events['no'].tolist() == [1, 2, 3]
+    assert events['onset_img'].tolist() == [2.7, 9.1, 15.5]
+    assert events['rt'][0] == 0.65 and math.isnan(events['rt'][1])
+    assert events['correct_resp'].tolist()[0::2] == [1, 0] and events['correct_resp'].isna().tolist() == [False, True, False]
+    assert events['response'].tolist()[0::2] == ['b', 'y'] and events['response'].isna()[1]
+    assert str(events['word_label'].dtype) == 'category' and events['word_label'].tolist() == ['pos', 'neg', 'pos']
+
+
+def test_read_only_some_columns(tmp_path):
+    filename = str(tmp_path / 'log.parquet')
+    columns = columnar.ColumnWriter(_trial(1), filename)
+    columns.write(_trial(1, onset_img=2.7, rt=0.65))
+    columns.close()
+    assert list(columnar.read(filename, columns=['onset_img', 'rt']).columns) == ['onset_img', 'rt']
+
+
+def test_unknown_columns_and_file_types_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        columnar.ColumnWriter(_trial(1), str(tmp_path / 'log.csv'))
+    columns = columnar.ColumnWriter(_trial(1), str(tmp_path / 'log.parquet'))
+    with pytest.raises(ValueError):
+        columns.write(_trial(1, extra=1))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The flip times of a run and the dropped frames of each trial, see fliplog.py.
+
+    python -m pytest tests/test_fliplog.py
+"""
+
+from faceword import fliplog
+
+REFRESH = 1 / 60.
+
+
+class _Window(object):
+    """Flips a refresh apart, like a monitor, except for the flips in missed, which come a refresh late."""
+    def __init__(self):
+        self.t = 0.0
+        self.flips = 0
+        self.missed = set()
+
+    def flip(self):
+        self.t += (2 if self.flips in self.missed else 1) * REFRESH
+        self.flips += 1
+        return self.t
+
+
+def _trial(flip_log, win, no, frames=(4, 2, 3, 2)):
+    flip_log.begin(no)
+    for phase, count in zip((fliplog.WORD, fliplog.FIX_BEFORE, fliplog.IMG, fliplog.FIX_AFTER), frames):
+        for frame in range(count):
+            flip_log.flip(win, phase)
+    return flip_log.summary()
+
+
+def test_trial_on_time(tmp_path):
+    flip_log = fliplog.FlipRecorder(60, str(tmp_path / 'flips.npy'))
+    summary = _trial(flip_log, _Window(), 1)
+    assert summary['dropped_frames'] == 0
+    assert abs(summary['max_ifi'] - REFRESH) < 1e-9
+    assert (summary['frames_word'], summary['frames_img']) == (4, 3)
+
+
+def test_missed_refresh_in_the_image(tmp_path):
+    flip_log = fliplog.FlipRecorder(60, str(tmp_path / 'flips.npy'))
+    win = _Window()
+    _trial(flip_log, win, 1)
+    win.missed = {11 + 4 + 2 + 1}  # the second flip of the image of trial 2 comes a refresh late
+    summary = _trial(flip_log, win, 2)
+    assert summary['dropped_frames'] == 1
+    assert abs(summary['max_ifi'] - 2 * REFRESH) < 1e-9
+    assert (summary['frames_word'], summary['frames_img']) == (4, 4)  # the face was on for a refresh too long
+
+
+def test_gap_before_the_trial_counts(tmp_path):
+    flip_log = fliplog.FlipRecorder(60, str(tmp_path / 'flips.npy'))
+    win = _Window()
+    _trial(flip_log, win, 1)
+    win.missed = {11}  # the first flip of trial 2, i.e. the gap after trial 1
+    assert _trial(flip_log, win, 2)['dropped_frames'] == 1
+
+
+def test_stimulus_still_on_the_screen_is_not_counted(tmp_path):
+    flip_log = fliplog.FlipRecorder(60, str(tmp_path / 'flips.npy'))
+    summary = _trial(flip_log, _Window(), 1, frames=(4, 2, 3, 0))  # cut short: nothing replaced the face yet
+    assert summary['frames_word'] == 4 and summary['frames_img'] == ''
+
+
+def test_buffer_grows_and_saves_every_flip(tmp_path):
+    flip_log = fliplog.FlipRecorder(60, str(tmp_path / 'flips.npy'), frames=5)
+    win = _Window()
+    for no in (1, 2, 3):
+        _trial(flip_log, win, no)
+    flip_log.close()
+
+    flips = fliplog.load(str(tmp_path / 'flips.npy'))
+    assert len(flips) == 33
+    assert flips.trial.tolist() == [1] * 11 + [2] * 11 + [3] * 11
+    assert flips.phase[:11].tolist() == [1] * 4 + [2] * 2 + [3] * 3 + [4] * 2
+    assert abs(flips.t[-1] - 33 * REFRESH) < 1e-9
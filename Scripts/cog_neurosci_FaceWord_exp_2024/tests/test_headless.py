@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Running the experiment scripts without a screen, see headless.py.
+
+    python -m pytest tests/test_headless.py
+"""
+
+import csv
+import os
+import sys
+
+import pytest
+
+from faceword import headless
+from faceword import monitor
+
+
+def _trials(session):
+    trials = []
+    for log in session.logs():
+        with open(log, newline='') as f:
+            trials += list(csv.DictReader(f))
+    return trials
+
+
+def test_run_on_the_virtual_clock(tmp_path):
+    cwd = os.getcwd()
+    flips = []
+    session = headless.run('WordFace_exp_behav.py', workdir=str(tmp_path), info={'ID': 'dry', 'session': 3},
+                           responder=lambda session, t: flips.append(t))
+    trials = _trials(session)
+
+    # A flip per frame of every trial, after the intro and the second of fixation before the first word.
+    # The behavioural script goes from the word to the face without the fixation between them
+    frames = sum(2 * int(trial['duration_frames']) + int(trial['delay_frames_after'])
+                 for trial in trials)
+    assert session.flips == len(flips) == 1 + 60 + frames
+    assert abs(session.now - session.flips / 60.) < 1e-6  # a refresh per flip, nothing else
+    assert all(abs(later - earlier - 1 / 60.) < 1e-9 for earlier, later in zip(flips, flips[1:]))
+    assert session.wall < session.now
+
+    # The dialog's answers and the input files
+    assert len(trials) == 60 and set(trial['ID'] for trial in trials) == {'dry'}
+    assert set(trial['session'] for trial in trials) == {'3'}
+    assert {'wordlist.txt', 'image_stim_p.png', 'image_stim_n.png'} <= set(os.listdir(str(tmp_path)))
+    assert session.triggers == []  # the behavioural script has no port
+
+    # Everything is as it was
+    assert os.getcwd() == cwd
+    assert 'psychopy' not in sys.modules and 'triggers' not in sys.modules
+
+
+def test_triggers_and_measured_durations(tmp_path):
+    session = headless.run('WordFace_exp_scanner_MEG.py', workdir=str(tmp_path), info={'ID': 'dry'})
+    trials = _trials(session)
+    assert len(session.logs()) == 6 and len(trials) == 360  # a log per run
+    assert all(abs(float(trial['duration_measured_word']) - 0.7) < 1e-6 for trial in trials)
+    assert all(trial['dropped_frames'] == '0' for trial in trials)
+    codes = [code for t, code in session.triggers if code]
+    assert len(codes) == 3 * len(trials) + 1  # word, pause and face of every trial, and the probe of the port
+    assert all(code == 0 for t, code in session.triggers[1::2])  # every trigger is pulled down again
+
+
+def test_keys_are_timestamped_when_pressed(tmp_path):
+    def press(session, t):
+        if any(getattr(stim, 'image', None) for stim in session.shown):
+            session.press('b', t + 0.5)
+    trials = _trials(headless.run('WordFace_exp_behav.py', workdir=str(tmp_path), info={'ID': 'dry'}, responder=press))
+    assert all(trial['response'] == 'b' for trial in trials)
+    assert all(abs(float(trial['rt']) - (0.5 + 1 / 60.)) < 1e-6 for trial in trials)  # the first face flip is a refresh after onset_img
+
+
+def test_runs_without_pyarrow(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)  # import pyarrow raises ImportError
+    session = headless.run('WordFace_exp_behav.py', workdir=str(tmp_path), info={'ID': 'dry'})
+    assert len(_trials(session)) == 60
+    assert session.logs('*.parquet') == []
+    assert 'WARNING: pyarrow is not installed' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('quit_key', [None, 'q'])
+def test_live_monitor_is_closed(tmp_path, monkeypatch, quit_key):
+    closed = []
+    close = monitor.TrialMonitor.close
+    monkeypatch.setattr(monitor.TrialMonitor, 'close', lambda self: closed.append(self) or close(self))
+
+    def press(session, t):
+        if quit_key and any(getattr(stim, 'image', None) for stim in session.shown):
+            session.press(quit_key, t + 0.1)
+    session = headless.run('WordFace_exp_scanner_MEG.py', workdir=str(tmp_path), info={'ID': 'dry'}, responder=press)
+    assert len(closed) == 1 and closed[0]._map.closed
+    assert len(_trials(session)) == (0 if quit_key else 360)  # quit during the first trial
+
+
+def test_real_time_clock():
+    session = headless.Session(realtime=True)
+    start = session.now
+    session.advance(10.)
+    assert 0 <= session.now - start < 1.
+
+
+def test_files_left_open_are_flushed(tmp_path):
+    # Like the old MEG script's writer, which was never flushed nor closed
+    script = tmp_path / 'unflushed.py'
+    script.write_text(u"log = open('log.txt', 'w')\n"
+                      u"def write(text):\n"
+                      u"    log.write(text)\n"
+                      u"write('trial 1')\n")
+    headless.run(str(script), workdir=str(tmp_path / 'run'))
+    assert (tmp_path / 'run' / 'log.txt').read_text() == 'trial 1'
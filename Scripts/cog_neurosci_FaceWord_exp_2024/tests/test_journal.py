@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recovery of the csv log from the journal after a crash, see journal.py.
+
+    python -m pytest tests/test_journal.py
+"""
+
+import csv
+import os
+
+from faceword import journal
+import ppc
+
+
+def _trial(no):
+    return {'no': no, 'word': 'word%i' % no, 'onset_img': no * 7.25, 'response': '', 'key_events': 'y:%.6f' % (no * 7.5)}
+
+
+def _crash(writer):
+    """Lets go of the files the way a dying process would: no close(), no flush of the csv."""
+    writer.journal._file.close()
+
+
+def _rows(filename):
+    with open(filename, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_recover_after_crash_mid_run(tmp_path):
+    writer = ppc.csv_writer('crash', folder=str(tmp_path), journal=journal.TrialJournal)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    writer.flush()  # the fixation of trial 4
+    writer.write(_trial(4))
+    _crash(writer)
+
+    rows = _rows(journal.recover(writer.save_file[:-len('.csv')] + '.journal'))
+    assert [row['no'] for row in rows] == ['1', '2', '3', '4']
+    assert rows[1] == dict((key, str(value)) for key, value in _trial(2).items())
+
+
+def test_recover_stops_at_half_written_record(tmp_path):
+    writer = ppc.csv_writer('crash', folder=str(tmp_path), journal=journal.TrialJournal)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    _crash(writer)
+    filename = writer.save_file[:-len('.csv')] + '.journal'
+    with open(filename, 'r+b') as f:
+        f.truncate(os.path.getsize(filename) - 5)  # the power went out while trial 3 was written
+
+    rows = _rows(journal.recover(filename, str(tmp_path / 'recovered.csv')))
+    assert [row['no'] for row in rows] == ['1', '2']
+
+
+def test_recover_ignores_corrupted_record(tmp_path):
+    writer = ppc.csv_writer('crash', folder=str(tmp_path), journal=journal.TrialJournal)
+    for no in range(1, 3):
+        writer.write(_trial(no))
+    _crash(writer)
+    filename = writer.save_file[:-len('.csv')] + '.journal'
+    with open(filename, 'r+b') as f:
+        f.seek(-3, os.SEEK_END)
+        f.write(b'XXX')  # the last record fails its crc
+
+    assert [row['no'] for row in _rows(journal.recover(filename))] == ['1']
+
+
+def test_recovered_csv_is_the_csv(tmp_path):
+    writer = ppc.csv_writer('whole', folder=str(tmp_path), threaded=True, journal=journal.TrialJournal)
+    for no in range(1, 6):
+        writer.write(_trial(no))
+    writer.close()
+
+    recovered = journal.recover(writer.save_file[:-len('.csv')] + '.journal')
+    assert _rows(recovered) == _rows(writer.save_file)
+
+
+def test_recovered_csv_is_the_rewritten_csv(tmp_path):
+    writer = ppc.csv_writer('scored', folder=str(tmp_path), threaded=True, journal=journal.TrialJournal)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    writer.close()
+    writer.rewrite([dict(_trial(no), response='b') for no in range(1, 4)])
+
+    recovered = journal.recover(writer.save_file[:-len('.csv')] + '.journal')
+    assert _rows(recovered) == _rows(writer.save_file)
+    assert [row['response'] for row in _rows(recovered)] == ['b', 'b', 'b']
+
+
+def test_half_written_rewrite_recovers_the_rows_before_it(tmp_path):
+    writer = ppc.csv_writer('scored', folder=str(tmp_path), threaded=True, journal=journal.TrialJournal)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    writer.close()
+    filename = writer.save_file[:-len('.csv')] + '.journal'
+    size = os.path.getsize(filename)
+    writer.rewrite([dict(_trial(no), response='b') for no in range(1, 4)])
+    with open(filename, 'r+b') as f:
+        f.truncate(size + (os.path.getsize(filename) - size) // 2)  # the power went out half way through the scored rows
+
+    rows = _rows(journal.recover(filename))
+    assert [(row['no'], row['response']) for row in rows] == [('1', ''), ('2', ''), ('3', '')]
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Looking words up in a Lexicon, see generate_wordlist/lexicon.py. pliers is
+not needed: the lexicons are made here.
+
+    python -m pytest tests/test_lexicon.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lexicon
+
+
+def _lexicon():
+    return lexicon.Lexicon(np.array(['apple', 'kiss', 'war']), np.array([[6.2, 4.], [7.8, 6.1], [1.8, np.nan]]),
+                           ['affect_V.Mean.Sum', 'affect_A.Mean.Sum'])
+
+
+def test_present_absent_and_mixed_case():
+    norms = _lexicon()
+    words = pd.Series(['Kiss', 'WAR', 'zebra', 'apple', '', 'aardvark', 'zzz'])  # before, between and after the lexicon's words
+    valence = norms.lookup(words, 'affect_V.Mean.Sum')
+    np.testing.assert_array_equal(valence, [7.8, 1.8, np.nan, 6.2, np.nan, np.nan, np.nan])
+    assert np.isnan(norms.lookup('war', 'affect_A.Mean.Sum')[0])  # in the lexicon, without this norm
+
+
+def test_columns():
+    norms = _lexicon()
+    np.testing.assert_array_equal(norms.lookup(['kiss', 'cat']), [[7.8, 6.1], [np.nan, np.nan]])
+    assert norms.lookup(['kiss'], ['affect_A.Mean.Sum', 'affect_V.Mean.Sum']).tolist() == [[6.1, 7.8]]
+    with pytest.raises(KeyError):
+        norms.lookup(['kiss'], 'affect_D.Mean.Sum')
+    assert lexicon.column('affect/V.Mean.Sum') == 'affect_V.Mean.Sum'
+
+
+def test_empty_lexicon():
+    empty = lexicon.Lexicon(np.array([], 'U1'), np.zeros((0, 1)), ['affect_V.Mean.Sum'])
+    assert np.isnan(empty.lookup(['kiss', 'war'], 'affect_V.Mean.Sum')).all()
+
+
+def test_merge():
+    concreteness = lexicon.Lexicon(np.array(['cat', 'kiss']), np.array([[4.9], [3.4]]), ['concreteness_Conc.M'])
+    merged = _lexicon().merge(concreteness)
+    assert merged.words.tolist() == ['apple', 'cat', 'kiss', 'war']
+    assert merged.columns == ['affect_V.Mean.Sum', 'affect_A.Mean.Sum', 'concreteness_Conc.M']
+    np.testing.assert_array_equal(merged.lookup(['cat', 'kiss']), [[np.nan, np.nan, 4.9], [7.8, 6.1, 3.4]])
+
+
+def test_save_and_load_fetch_only_what_is_missing(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'lexicon.npz')
+    _lexicon().save(filename)
+    fetched = []
+
+    def fetch(variables):
+        fetched.append(list(variables))
+        return lexicon.Lexicon(np.array(['kiss']), np.array([[3.4]]), [lexicon.column(variable) for variable in variables])
+    monkeypatch.setattr(lexicon, 'fetch', fetch)
+
+    norms = lexicon.load(filename, ['affect/V.Mean.Sum'])
+    assert fetched == [] and norms.columns == _lexicon().columns
+    np.testing.assert_array_equal(norms.lookup(['KISS', 'war']), _lexicon().lookup(['kiss', 'war']))
+
+    norms = lexicon.load(filename, ['affect/V.Mean.Sum', 'concreteness/Conc.M'])
+    assert fetched == [['concreteness/Conc.M']]
+    assert lexicon.load(filename).columns == ['affect_V.Mean.Sum', 'affect_A.Mean.Sum', 'concreteness_Conc.M']  # saved
+    assert norms.lookup('kiss', 'concreteness_Conc.M').tolist() == [3.4]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['lexicon.npz']
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The ring buffer of the live monitor and its seqlock, see monitor.py.
+
+    python -m pytest tests/test_monitor.py
+"""
+
+import math
+
+from faceword import monitor
+
+
+def _trial(no, **fields):
+    trial = {'no': no, 'session': '2', 'onset_word': no * 7., 'onset_img': no * 7. + 2.7,
+             'duration_measured_word': 0.7, 'duration_measured_img': 0.7,
+             'key_t': '', 'rt': '', 'correct_resp': '', 'response': '', 'word': 'word%i' % no, 'word_label': 'pos'}
+    trial.update(fields)
+    return trial
+
+
+def test_round_trip(tmp_path):
+    live = monitor.TrialMonitor(str(tmp_path / 'live.mmap'), slots=8)
+    reader = monitor.MonitorReader(live.filename)
+    live.publish(_trial(1, response='b', key_t=10.35, rt=0.65, correct_resp=1, word=u'glæde'))
+    live.publish(_trial(2))
+
+    first, second = reader.poll()
+    assert (first['no'], first['session'], first['response'], first['correct_resp'], first['word']) == (1, 2, 'b', 1, u'glæde')
+    assert first['rt'] == 0.65 and first['onset_img'] == 9.7
+    assert second['response'] == '' and second['correct_resp'] == -1 and math.isnan(second['rt'])  # not answered
+    assert reader.poll() == []
+    live.close()
+    reader.close()
+
+
+def test_update_of_a_published_trial(tmp_path):
+    live = monitor.TrialMonitor(str(tmp_path / 'live.mmap'), slots=8)
+    reader = monitor.MonitorReader(live.filename)
+    live.publish(_trial(1))
+    live.publish(_trial(1, response='b', rt=0.65, correct_resp=1), update=True)
+
+    published, scored = reader.poll()
+    assert (published['no'], published['update'], published['response']) == (1, False, '')
+    assert (scored['no'], scored['update'], scored['response'], scored['correct_resp']) == (1, True, 'b', 1)
+    live.close()
+    reader.close()
+
+
+def test_wrap_around_counts_the_missed(tmp_path):
+    live = monitor.TrialMonitor(str(tmp_path / 'live.mmap'), slots=4)
+    reader = monitor.MonitorReader(live.filename)
+    for no in range(1, 11):
+        live.publish(_trial(no))
+
+    assert [trial['no'] for trial in reader.poll()] == [7, 8, 9, 10]
+    assert reader.missed == 6
+    live.close()
+    reader.close()
+
+
+def test_torn_slot_is_read_on_the_next_poll(tmp_path):
+    live = monitor.TrialMonitor(str(tmp_path / 'live.mmap'), slots=4)
+    reader = monitor.MonitorReader(live.filename)
+    live.publish(_trial(1))
+    live.publish(_trial(2))
+
+    # The writer is half way through slot 1: its sequence number is odd
+    offset = monitor._HEADER.size + 1 * monitor._RECORD.size
+    monitor._SEQ.pack_into(live._map, offset, 2 * 1 + 1)
+    assert [trial['no'] for trial in reader.poll()] == [1]
+
+    monitor._SEQ.pack_into(live._map, offset, 2 * 1 + 2)  # done
+    assert [trial['no'] for trial in reader.poll()] == [2]
+    live.close()
+    reader.close()
+
+
+def test_restart_is_noticed(tmp_path):
+    live = monitor.TrialMonitor(str(tmp_path / 'live.mmap'), slots=4)
+    reader = monitor.MonitorReader(live.filename)
+    live.publish(_trial(1))
+    live.publish(_trial(2))
+    assert len(reader.poll()) == 2
+    live.close()
+
+    live = monitor.TrialMonitor(str(tmp_path / 'live.mmap'), slots=4)  # the next session resets the file
+    live.publish(_trial(1))
+    assert [trial['no'] for trial in reader.poll()] == [1]
+    live.close()
+    reader.close()
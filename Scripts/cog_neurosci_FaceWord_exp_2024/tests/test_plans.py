@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The participants' plans of trials, see plans.py.
+
+    python -m pytest tests/test_plans.py
+"""
+
+import os
+import random
+
+import pytest
+
+from faceword import engine
+from faceword import plans
+from faceword import wordstore
+
+WORDLIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wordlist.txt')
+FIELDS = {'ID': '0123', 'age': '25', 'gender': 'female', 'scan day': 'Tuesday'}
+
+
+def _trial(no, session):
+    return {'ID': '', 'session': str(session), 'word': 'word%i' % no, 'word_score_pc': no / 4., 'delay_frames_before': 120 + no,
+            'onset_word': '', 'dropped_frames': '', 'no': no}
+
+
+def test_pack_round_trip():
+    sessions = {1: [_trial(no, 1) for no in (1, 2)], 2: [_trial(no, 2) for no in (1, 2, 3)]}
+    plan = plans.Plan(plans.pack(sessions, wordstore.WordStore(wordstore.pack(b'word\tscore_pc\tscore_warriner\tlabel\tsession\n'))))
+
+    assert plan.sessions == [1, 2]
+    assert plan.trials(2) == sessions[2]
+    assert list(plan.trials(1)[0]) == list(sessions[1][0])  # the fields in the same order
+    assert type(plan.trials(1)[0]['word_score_pc']) is float and type(plan.trials(1)[0]['no']) is int
+    assert plan.trials(1, FIELDS)[1] == dict(sessions[1][1], **FIELDS)
+    with pytest.raises(KeyError):
+        plan.trials(3)
+
+
+@pytest.mark.parametrize('script', ['WordFace_exp_scanner_MEG.py', 'WordFace_exp_behav.py'])
+def test_plan_is_the_trials_made_without_one(tmp_path, script):
+    made, words = plans.make(script, '0123', [1, 2])
+    path = plans.filename(str(tmp_path), '0123', script)
+    plans.save(path, made, words)
+    plan = plans.load(str(tmp_path), '0123', script, words)
+
+    V = dict(FIELDS, **{'Scan day': FIELDS['scan day'], 'session': 2, 'exp type': ''})
+    without = engine.Experiment(script, V, WORDLIST, plan_folder=None)
+    assert plan.trials(2, FIELDS) == without.session_trials(2)
+    assert engine.Experiment(script, V, WORDLIST, plan_folder=str(tmp_path)).session_trials(2) == without.session_trials(2)
+
+
+def test_random_module_is_left_alone():
+    random.seed(7)
+    state = random.getstate()
+    plans.make('WordFace_exp_behav.py', '0123', [1])
+    assert random.getstate() == state
+
+
+def test_plan_of_another_word_list_is_refused(tmp_path):
+    made, words = plans.make('WordFace_exp_behav.py', '0123', [1])
+    plans.save(plans.filename(str(tmp_path), '0123', 'WordFace_exp_behav.py'), made, words)
+
+    other = tmp_path / 'wordlist.txt'
+    other.write_bytes(b'word\tscore_pc\tscore_warriner\tlabel\tsession\nwar\t-0.5\t2.0\tneg\t1\n')
+    with pytest.raises(ValueError):
+        plans.load(str(tmp_path), '0123', 'WordFace_exp_behav.py', wordstore.load(str(other)))
+    assert plans.load(str(tmp_path), '0123', 'WordFace_exp_behav.py') is not None  # unchecked
+    assert plans.load(str(tmp_path), 'someone else', 'WordFace_exp_behav.py', words) is None
+
+
+def test_fmri_order_is_searched_for_only_in_the_plans(monkeypatch, tmp_path):
+    from faceword import sequence
+
+    searched = []
+    monkeypatch.setattr(sequence, 'arrange', lambda trials, *args, **kwargs: searched.append(len(trials)) or trials[::-1])
+    made, words = plans.make('fMRI', '0123', [1])
+    assert searched == [len(made[1])]
+
+    V = dict(FIELDS, **{'Scan day': FIELDS['scan day'], 'session': 1, 'exp type': ''})
+    shuffled = engine.Experiment('fMRI', V, WORDLIST, plan_folder=str(tmp_path)).session_trials(1)  # no plan in the folder
+    assert searched == [len(made[1])]
+    assert sorted(trial['word'] for trial in shuffled) == sorted(trial['word'] for trial in made[1])
+
+    plans.save(plans.filename(str(tmp_path), '0123', 'WordFace_exp_scanner.py'), made, words)
+    assert engine.Experiment('fMRI', V, WORDLIST, plan_folder=str(tmp_path)).session_trials(1) == [dict(trial, **FIELDS) for trial in made[1]]
+    assert searched == [len(made[1])]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The csv_writer, timer and percentiles of ppc.py.
+
+    python -m pytest tests/test_ppc.py
+"""
+
+import csv
+import gc
+import json
+import os
+import sys
+import tempfile
+import weakref
+
+import numpy as np
+import pytest
+
+from faceword import journal
+import ppc
+
+
+def _trial(no):
+    return {'no': no, 'word': 'word%i' % no, 'rt': no / 10.}
+
+
+def _rows(filename):
+    with open(filename, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_closed_writer_is_unregistered_from_atexit(tmp_path):
+    writer = ppc.csv_writer('closed', folder=str(tmp_path), threaded=True)
+    writer.close()
+    alive = weakref.ref(writer)
+    del writer
+    gc.collect()
+    assert alive() is None
+
+
+def test_threaded_writer_drains_its_queue_on_close(tmp_path):
+    writer = ppc.csv_writer('drain', folder=str(tmp_path), column_order=['no'], threaded=True, queue_size=10)
+    for no in range(1, 501):
+        writer.write(_trial(no))
+        if no % 50 == 0:
+            writer.flush()
+    writer.close()
+    writer.close()  # a second close does nothing
+
+    rows = _rows(writer.save_file)
+    assert [row['no'] for row in rows] == [str(no) for no in range(1, 501)]
+    assert list(rows[0])[0] == 'no'  # column_order first
+
+
+def test_error_in_the_writer_thread_is_raised_on_close(tmp_path):
+    writer = ppc.csv_writer('error', folder=str(tmp_path), column_order=['no', 'missing'], threaded=True)
+    writer.write(_trial(1))
+    with pytest.raises(ValueError):
+        writer.close()
+
+
+@pytest.mark.parametrize('threaded', [False, True])
+def test_write_after_close_raises(tmp_path, threaded):
+    writer = ppc.csv_writer('closed', folder=str(tmp_path), threaded=threaded, queue_size=1)
+    writer.write(_trial(1))
+    writer.close()
+    for no in (2, 3):  # with queue_size=1, the second would block forever on the queue
+        with pytest.raises(ValueError):
+            writer.write(_trial(no))
+    assert [row['no'] for row in _rows(writer.save_file)] == ['1']
+
+
+def test_rewrite_replaces_the_rows_in_one_go(tmp_path):
+    writer = ppc.csv_writer('rewrite', folder=str(tmp_path), column_order=['no'], threaded=True)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    writer.close()
+    columns = list(_rows(writer.save_file)[0])
+
+    writer.rewrite([dict(_trial(no), rt=no) for no in range(1, 4)])
+    rows = _rows(writer.save_file)
+    assert list(rows[0]) == columns
+    assert [row['rt'] for row in rows] == ['1', '2', '3']
+    assert os.listdir(str(tmp_path)) == [os.path.basename(writer.save_file)]  # no .tmp left
+
+
+def test_failed_rewrite_leaves_the_file_as_it_was(tmp_path):
+    writer = ppc.csv_writer('rewrite', folder=str(tmp_path), threaded=True, journal=journal.TrialJournal)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    writer.close()
+    before = _rows(writer.save_file)
+    journal_size = os.path.getsize(writer.journal.filename)
+
+    with pytest.raises(ValueError):
+        writer.rewrite([dict(_trial(no), extra='not a column') for no in range(1, 4)])
+    assert _rows(writer.save_file) == before
+    assert os.path.getsize(writer.journal.filename) == journal_size
+    assert not os.path.exists(writer.save_file + '.tmp')
+
+
+def test_the_journal_is_given_not_imported(tmp_path, monkeypatch):
+    # ppc.py is the course's standalone module: it works without the faceword package
+    monkeypatch.setitem(sys.modules, 'faceword', None)
+    monkeypatch.setitem(sys.modules, 'faceword.journal', None)
+    opened = []
+
+    class Journal(object):
+        def __init__(self, filename):
+            self.filename = filename
+            self.rows = []
+            opened.append(self)
+
+        def write_header(self, fieldnames):
+            pass
+
+        def write_row(self, fieldnames, trial):
+            self.rows.append(trial['no'])
+
+        def rewrite(self, fieldnames, trials):
+            self.rows = [trial['no'] for trial in trials]
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    writer = ppc.csv_writer('injected', folder=str(tmp_path), threaded=True, journal=Journal)
+    for no in range(1, 4):
+        writer.write(_trial(no))
+    writer.close()
+    writer.rewrite([_trial(2)])
+    assert [journal.rows for journal in opened] == [[1, 2, 3], [2]]  # opened again to append the rewrite
+    assert opened[0].filename == writer.save_file[:-len('.csv')] + '.journal'
+
+
+def test_percentile_of_known_samples():
+    ordered = [1., 2., 3., 4., 5.]
+    assert ppc._percentile(ordered, 0) == 1.
+    assert ppc._percentile(ordered, 25) == 2.
+    assert ppc._percentile(ordered, 50) == 3.
+    assert abs(ppc._percentile(ordered, 95) - 4.8) < 1e-12  # between the 4th and the 5th sample
+    assert ppc._percentile(ordered, 100) == 5.
+    assert ppc._percentile([7.], 99) == 7.
+
+    samples = sorted(np.random.default_rng(5).lognormal(size=1001).tolist())
+    for q in (1, 50, 95, 99, 99.9):
+        assert abs(ppc._percentile(samples, q) - np.percentile(samples, q)) < 1e-12  # numpy's default, linear
+
+
+def test_timer_statistics_and_baseline(tmp_path):
+    result = ppc.timer('total = sum(values)', runs=100, repeat=50, namespace={'values': list(range(100))},
+                       save=str(tmp_path / 'sum.json'))
+    assert len(result['samples']) == result['repeat'] == 50 and result['runs'] == 100
+    assert result['min'] <= result['median'] <= result['p95'] <= result['p99'] <= result['max']
+    assert result['min'] == min(result['samples']) and result['max'] == max(result['samples'])
+    with open(str(tmp_path / 'sum.json')) as f:
+        assert json.load(f)['median'] == result['median']
+
+    assert ppc.compare(result, str(tmp_path / 'sum.json')) is False  # the same
+    slower = dict(result, median=result['median'] * 1.2)
+    assert ppc.compare(slower, result, tolerance=0.1) is True
+    assert ppc.compare(slower, result, tolerance=0.3) is False
+    assert ppc.compare(dict(result, p95=result['p95'] * 2), result) is True
+    assert ppc.compare(dict(result, p99=result['p99'] * 2), result) is False  # only the median and p95 count
+
+
+def test_csv_writer_latency_cleans_up(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    results = ppc.csv_writer_latency(trials=5, gap=0., journal=journal.TrialJournal)
+    assert sorted(results) == ['normal', 'threaded', 'threaded with journal']
+    assert all(results[mode]['repeat'] == 5 and results[mode]['min'] <= results[mode]['max'] for mode in results)
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The profiles of engine.py against the five scripts they replaced: their
+settings, and a headless run of each old script next to its profile.
+
+The old scripts are kept as they were before the engine, in BASELINE
+(tests/baseline/), all but behav_verbose. What is allowed to differ:
+    * the columns the engine added (ADDED)
+    * behav_verbose, which failed with a NameError, is only checked on its settings
+    * the response window starts at the face (see scoring.py); the key
+      presses here all come 0.3 s into the face, inside both windows
+    * the response triggers are pulses (see pulses.py)
+
+    python -m pytest tests/test_profiles.py
+"""
+
+import collections
+import csv
+import itertools
+import os
+import random
+import shutil
+
+import pytest
+
+from faceword import engine
+from faceword import headless
+from faceword import trigger_table
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline')  # the scripts before engine.py
+ADDED = {'congruency', 'frames_word', 'frames_img', 'dropped_frames', 'max_ifi', 'key_events'}
+INFO = {'ID': 'baseline', 'session': 2, 'age': '30', 'gender': 'female', 'Scan day': 'Tuesday', 'exp type': 'fMRI'}
+IMAGES = {'p': engine.IMG_P, 'n': engine.IMG_N}
+
+# What the old scripts had: delays, KEYS_target, number of runs, the frame of the pause trigger
+# and the trigger if-chain of make_trial_list, (label, face): (TRIG_W, TRIG_BEFORE, TRIG_I)
+FMRI_CHAIN = {('pos', 'p'): (11, 31, 21), ('neg', 'n'): (12, 32, 22), ('neu', 'p'): (13, 41, 21), ('neu', 'n'): (13, 42, 22)}
+MEG_CHAIN = {('pos', 'p'): (11, 31, 21), ('neg', 'n'): (12, 32, 22), ('neu', 'p'): (13, 51, 41), ('neu', 'n'): (13, 52, 42)}
+OLD = {
+    'fMRI': dict(delays=(180, 336), keys=dict(neg=['y'], pos=['b']), runs=None, pause_frame=60, chain=FMRI_CHAIN),
+    'MEG': dict(delays=(120, 180), keys=dict(neg=['2', 'y'], pos=['1', 'b']), runs=6, pause_frame=30, chain=MEG_CHAIN),
+    'EEG_resp': dict(delays=(120, 180), keys=dict(neg=['2', 'y'], pos=['1', 'b']), runs=6, pause_frame=30, chain=MEG_CHAIN),
+    'behav': dict(delays=(120, 180), keys=dict(neg=['y'], pos=['b']), runs=None, pause_frame=None, chain=None),
+    'behav_verbose': dict(delays=(120, 180), keys=dict(neg=['y'], pos=['b']), runs=None, pause_frame=None, chain=FMRI_CHAIN),  # the commented-out fMRI codes
+}
+
+
+def test_every_script_has_a_profile():
+    assert sorted(OLD) == sorted(engine.PROFILES)
+    assert sorted(headless.SCRIPTS) == sorted(settings['script'] for settings in engine.PROFILES.values())
+    assert engine.DURATION == 42 and engine.FRAME_RATE == 60
+
+
+@pytest.mark.parametrize('name', sorted(OLD))
+def test_settings(name):
+    settings, old = engine.PROFILES[name], OLD[name]
+    assert settings['delays'] == old['delays']
+    assert settings['keys'] == old['keys']
+    assert settings['runs'] == old['runs']
+    assert settings['schedule'].get('pause_frame') == old['pause_frame']
+    assert settings['schedule'].get('triggers', True) == (old['pause_frame'] is not None)  # only the scanner scripts have a port
+
+
+def test_behavioural_fixation_is_opt_in():
+    # The behavioural scripts never flipped the fixation before the face; BEHAV_FIXATION changes that for new studies only
+    assert engine.BEHAV_FIXATION is False
+    assert set(name for name in OLD if not engine.PROFILES[name]['schedule'].get('fixation_before', True)) == {'behav', 'behav_verbose'}
+
+
+@pytest.mark.parametrize('name', sorted(OLD))
+def test_trigger_codes(name):
+    codes, chain = engine.PROFILES[name]['triggers'], OLD[name]['chain']
+    if chain is None:
+        assert codes is None
+        return
+    table = trigger_table.TriggerTable(engine.IMG_P, engine.IMG_N, OLD[name]['keys'], codes)
+    assert table.stimulus == dict(((label, IMAGES[face]), triggers) for (label, face), triggers in chain.items())
+
+
+@pytest.mark.parametrize('name', sorted(OLD))
+def test_session_column(name):
+    experiment = engine.Experiment(name, dict(INFO), os.path.join(headless.HERE, 'wordlist.txt'), plan_folder=None)
+    sessions = experiment.sessions()
+    assert sessions == (list(range(1, 7)) if OLD[name]['runs'] else [2])
+    trials = experiment.make_trial_list(engine.CONDITION, sessions[-1])
+    # str(run + 1) in the MEG and EEG scripts, V['session'] from the dialog in the others
+    assert set(trial['session'] for trial in trials) == ({'6'} if OLD[name]['runs'] else {2})
+
+
+def _old_script(script, folder):
+    """A copy of the script as it was before engine.py, in :folder:."""
+    return shutil.copy(os.path.join(BASELINE, script), os.path.join(folder, script))
+
+
+def _responder(keys):
+    """Presses the response keys in turn, 0.29 s after each face comes on the screen."""
+    keys = itertools.cycle(keys)
+    state = {'face': False}
+
+    def respond(session, t):
+        face = any(getattr(stim, 'image', None) for stim in session.shown)
+        if face and not state['face']:
+            session.press(next(keys), t + 0.29)  # between two flips
+        state['face'] = face
+    return respond
+
+
+def _run(script, workdir, keys):
+    random.seed(0)  # the same trial lists every time
+    session = headless.run(script, workdir=workdir, info=INFO, responder=_responder(keys))
+    logs = []
+    for log in session.logs():
+        with open(log, newline='') as f:
+            logs.append(list(csv.DictReader(f)))
+    return session, logs
+
+
+def _sent(session, trials):
+    """
+    (word label, image, response): the codes sent in those trials, each with
+    the frame it went up on and the frame it was pulled down on. The frames
+    count from the word trigger, and from the face after the fixation before
+    it, whose length is random. Response triggers only go up on a frame: they
+    are pulses of pulse_ms now (see pulses.py), not up until the next flip.
+    """
+    triggers = session.triggers[2:]  # after the port probe
+    groups = []
+    for i, (t, code) in enumerate(triggers):
+        if code in (11, 12, 13):
+            groups.append([])
+        if code:
+            down = next(later for later, after in triggers[i + 1:] if after == 0)
+            groups[-1].append((code, t, down))
+    assert len(groups) == len(trials)
+    sent = collections.defaultdict(set)
+    for trial, group in zip(trials, groups):
+        start = group[0][1]
+        codes = []
+        for i, (code, up, down) in enumerate(group):
+            after = int(trial['delay_frames_before']) if i > 1 else 0  # the image and response triggers
+            frames = (code, _frames(up - start) - after)
+            codes.append(frames if code >= trigger_table.RESPONSE_CORRECT else frames + (_frames(down - start) - after,))
+        sent[trial['word_label'], trial['img'], trial['response']].add(tuple(codes))
+    return dict(sent)
+
+
+def _scored(trials, fields):
+    """(word label, image, response): the values of :fields: in those trials."""
+    scored = collections.defaultdict(set)
+    for trial in trials:
+        scored[trial['word_label'], trial['img'], trial['response']].add(tuple(trial.get(field) for field in fields))
+    return dict(scored)
+
+
+def _same(new, old):
+    """The same for each (word label, image, response) of both runs. The
+    faces after a neutral word are random, so a run may miss one with a key."""
+    assert all(len(values) == 1 for values in list(new.values()) + list(old.values()))
+    both = set(new) & set(old)
+    assert set((label, img) for label, img, key in both) == {('pos', engine.IMG_P), ('neg', engine.IMG_N),
+                                                             ('neu', engine.IMG_P), ('neu', engine.IMG_N)}  # nothing goes unchecked
+    assert dict((key, new[key]) for key in both) == dict((key, old[key]) for key in both)
+
+
+def _frames(seconds):
+    return int(round(float(seconds) * engine.FRAME_RATE))
+
+
+@pytest.mark.parametrize('name', ['fMRI', 'MEG', 'EEG_resp', 'behav'])
+def test_same_as_the_old_script(tmp_path, name):
+    script = engine.PROFILES[name]['script']
+    keys = OLD[name]['keys']['neg'] + OLD[name]['keys']['pos']
+    old_session, old_logs = _run(_old_script(script, str(tmp_path)), str(tmp_path / 'old'), keys)
+    new_session, new_logs = _run(script, str(tmp_path / 'new'), keys)
+    old_trials, new_trials = sum(old_logs, []), sum(new_logs, [])
+    fixation_shown = name != 'behav'  # the behavioural scripts go from the word to the face at once
+
+    # The same logs, with the added columns
+    assert [len(log) for log in new_logs] == [len(log) for log in old_logs] == [60] * (OLD[name]['runs'] or 1)
+    assert set(new_trials[0]) - set(old_trials[0]) == ADDED and set(old_trials[0]) <= set(new_trials[0])
+    for new, old in zip(new_logs, old_logs):
+        assert sorted((trial['word'], trial['word_label'], trial['session'], trial['ID']) for trial in new) == \
+            sorted((trial['word'], trial['word_label'], trial['session'], trial['ID']) for trial in old)
+
+    # The same trigger codes, logged and sent, and the same scoring of the responses
+    fields = ('word_trigger', 'pause_trigger', 'img_trigger', 'correct_resp')
+    _same(_scored(new_trials, fields), _scored(old_trials, fields))
+    if OLD[name]['chain']:
+        _same(_sent(new_session, new_trials), _sent(old_session, old_trials))
+    else:
+        assert new_session.triggers == old_session.triggers == []
+
+    # The same timing, in frames
+    def timing(trials):
+        return set((_frames(float(trial['onset_img']) - float(trial['onset_word'])) - (int(trial['delay_frames_before']) if fixation_shown else 0),
+                    _frames(trial['duration_measured_word']), _frames(trial['duration_measured_img']), _frames(trial['rt']))
+                   for trial in trials)
+    assert timing(new_trials) == timing(old_trials) == {(42, 42, 42, 18)}  # the key 0.29 s after the face's first flip
+    assert new_session.flips == old_session.flips
+    assert abs(new_session.now - old_session.now) < 1e-6
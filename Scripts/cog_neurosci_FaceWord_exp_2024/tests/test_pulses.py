@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The response pulses and the stimulus triggers sharing one port, see pulses.py.
+
+    python -m pytest tests/test_pulses.py
+"""
+
+import time
+
+from faceword import pulses
+
+
+def _codes(scheduler):
+    return [(code, source) for t, code, source in scheduler.port.data]
+
+
+def test_pulse_waits_for_the_stimulus_code_to_go_down():
+    scheduler = pulses.PulseScheduler(width_ms=2, stimulus_timeout=1.)
+    scheduler.stimulus(21)
+    scheduler.pulse(101)
+    time.sleep(0.02)
+    assert _codes(scheduler) == [(21, pulses.STIMULUS)]  # the image trigger is still up
+
+    scheduler.stimulus(0)
+    scheduler.close()
+    assert _codes(scheduler) == [(21, pulses.STIMULUS), (0, pulses.STIMULUS), (101, pulses.PULSE), (0, pulses.PULSE)]
+
+
+def test_stimulus_code_during_a_pulse_cuts_it_short():
+    now = [5.]
+    scheduler = pulses.PulseScheduler(width_ms=50, gap_ms=5, clock=lambda: now[0])
+    scheduler.pulse(112)
+    time.sleep(0.01)  # the pulse is up
+    now[0] = 5.01
+    scheduler.stimulus(31)  # goes up on its flip, not after the pulse
+    assert _codes(scheduler) == [(112, pulses.PULSE), (31, pulses.STIMULUS)]
+    scheduler.close()
+
+    assert _codes(scheduler) == [(112, pulses.PULSE), (31, pulses.STIMULUS)]  # the 31 is not pulled down by the pulse's 0
+    (code, requested, width, up, down, cut_by), = scheduler.log
+    assert (code, width, down, cut_by) == (112, 0.05, 5.01, 31)
+
+
+def test_zero_of_the_stimulus_does_not_cut_the_pulse():
+    scheduler = pulses.PulseScheduler(width_ms=20, gap_ms=1)
+    scheduler.pulse(101)
+    time.sleep(0.005)
+    scheduler.stimulus(0)  # e.g. the flip after an image trigger the pulse waited for: the port is already the pulse's
+    scheduler.stimulus(11)
+    scheduler.stimulus(0)
+    scheduler.close()
+
+    assert _codes(scheduler) == [(101, pulses.PULSE), (11, pulses.STIMULUS), (0, pulses.STIMULUS)]
+    assert scheduler.log[0][5] == 11
+
+
+def test_pulses_never_overlap():
+    scheduler = pulses.PulseScheduler(width_ms=1, gap_ms=0.5)
+    for i in range(30):
+        scheduler.pulse(101 + i % 2)
+    scheduler.close()
+    codes = [code for code, source in _codes(scheduler)]
+    assert codes[1::2] == [0] * 30 and 0 not in codes[0::2]
+    assert len(scheduler.log) == 30
+
+
+def test_virtual_clock_without_thread():
+    now = [0.]
+    scheduler = pulses.PulseScheduler(width_ms=10, clock=lambda: now[0], threaded=False)
+    scheduler.stimulus(22)
+    scheduler.pulse(201)
+    assert _codes(scheduler) == [(22, pulses.STIMULUS)]
+
+    now[0] = 0.7
+    scheduler.stimulus(0)
+    assert _codes(scheduler)[1:] == [(0, pulses.STIMULUS), (201, pulses.PULSE), (0, pulses.PULSE)]
+    scheduler.close()
+    assert scheduler.log == [(201, 0., 0.01, 0.7, 0.7, None)]
+
+
+def test_log_is_saved(tmp_path):
+    scheduler = pulses.PulseScheduler(filename=str(tmp_path / 'pulses.csv'), width_ms=1)
+    scheduler.pulse(102)
+    scheduler.close()
+    lines = (tmp_path / 'pulses.csv').read_text().splitlines()
+    assert lines[0] == ','.join(pulses.LOG_COLUMNS) and lines[1].startswith('102,') and lines[1].endswith(',')  # not cut short
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The ratings workbook as memory mapped columns, see generate_wordlist/ratings.py.
+pd.read_excel is replaced by a small DataFrame, except in the one round trip
+through a real workbook, which needs openpyxl.
+
+    python -m pytest tests/test_ratings.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ratings
+
+
+def _frame(pleasant=(5.2, 1.1, np.nan)):
+    return pd.DataFrame({'Word': ['kiss', 'war', 'table'], 'Pleasant': list(pleasant), 'N': [3, 1, 2],
+                         'L10 FREQ': ['high', None, 'mid']})
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    """A workbook file, and pd.read_excel returning the frame the file's content names."""
+    frames = {'first': _frame(), 'second': _frame((6.0, 2.0, 4.0))}
+    reads = []
+
+    def read_excel(source):
+        with open(source) as f:
+            name = f.read()
+        reads.append(name)
+        return frames[name]
+    monkeypatch.setattr(pd, 'read_excel', read_excel)
+    source = tmp_path / 'Ratings.xlsx'
+    source.write_text(u'first')
+    return str(source), reads
+
+
+def test_round_trip(workbook):
+    source, reads = workbook
+    data = ratings.load(source)
+    assert list(data) == ['Word', 'Pleasant', 'N', 'L10 FREQ']
+    assert all(isinstance(values, np.memmap) for values in data.values())
+    assert data['Word'].tolist() == ['kiss', 'war', 'table'] and data['Word'].dtype == np.dtype('U5')
+    np.testing.assert_array_equal(data['Pleasant'], [5.2, 1.1, np.nan])
+    assert data['N'].dtype.kind == 'i' and data['N'].tolist() == [3, 1, 2]
+    assert data['L10 FREQ'].tolist() == ['high', '', 'mid']  # no value is empty text
+    pd.testing.assert_frame_equal(pd.DataFrame(ratings.load(source, ['Pleasant', 'Word'])), _frame()[['Pleasant', 'Word']])
+    assert reads == ['first']  # converted once
+    assert sorted(os.listdir(ratings.folder_of(source))) == ['000.npy', '001.npy', '002.npy', '003.npy', ratings.META]
+    with pytest.raises(KeyError):
+        ratings.load(source, ['Word', 'Sad'])
+
+
+def test_converts_again_when_the_workbook_changes(workbook):
+    source, reads = workbook
+    assert np.isnan(ratings.load(source, ['Pleasant'])['Pleasant'][2])
+    with open(source, 'w') as f:
+        f.write('second')
+    assert ratings.load(source, ['Pleasant'])['Pleasant'].tolist() == [6.0, 2.0, 4.0]
+    assert reads == ['first', 'second']
+    assert ratings._meta(ratings.folder_of(source))['sha256'] == ratings.digest(source)
+
+
+def test_converts_again_without_a_readable_meta(workbook):
+    source, reads = workbook
+    ratings.load(source)
+    with open(os.path.join(ratings.folder_of(source), ratings.META), 'w') as f:
+        f.write('{"sha256": ')  # cut off
+    assert ratings.load(source, ['N'])['N'].tolist() == [3, 1, 2]
+    assert reads == ['first', 'first']
+    assert not os.path.exists(ratings.folder_of(source) + '.tmp')
+
+
+def test_workbook(tmp_path):
+    pytest.importorskip('openpyxl')
+    source = str(tmp_path / 'Ratings.xlsx')
+    _frame().to_excel(source, index=False)
+    data = pd.DataFrame(ratings.load(source))
+    assert data['Word'].tolist() == ['kiss', 'war', 'table'] and data['N'].tolist() == [3, 1, 2]
+    np.testing.assert_array_equal(data['Pleasant'], [5.2, 1.1, np.nan])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The response windows of responses.ResponseListener, on a keyboard of our own.
+
+    python -m pytest tests/test_responses.py
+"""
+
+import collections
+import threading
+import time
+
+from faceword import responses
+
+
+class _Keyboard(object):
+    """Hands out the keys pressed since the last getKeys, like psychopy.hardware.keyboard."""
+    Key = collections.namedtuple('Key', 'name tDown')
+
+    def __init__(self, virtual=True):
+        self.virtual = virtual
+        self._keys = []
+        self._lock = threading.Lock()
+
+    def press(self, name, t):
+        with self._lock:
+            self._keys.append(self.Key(name, t))
+
+    def getKeys(self, keyList=None, waitRelease=False, clear=True):
+        with self._lock:
+            keys, self._keys = [key for key in self._keys if key.name in keyList], []
+        return keys
+
+
+def _listener(keyboard=None):
+    return responses.ResponseListener(['y', 'b'], quit_keys=['escape'], keyboard=keyboard or _Keyboard())
+
+
+def test_first_valid_key_of_the_window():
+    listener = _listener()
+    keyboard = listener._keyboard
+    assert not listener.threaded  # a virtual keyboard is read on check()
+
+    keyboard.press('y', 0.9)  # before the window
+    listener.open_window(1.)
+    assert listener.check() is None
+    keyboard.press('x', 1.1)  # not a response key
+    keyboard.press('b', 1.2)
+    keyboard.press('y', 1.3)
+    assert listener.check() == ('b', 1.2)
+    assert listener.close_window(2.) == ('b', 1.2)
+
+    assert list(listener.events) == [('y', 0.9), ('b', 1.2), ('y', 1.3)]
+    assert listener.windows == [(1., 2.)]
+    assert listener.keys_between(1., 1.3) == [('b', 1.2)]  # the end is not in it
+    assert not listener.quit
+
+
+def test_keys_outside_windows_are_kept_but_not_responses():
+    listener = _listener()
+    listener.open_window(1.)
+    listener.close_window(2.)
+    listener._keyboard.press('y', 2.5)  # between the windows
+    listener.open_window(3.)
+    assert listener.check() is None  # the window starts without a response
+    assert listener.close_window(4.) is None
+    assert list(listener.events) == [('y', 2.5)]
+    assert listener.windows == [(1., 2.), (3., 4.)]
+
+
+def test_quit_key():
+    listener = _listener()
+    listener.open_window(1.)
+    listener._keyboard.press('escape', 1.5)
+    assert listener.check() is None and listener.quit
+
+
+def test_reset():
+    listener = _listener()
+    listener.open_window(1.)
+    listener._keyboard.press('y', 1.5)
+    listener.close_window(2.)
+    listener.reset()
+    assert not listener.events and listener.windows == [] and listener.response is None
+
+
+def test_threaded():
+    keyboard = _Keyboard(virtual=False)
+    listener = _listener(keyboard)
+    try:
+        assert listener.threaded
+        listener.open_window(1.)
+        keyboard.press('b', 1.5)
+        deadline = time.time() + 5.
+        while listener.response is None and time.time() < deadline:  # no check() needed, the thread latches it
+            time.sleep(0.001)
+        assert listener.response == ('b', 1.5)
+    finally:
+        listener.stop()
+    assert not listener._thread.is_alive()
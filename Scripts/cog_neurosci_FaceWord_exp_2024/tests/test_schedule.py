@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The frames of a compiled run against the frame counting of the old scripts, see schedule.py.
+
+    python -m pytest tests/test_schedule.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from faceword import engine
+from faceword import plans
+from faceword import schedule
+from faceword.fliplog import WORD, FIX_BEFORE, IMG, FIX_AFTER
+
+
+def _trials(delays=((120, 180), (180, 120), (150, 150))):
+    return [dict(word='word%i' % i, img=engine.IMG_P if i % 2 else engine.IMG_N, duration_frames=engine.DURATION,
+                 delay_frames_before=before, delay_frames_after=after,
+                 word_trigger=11 + i, pause_trigger=21 + i, img_trigger=31 + i)
+            for i, (before, after) in enumerate(delays)]
+
+
+def _onsets(frames, flag):
+    return np.flatnonzero(frames['flags'] & flag).tolist()
+
+
+def test_frames_of_a_trial():
+    trials = _trials()
+    frames, screens = schedule.compile_run(trials, pause_frame=30, respond_from=2)
+
+    # The old scripts' loops: DURATION frames of word and image, and the two delays of fixation
+    assert engine.DURATION == 42
+    lengths = [2 * engine.DURATION + trial['delay_frames_before'] + trial['delay_frames_after'] for trial in trials]
+    assert len(frames) == sum(lengths)
+    assert np.bincount(frames['trial']).tolist() == lengths
+
+    starts = np.cumsum([0] + lengths[:-1]).tolist()
+    assert _onsets(frames, schedule.TRIAL_START) == starts
+    assert _onsets(frames, schedule.WORD_OFFSET) == [start + 42 for start in starts]
+    assert _onsets(frames, schedule.IMG_ONSET) == [start + 42 + trial['delay_frames_before'] for start, trial in zip(starts, trials)]
+    assert _onsets(frames, schedule.IMG_OFFSET) == [start + 84 + trial['delay_frames_before'] for start, trial in zip(starts, trials)]
+    assert _onsets(frames, schedule.TRIAL_END) == [start + length - 1 for start, length in zip(starts, lengths)]
+
+    first = frames[:lengths[0]]
+    assert first['phase'].tolist() == [WORD] * 42 + [FIX_BEFORE] * 120 + [IMG] * 42 + [FIX_AFTER] * 180
+    assert [screens[i] for i in first['screen'][[0, 42, 162, 204]]] == [
+        ('word', 'word0'), schedule.FIXATION, ('image', engine.IMG_N), schedule.FIXATION]
+
+    # Responses from the third frame of the image to the end of the trial
+    assert np.flatnonzero(first['flags'] & schedule.RESPOND).tolist() == list(range(162 + 2, lengths[0]))
+
+
+def test_without_the_fixation_before_the_image():
+    # The old behavioural script drew the fixation, but went on to the image without flipping it
+    trials = _trials()
+    frames, screens = schedule.compile_run(trials, triggers=False, fixation_before=False)
+    lengths = [2 * engine.DURATION + trial['delay_frames_after'] for trial in trials]
+    assert np.bincount(frames['trial']).tolist() == lengths
+    assert FIX_BEFORE not in frames['phase'].tolist()
+    starts = np.cumsum([0] + lengths[:-1]).tolist()
+    assert _onsets(frames, schedule.WORD_OFFSET) == _onsets(frames, schedule.IMG_ONSET) == [start + 42 for start in starts]
+
+
+def test_triggers():
+    trials = _trials()
+    frames, screens = schedule.compile_run(trials, pause_frame=30)
+    first = frames['trigger'][:2 * 42 + 120 + 180]
+    # Up on the second frame of the word and the image, 30 frames into the fixation, down on the next flip
+    assert {i: code for i, code in enumerate(first.tolist()) if code != schedule.NO_TRIGGER} == {
+        1: 11, 2: 0, 42 + 30: 21, 42 + 31: 0, 162 + 1: 31, 162 + 2: 0}
+    assert _onsets(frames, schedule.PAUSE) == [42 + 30, 384 + 42 + 30, 384 + 384 + 42 + 30]
+    assert schedule.check(frames, engine.FRAME_RATE) == []
+
+
+def test_no_triggers():
+    frames, screens = schedule.compile_run(_trials(), triggers=False)
+    assert (frames['trigger'] == schedule.NO_TRIGGER).all()
+    assert not (frames['flags'] & (schedule.PAUSE | schedule.RESPOND)).any()
+
+
+def test_pause_after_the_fixation_is_left_out():
+    frames, screens = schedule.compile_run(_trials(((60, 120),)), pause_frame=60)
+    assert not (frames['flags'] & schedule.PAUSE).any()
+    assert schedule.check(frames, engine.FRAME_RATE) == ['trial 1: no pause trigger']
+    assert schedule.check(frames, engine.FRAME_RATE, pause=False) == []
+
+
+def test_check_finds_problems():
+    frames, screens = schedule.compile_run(_trials(), pause_frame=30)
+    frames['trigger'][2] = 99  # up again instead of down
+    frames['trigger'][162 + 1] = schedule.NO_TRIGGER  # no image trigger in the first trial
+    problems = schedule.check(frames, engine.FRAME_RATE)
+    assert 'frame 2: trigger 99 goes up while the previous one is still up' in problems
+    assert 'frame 2: trigger 99 only 16.7 ms after the previous one' in problems
+    assert 'trial 1: no image trigger' in problems
+
+
+def test_rows():
+    frames, screens = schedule.compile_run(_trials(), pause_frame=30)
+    rows = list(schedule.rows(frames))
+    assert rows[1] == (0, WORD, 1, 11, 0) and rows[0] == (0, WORD, 1, schedule.NO_TRIGGER, schedule.TRIAL_START)
+    assert all(type(value) is int for value in rows[1])
+
+
+@pytest.mark.parametrize('script', ['WordFace_exp_scanner.py', 'WordFace_exp_scanner_MEG.py', 'WordFace_exp_scanner_EEG_resp.py'])
+def test_check_script(script, tmp_path):
+    assert schedule.check_script(script, sessions=[1], plan_folder=str(tmp_path)) == []
+
+
+def test_check_script_checks_the_planned_trials(monkeypatch, tmp_path):
+    script = 'WordFace_exp_scanner.py'
+    made, words = plans.make(script, '0001', sessions=[1, 2])  # the searched fMRI order
+    made = dict((session, trials[::-1]) for session, trials in made.items())  # not the order the script would make
+    plans.save(plans.filename(str(tmp_path), '0001', script), made, words)
+    checked = []
+    compile_run = schedule.compile_run
+    monkeypatch.setattr(schedule, 'compile_run', lambda trials, **settings: checked.append(trials) or compile_run(trials, **settings))
+
+    assert schedule.check_script(script, ['0001', '0002'], sessions=[1, 2], plan_folder=str(tmp_path)) == []
+    assert [[trial['word'] for trial in trials] for trials in checked[:2]] == [[trial['word'] for trial in made[session]] for session in (1, 2)]
+    unplanned = engine.Experiment(script, dict(ID='0002', age='', gender='', **{'Scan day': ''}), plan_folder=None,
+                                  wordlist=os.path.join(schedule.HERE, 'wordlist.txt'))
+    assert checked[2] == unplanned.session_trials(1)  # shuffled as the script would, without a plan
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scoring the responses of a run after it ends (scoring.py), and saving the
+scored trials to the logs and the live monitor (Experiment.save_trials).
+
+    python -m pytest tests/test_scoring.py
+"""
+
+import csv
+import os
+import types
+
+import pytest
+
+from faceword import columnar
+from faceword import engine
+from faceword import headless
+from faceword import journal
+from faceword import monitor
+import ppc
+from faceword import scoring
+
+KEYS = {'neg': ['2', 'y'], 'pos': ['1', 'b']}
+IMG_P, IMG_N = 'image_stim_p.png', 'image_stim_n.png'
+
+
+def test_first_response_key_in_each_window():
+    trials = [{'img': IMG_P, 'word_label': 'pos'}, {'img': IMG_N, 'word_label': 'pos'},
+              {'img': IMG_N, 'word_label': 'neu'}, {'img': IMG_P, 'word_label': 'neg'}]
+    windows = [(10., 14.), (20., 24.), (30., 34.), (40., 44.)]
+    events = [('b', 9.9),  # before the first window: not a response
+              ('b', 10.5), ('y', 10.7),  # only the first key counts
+              ('t', 20.1), ('b', 20.4),  # the scanner's "t" is not a response key
+              ('y', 34.0),  # at the end of the window: too late
+              ('1', 40.25)]
+    scoring.score(trials, events, windows, KEYS, IMG_P, exp_start=5.)
+
+    assert [trial['response'] for trial in trials] == ['b', 'b', '', '1']
+    assert trials[0]['rt'] == 0.5 and trials[0]['key_t'] == 5.5 and trials[0]['correct_resp'] == 1
+    assert trials[1]['correct_resp'] == 0  # happy key, fearful face
+    assert trials[2]['rt'] == trials[2]['key_t'] == trials[2]['correct_resp'] == ''
+    assert [trial['congruency'] for trial in trials] == ['congruent', 'incongruent', 'neutral', 'incongruent']
+
+
+def test_windows_of_trials_cut_short_are_ignored():
+    trials = [{'img': IMG_P, 'word_label': 'pos'}]
+    scoring.score(trials, [('b', 10.2), ('y', 20.2)], [(10., 14.), (20., 24.)], KEYS, IMG_P)
+    assert trials[0]['response'] == 'b'
+
+
+def _experiment(tmp_path):
+    """An MEG experiment with its logs in :tmp_path:, as start_run would open
+    them: without the parquet log if pyarrow is not installed."""
+    V = {'ID': 'test', 'age': '25', 'gender': 'female', 'Scan day': 'Tuesday', 'session': 1, 'exp type': 'MEG'}
+    experiment = engine.Experiment('MEG', V, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wordlist.txt'), plan_folder=None)
+    trials = experiment.session_trials(1)[:3]
+    experiment.live = monitor.TrialMonitor(str(tmp_path / 'live_monitor.mmap'))
+    experiment.writer = ppc.csv_writer('test_sess_1', folder=str(tmp_path), threaded=True, journal=journal.TrialJournal, monitor=experiment.live)
+    try:
+        experiment.columns = columnar.ColumnWriter(trials[0], str(tmp_path / 'test_sess_1.parquet'))
+    except ImportError:
+        experiment.columns = None
+    return experiment, trials
+
+
+def test_saved_and_published_trials_are_scored(tmp_path):
+    experiment, trials = _experiment(tmp_path)
+    reader = monitor.MonitorReader(experiment.live.filename)
+    exp_start = 100.
+    keys = [KEYS['pos'][1] if trial['img'] == IMG_P else KEYS['neg'][1] for trial in trials]
+    events, windows = [], []
+    for i, trial in enumerate(trials):  # what run_condition does at the end of each trial
+        start = exp_start + 10. * i
+        windows.append((start, start + 3.))
+        if i < 2:
+            events.append((keys[i], start + 0.5 + i / 10.))
+        trial['onset_img'] = start - exp_start
+        trial['key_events'] = ' '.join('%s:%.6f' % (key, t - exp_start) for key, t in events if start <= t < start + 3.)
+        experiment.writer.write(trial)
+    rows = reader.poll()
+    assert [row['response'] for row in rows] == ['', '', '']  # published once, before they are scored
+    assert [row['update'] for row in rows] == [False] * 3
+
+    experiment.listener = types.SimpleNamespace(events=events, windows=windows)
+    experiment.save_trials(trials, exp_start)
+    if experiment.columns is not None:
+        experiment.columns.close()
+
+    # The monitor shows the scored trials, as updates of the same trials
+    rows = reader.poll()
+    assert [(row['no'], row['update']) for row in rows] == [(trial['no'], True) for trial in trials]
+    assert [row['response'] for row in rows] == keys[:2] + ['']
+    assert [row['correct_resp'] for row in rows] == [1, 1, -1]
+    assert abs(rows[1]['rt'] - 0.6) < 1e-9
+
+    # The csv log is the scored trials, and so is the csv recovered from the journal
+    with open(experiment.writer.save_file, newline='') as f:
+        scored = list(csv.DictReader(f))
+    assert [row['response'] for row in scored] == keys[:2] + ['']
+    assert [row['correct_resp'] for row in scored] == ['1', '1', '']
+    assert scored[0]['key_events'] == '%s:0.500000' % keys[0]
+    with open(journal.recover(experiment.writer.save_file[:-len('.csv')] + '.journal'), newline='') as f:
+        assert list(csv.DictReader(f)) == scored
+
+    if experiment.columns is not None:
+        assert columnar.read(str(tmp_path / 'test_sess_1.parquet'))['response'].tolist()[:2] == keys[:2]
+    experiment.live.close()
+    reader.close()
+
+
+def _screens(script, workdir):
+    """The virtual time of every flip of a headless run without keys, and whether it showed a face or a word."""
+    flips = []
+
+    def watch(session, t):
+        images = [getattr(stim, 'image', None) for stim in session.shown]
+        words = [stim.text for stim in session.shown if stim.text not in ('', '+')]
+        flips.append((t, 'image' if any(images) else 'word' if words else 'fixation'))
+    headless.run(script, workdir=workdir, info={'ID': 'edges'}, responder=watch)
+    return flips
+
+
+@pytest.mark.parametrize('script', ['WordFace_exp_scanner.py', 'WordFace_exp_behav.py'])
+def test_response_window_is_image_onset_to_the_next_word(tmp_path, script):
+    # The onsets as the script takes them: the time of the flip before the face (or word) comes on
+    flips = _screens(script, str(tmp_path / 'silent'))
+    starts = dict((kind, [flips[i - 1][0] for i in range(1, len(flips)) if flips[i][1] == kind != flips[i - 1][1]])
+                  for kind in ('word', 'image'))
+    img, word = starts['image'], starts['word']  # word[i + 1] is where the window of trial i ends
+    presses = [('b', img[0] - 0.001),   # to the word of trial 1, before its face: not a response any more
+               ('b', img[1]),           # at the onset of the face: the response, rt 0
+               ('y', word[3] - 0.001),  # just before the next word: the response of trial 3
+               ('b', word[4])]          # at the next word: neither trial 4's nor trial 5's
+
+    def press(session, t):
+        if session.flips == 1:
+            for key, at in presses:
+                session.press(key, at)
+    run = headless.run(script, workdir=str(tmp_path / 'keys'), info={'ID': 'edges'}, responder=press)
+    with open(run.logs()[0], newline='') as f:
+        trials = list(csv.DictReader(f))
+
+    assert [trial['response'] for trial in trials[:6]] == ['', 'b', 'y', '', '', '']
+    assert float(trials[1]['rt']) == 0.
+    assert abs(float(trials[2]['rt']) - (word[3] - 0.001 - img[2])) < 1e-9
+    assert [trial['key_events'] != '' for trial in trials[:6]] == [False, True, True, False, False, False]
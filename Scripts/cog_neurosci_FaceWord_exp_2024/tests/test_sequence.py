@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The fMRI trial orders, see sequence.py.
+
+    python -m pytest tests/test_sequence.py
+"""
+
+import numpy as np
+
+from faceword import sequence
+
+
+def _trials():
+    labels = ['pos', 'neg', 'neu'] * 20
+    return [dict(no=i, word_label=label, duration_frames=42, delay_frames_before=180, delay_frames_after=336)
+            for i, label in enumerate(labels)]
+
+
+def test_arrange_respects_the_constraints():
+    trials = sequence.arrange(_trials(), 60, lead=1., candidates=200, refine=300, batch=100, seed=1)
+    assert sorted(trial['no'] for trial in trials) == list(range(60))
+
+    codes = sequence.label_codes(trials)[None]
+    assert sequence.longest_runs(codes)[0] <= 3
+    counts = sequence.transition_counts(codes)[0]
+    assert counts.max() - counts.min() <= 4
+    for label in sequence.LABELS:  # half of each label has the long delay first
+        assert sum(trial['delay_frames_before'] == 336 for trial in trials if trial['word_label'] == label) == 10
+
+
+def test_arrange_beats_shuffles():
+    trials = sequence.arrange(_trials(), 60, lead=1., candidates=200, refine=300, batch=100, seed=2)
+    frames = 60 + sum(2 * 42 + 516 for trial in trials)
+    scorer = sequence.DesignScorer(60, int(np.ceil(frames / 60.)))
+    long_first = np.array([[trial['delay_frames_before'] > trial['delay_frames_after'] for trial in trials]])
+    chosen = sequence.score(scorer, trials, np.arange(60)[None], long_first, 60)[0]
+    rng = np.random.default_rng(0)
+    shuffled = sequence.score(scorer, trials, rng.random((200, 60)).argsort(axis=1), np.tile(long_first, (200, 1)), 60)
+    assert chosen > np.median(shuffled)
+
+
+def test_same_seed_same_order():
+    first = sequence.arrange(_trials(), 60, candidates=100, refine=100, batch=100, seed=3)
+    second = sequence.arrange(_trials(), 60, candidates=100, refine=100, batch=100, seed=3)
+    assert [trial['no'] for trial in first] == [trial['no'] for trial in second]
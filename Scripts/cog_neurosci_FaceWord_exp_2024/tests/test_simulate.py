@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulated participants, see simulate.py.
+
+    python -m pytest tests/test_simulate.py
+"""
+
+import csv
+import os
+import statistics
+
+from faceword import engine
+from faceword import headless
+from faceword import plans
+from faceword import simulate
+
+SCRIPT = 'WordFace_exp_behav.py'
+EVENTS = os.path.join(headless.HERE, '..', '..', 'Data', 'all_models_events.csv')  # the events of the real participants
+
+
+class _Keys(object):
+    """Stands in for the headless session: keeps the keys a participant presses."""
+    def __init__(self):
+        self.pressed = []
+
+    def press(self, key, t):
+        self.pressed.append((key, t))
+
+
+def _answers(participant, prime, face, faces=4000):
+    """The reaction times and the share of right keys of :faces: faces
+    after a :prime: word, and the share of faces not answered."""
+    keys = _Keys()
+    participant._prime = prime
+    for i in range(faces):
+        participant.respond(keys, 10. * i, face)
+    rts = [t - 10. * round(t / 10.) for key, t in keys.pressed]
+    correct = sum(key == simulate.KEYS[face] for key, t in keys.pressed) / float(len(keys.pressed))
+    return rts, correct, 1 - len(keys.pressed) / float(faces)
+
+
+def test_participants_take_their_trials_from_their_plans(tmp_path):
+    made, words = plans.make(SCRIPT, '1')
+    made = dict((session, trials[::-1]) for session, trials in made.items())  # not the order the script would make
+    plans.save(plans.filename(str(tmp_path / 'plans'), '1', SCRIPT), made, words)
+
+    rows = simulate.simulate_participant((1, SCRIPT, str(tmp_path / 'out'), str(tmp_path / 'plans'), True, 'seed', {}))
+    for session, trials in made.items():
+        log, = (tmp_path / 'out' / 'sub-0001' / 'faceWord_exp_data').glob('1_sess_%i (*).csv' % session)
+        with open(str(log)) as f:
+            assert [trial['word'] for trial in csv.DictReader(f)] == [trial['word'] for trial in trials]
+    assert len(rows) == 2 * sum(len(trials) for trials in made.values())  # an image and a word row per trial
+
+
+def test_reaction_times_and_accuracy():
+    participant = simulate.Participant(rt_median=0.6, rt_sigma=0.2, accuracy=0.9, lapses=0., seed=1, labels={})
+    rts, correct, missed = _answers(participant, 'neu', 'p')
+    assert abs(statistics.median(rts) - 0.6) < 0.01
+    assert abs(correct - 0.9) < 0.02
+    assert missed == 0
+
+
+def test_lapses_are_missing_responses():
+    participant = simulate.Participant(lapses=0.2, seed=2, labels={})
+    rts, correct, missed = _answers(participant, 'neu', 'n')
+    assert abs(missed - 0.2) < 0.02
+
+
+def test_priming_speeds_up_the_congruent_faces():
+    def answers(prime):
+        participant = simulate.Participant(accuracy=0.8, lapses=0., priming=0.05, priming_accuracy=0.1, seed=3, labels={})
+        return _answers(participant, prime, 'p')
+    congruent, neutral, incongruent = answers('pos'), answers('neu'), answers('neg')
+    medians = [statistics.median(rts) for rts, correct, missed in (congruent, neutral, incongruent)]
+    assert abs(medians[1] - medians[0] - 0.05) < 0.01 and abs(medians[2] - medians[1] - 0.05) < 0.01
+    assert congruent[1] > neutral[1] > incongruent[1]
+
+
+def test_events_of_a_headless_log(tmp_path):
+    participant = simulate.Participant(seed=4)
+    session = headless.run(SCRIPT, workdir=str(tmp_path), info={'ID': '7', 'session': 2}, responder=participant)
+    log, = session.logs()
+    with open(log) as f:
+        trials = list(csv.DictReader(f))
+    rows = simulate.events(log, 7, 'female', 23, 2024)
+
+    with open(EVENTS) as f:
+        assert list(simulate.EVENT_COLUMNS) == next(csv.reader(f))
+    assert all(list(row) == list(simulate.EVENT_COLUMNS) for row in rows)
+    assert len(rows) == 2 * len(trials) == 120
+    images, words = rows[:60], rows[60:]  # the image rows of the block, then its word rows
+    assert [row['onset'] for row in images] == [float(trial['onset_img']) for trial in trials]
+    assert [row['onset'] for row in words] == [float(trial['onset_word']) for trial in trials]
+    assert set(row['trial_type'] for row in images) == {'image_pos', 'image_neg'}
+    assert set(row['trial_type'] for row in words) == {'word_pos', 'word_neg', 'word_neu'}
+    assert [row['trial_type'] for row in images] == ['image_pos' if trial['img'] == engine.IMG_P else 'image_neg' for trial in trials]
+    assert set((row['sub'], row['gender'], row['age'], row['block'], row['year']) for row in rows) == {(7, 'female', 23, 2, 2024)}
+    answered = [row for row in images if row['response']]
+    assert answered and all(row['correct_resp'] in (0, 1) and row['response_time'] > 0 for row in answered)
+    assert all(row['correct_resp'] is None and row['response_time'] is None for row in images if not row['response'])
+
+
+def test_each_session_log_is_read_once(monkeypatch, tmp_path):
+    monkeypatch.setitem(simulate.SESSIONS, SCRIPT, (1, 3))
+    rows = simulate.simulate_participant((2, SCRIPT, str(tmp_path), str(tmp_path / 'plans'), False, 'seed', {}))
+    assert len(rows) == 2 * 2 * 60  # an image and a word row per trial of both sessions, each once
+    assert sorted(set(row['block'] for row in rows)) == [1, 3]
+    assert not (tmp_path / 'sub-0002').exists()
+
+    monkeypatch.setitem(simulate.SESSIONS, SCRIPT, ())
+    assert simulate.simulate_participant((3, SCRIPT, str(tmp_path), str(tmp_path / 'plans'), False, 'seed', {})) == []
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The word and face screens of a session, see stimcache.py.
+
+    python -m pytest tests/test_stimcache.py
+"""
+
+import sys
+
+import pytest
+
+from faceword import engine
+from faceword import headless
+from faceword import stimcache
+
+TEXT_STYLE = dict(pos=[0, 0], height=0.7)
+IMAGE_STYLE = dict(pos=[0, 0], size=[4, 4])
+
+
+@pytest.fixture
+def win():
+    """A window of the psychopy stand-in, taken out of sys.modules again afterwards."""
+    saved = dict((name, module) for name, module in sys.modules.items() if name.partition('.')[0] in ('psychopy', 'triggers'))
+    headless.install(headless.Session())
+    from psychopy import visual
+    yield visual.Window()
+    for name in [name for name in sys.modules if name.partition('.')[0] in ('psychopy', 'triggers')]:
+        del sys.modules[name]
+    sys.modules.update(saved)
+
+
+def _cache(win, buffered=False):
+    from psychopy import visual
+    dot = visual.GratingStim(win, text='dot')
+    fixation = visual.TextStim(win, text='+')
+    return stimcache.StimulusCache(win, ['hat', 'sun', 'hat', 'sun', 'car'], ['p.png', 'n.png', 'p.png'],
+                                   TEXT_STYLE, IMAGE_STYLE, dot=dot, fixation=fixation, buffered=buffered), dot, fixation
+
+
+def test_one_stimulus_per_word_and_image(win):
+    stimuli, dot, fixation = _cache(win)
+    assert sorted(stimuli.text) == ['car', 'hat', 'sun'] and sorted(stimuli.image) == ['n.png', 'p.png']
+    assert all(stim.text == word and stim.height == 0.7 for word, stim in stimuli.text.items())
+    assert all(stim.image == image and stim.size == [4, 4] for image, stim in stimuli.image.items())
+
+
+@pytest.mark.parametrize('buffered', [False, True])
+def test_screens(win, buffered):
+    stimuli, dot, fixation = _cache(win, buffered)
+    screen_type = headless._BufferImageStim if buffered else stimcache._Screen
+    assert all(type(screen) is screen_type for screen in
+               list(stimuli.word_screen.values()) + list(stimuli.image_screen.values()) + [stimuli.fixation_screen])
+
+    screens = stimuli.screens([('word', 'sun'), ('image', 'n.png'), ('fixation', None), ('word', 'sun')])
+    assert screens[0] is screens[3] is stimuli.word_screen['sun']
+    assert screens[1] is stimuli.image_screen['n.png'] and screens[2] is stimuli.fixation_screen
+
+    # What each screen puts on the window: the stimulus with the dot, and the cross alone
+    for screen, stims in zip(screens[:3], [[stimuli.text['sun'], dot], [stimuli.image['n.png'], dot], [fixation]]):
+        screen.draw()
+        win.flip()
+        assert _flat(headless._session.shown) == stims
+    with pytest.raises(KeyError):
+        stimuli.screens([('word', 'moon')])
+
+
+def test_no_dot_and_no_fixation(win):
+    stimuli = stimcache.StimulusCache(win, ['hat'], ['p.png'], TEXT_STYLE, IMAGE_STYLE)
+    assert stimuli.word_screen['hat'].stims == [stimuli.text['hat']] and stimuli.fixation_screen is None
+
+
+def test_report(win, capsys):
+    stimuli, dot, fixation = _cache(win)
+    medians = stimuli.report(repeat=2)
+    assert sorted(medians) == ['lookup', 'set_image', 'set_text'] and all(value >= 0 for value in medians.values())
+    assert '3 words' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('argv', [[], ['--profile-startup']])
+def test_report_only_when_profiling_the_startup(monkeypatch, tmp_path, capsys, argv):
+    monkeypatch.setattr(sys, 'argv', ['WordFace_exp_behav.py'] + argv)
+    headless.run('WordFace_exp_behav.py', workdir=str(tmp_path), info={'ID': 'report'})
+    out = capsys.readouterr().out
+    assert ('stimulus cache:' in out) == bool(argv) == ('start-up:' in out)
+
+
+def _flat(shown):
+    """The stimuli on the screen, with the buffered screens taken apart into the stimuli they were made of."""
+    stims = []
+    for stim in shown:
+        stims += _flat(stim.stim) if isinstance(stim, headless._BufferImageStim) else [stim]
+    return stims
+
+
+def _stims(shown):
+    return tuple((type(stim).__name__, stim.text, getattr(stim, 'image', None), tuple(getattr(stim, 'pos', ())))
+                 for stim in _flat(shown))
+
+
+def _frames(monkeypatch, tmp_path, script, buffered):
+    monkeypatch.setitem(engine.profile(script), 'buffer_screens', buffered)
+    frames = []
+    session = headless.run(script, workdir=str(tmp_path / str(buffered)), info={'ID': 'buffer'},
+                           responder=lambda session, t: frames.append((t, _stims(session.shown))))
+    return frames, session.triggers
+
+
+@pytest.mark.parametrize('script', ['WordFace_exp_scanner_MEG.py', 'WordFace_exp_behav.py'])
+def test_buffered_screens_show_the_same_frames(monkeypatch, tmp_path, script):
+    unbuffered, unbuffered_triggers = _frames(monkeypatch, tmp_path, script, False)
+    buffered, buffered_triggers = _frames(monkeypatch, tmp_path, script, True)
+    assert len(set(stims for t, stims in unbuffered)) > 60  # every word, both faces and the fixation
+    assert buffered == unbuffered
+    assert buffered_triggers == unbuffered_triggers
+
+
+def test_buffering_is_off_unless_a_profile_turns_it_on():
+    assert engine.BUFFER_SCREENS is False
+    assert all(settings['buffer_screens'] is False for settings in engine.PROFILES.values())
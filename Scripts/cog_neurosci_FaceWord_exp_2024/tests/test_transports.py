@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The ways of sending the trigger codes, see transports.py.
+
+    python -m pytest tests/test_transports.py
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import time
+import types
+
+import pytest
+
+from faceword import transports
+
+
+def test_udp_sends_the_code_and_the_time():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(5)
+    transport = transports.open_transport('udp:127.0.0.1:%i' % receiver.getsockname()[1])
+    assert isinstance(transport, transports.UDPTransport)
+
+    before = time.time()
+    for code in (11, 0, 255):
+        transport.setData(code)
+    packets = [transports.UDP_PACKET.unpack(receiver.recv(64)) for i in range(3)]
+    transport.close()
+    receiver.close()
+    assert [code for code, t in packets] == [11, 0, 255]
+    assert all(before <= t <= time.time() for code, t in packets)
+
+
+def test_file_gets_a_line_per_code(tmp_path):
+    transport = transports.open_transport('file:' + str(tmp_path / 'triggers.log'))
+    for code in (11, 0, 21, 0):
+        transport.setData(code)
+    transport.close()
+
+    with open(str(tmp_path / 'triggers.log')) as f:
+        lines = [line.rstrip('\n').split('\t') for line in f]
+    assert [int(code) for t, code in lines] == [11, 0, 21, 0]
+    assert [float(t) for t, code in lines] == sorted(float(t) for t, code in lines)
+
+
+def test_fake_prints_the_codes_but_not_the_zeros(capsys):
+    transport = transports.open_transport('fake')
+    transport.setData(11)
+    transport.setData(0)
+    transport.close()
+    assert capsys.readouterr().out == 'TRIG 11 (Fake)\n'
+
+
+def test_serial_writes_a_byte_per_code():
+    pytest.importorskip('serial')
+    termios = pytest.importorskip('termios')
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave, termios.TCSANOW)
+    transport = transports.open_transport('serial:' + os.ttyname(slave))
+    for code in (11, 0, 255):
+        transport.setData(code)
+    assert os.read(master, 3) == bytes([11, 0, 255])
+    transport.close()
+    os.close(master)
+    os.close(slave)
+
+
+@pytest.mark.parametrize('spec, address', [('udp', ('127.0.0.1', 5005)), ('udp:192.168.1.10', ('192.168.1.10', 5005)),
+                                           ('udp::6000', ('127.0.0.1', 6000)), ('udp:192.168.1.10:6000', ('192.168.1.10', 6000))])
+def test_udp_host_and_port_default(spec, address):
+    transport = transports.open_transport(spec)
+    assert transport.address == address
+    transport.close()
+
+
+def test_udp_port_must_be_a_number():
+    with pytest.raises(ValueError, match='port must be a number'):
+        transports.open_transport('udp:localhost:five')
+
+
+def test_serial_write_timeout_is_logged_not_raised(monkeypatch, capsys):
+    class SerialTimeoutException(Exception):
+        pass
+
+    class Serial(object):
+        port = 'COM3'
+
+        def __init__(self, device, **settings):
+            self.written = []
+
+        def write(self, data):
+            if data == bytes([21]):
+                raise SerialTimeoutException('Write timeout')
+            self.written.append(data)
+    serial = types.ModuleType('serial')
+    serial.Serial, serial.SerialTimeoutException = Serial, SerialTimeoutException
+    monkeypatch.setitem(sys.modules, 'serial', serial)
+
+    transport = transports.open_transport('serial:COM3')
+    for code in (11, 0, 21, 0):
+        transport.setData(code)
+    assert transport.port.written == [bytes([11]), bytes([0]), bytes([0])]
+    assert [code for t, code in transport.timeouts] == [21]
+    assert 'serial trigger 21 timed out' in capsys.readouterr().out
+
+
+def test_environment_variable_picks_the_transport(monkeypatch, tmp_path):
+    monkeypatch.setenv(transports.ENVIRONMENT_VARIABLE, 'file:' + str(tmp_path / 'env.log'))
+    transport = transports.open_transport()
+    assert isinstance(transport, transports.FileTransport) and transport.filename == str(tmp_path / 'env.log')
+    transport.close()
+
+
+def _psychopy_parallel(monkeypatch, setData):
+    parallel = types.ModuleType('psychopy.parallel')
+    parallel.ParallelPort = lambda address=None: types.SimpleNamespace(address=address, setData=setData)
+    psychopy = types.ModuleType('psychopy')
+    psychopy.__path__ = []
+    psychopy.parallel = parallel
+    monkeypatch.setitem(sys.modules, 'psychopy', psychopy)
+    monkeypatch.setitem(sys.modules, 'psychopy.parallel', parallel)
+
+
+def test_parallel_port_is_probed(monkeypatch):
+    codes = []
+    _psychopy_parallel(monkeypatch, codes.append)
+    transport = transports.open_transport('parallel:0x378')
+    assert isinstance(transport, transports.ParallelTransport) and transport.port.address == '0x378'
+    assert codes == [128, 0]
+
+
+def test_no_parallel_port_falls_back_to_fake(monkeypatch):
+    def setData(code):
+        raise NotImplementedError
+    _psychopy_parallel(monkeypatch, setData)
+    assert isinstance(transports.open_transport('parallel'), transports.FakeTransport)
+
+
+def test_unknown_transport_is_refused():
+    with pytest.raises(ValueError):
+        transports.open_transport('carrier-pigeon:1')
+
+
+def test_benchmark_leaves_no_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    results = transports.benchmark(codes=20)
+    assert {'udp', 'file'} <= set(results)
+    assert all(result['min'] <= result['median'] <= result['max'] for result in results.values())
+    assert os.listdir(str(tmp_path)) == []
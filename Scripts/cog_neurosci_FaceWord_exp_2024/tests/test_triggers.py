@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The trigger codes (trigger_table.py), and the trigger log and its BIDS
+events (triggers.py), on the psychopy stand-in of headless.py.
+
+    python -m pytest tests/test_triggers.py
+"""
+
+import csv
+import json
+import sys
+import threading
+
+import pytest
+
+from faceword import headless
+from faceword import trigger_table
+from faceword.pulses import PULSE, STIMULUS
+
+KEYS = {'neg': ['2', 'y'], 'pos': ['1', 'b']}
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """A headless session, and triggers.py imported on its clock and parallel port."""
+    monkeypatch.delenv('FACEWORD_TRIGGERS', raising=False)
+    saved = dict((name, module) for name, module in sys.modules.items()
+                 if name == 'psychopy' or name.startswith('psychopy.') or name == 'triggers')
+    session = headless.Session()
+    headless.install(session)
+    import triggers
+    del session.triggers[:]  # the 128 and 0 of looking for the port
+    session.module = triggers
+    yield session
+    for name in [name for name in sys.modules if name == 'psychopy' or name.startswith('psychopy.') or name == 'triggers']:
+        del sys.modules[name]
+    sys.modules.update(saved)
+
+
+def test_table_matches_the_old_if_chains():
+    trigger_table.verify()
+
+
+def test_names():
+    names = trigger_table.TriggerTable('p.png', 'n.png', KEYS).names()
+    assert names[41] == 'image/neu/pos' and names[52] == 'pause/neu/neg' and names[11] == 'word/pos'
+    assert names[101] == 'response/pos/correct' and names[212] == 'response/neu/neg/incorrect'
+    fmri = trigger_table.TriggerTable('p.png', 'n.png', KEYS, trigger_table.FMRI_STIMULUS_TRIGGERS).names()
+    assert fmri[21] == 'image/neu/pos|image/pos'  # the fMRI image codes are the same after a neutral word
+    assert fmri[41] == 'pause/neu/pos'
+
+
+def _events(filename):
+    with open(filename, newline='') as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+
+def test_export_events_pairs_each_code_with_its_own_zero(session, tmp_path):
+    set_data = session.module.setParallelData
+    for now, code, source in [(10., 11, STIMULUS), (10.7, 0, STIMULUS), (12., 21, STIMULUS),
+                              (12.3, 101, PULSE), (12.31, 0, PULSE), (12.7, 0, STIMULUS), (13., 31, STIMULUS)]:
+        session.now = now
+        set_data(code, source)
+    assert [code for t, code in session.triggers] == [11, 0, 21, 101, 0, 0, 31]  # all on the port
+
+    names = trigger_table.TriggerTable('p.png', 'n.png', KEYS).names()
+    session.module.export_events(str(tmp_path / 'run_events.tsv'), start=9., codes=names)
+    events = _events(str(tmp_path / 'run_events.tsv'))
+    assert [(row['value'], row['trial_type']) for row in events] == [
+        ('11', 'word/pos'), ('21', 'image/pos'), ('101', 'response/pos/correct'), ('31', 'pause/pos')]
+    assert [float(row['onset']) for row in events] == [1., 3., 3.3, 4.]
+    assert [row['duration'] for row in events] == ['0.700000', '0.700000', '0.010000', 'n/a']  # 21 lasts to its own 0, not the pulse's
+    with open(str(tmp_path / 'run_events.json')) as f:
+        assert json.load(f)['value']['Levels']['101'] == 'response/pos/correct'
+
+    # The next run's export has only its own triggers
+    session.now = 20.
+    set_data(12)
+    session.module.export_events(str(tmp_path / 'next_events.tsv'), start=19.)
+    assert [(row['value'], row['onset'], row['trial_type']) for row in _events(str(tmp_path / 'next_events.tsv'))] == [('12', '1.000000', 'n/a')]
+
+
+def test_export_events_of_a_pulse_cut_short(session, tmp_path):
+    set_data = session.module.setParallelData
+    for now, code, source in [(10., 101, PULSE), (10.004, 11, STIMULUS), (10.7, 0, STIMULUS), (11., 102, PULSE), (11.01, 0, PULSE)]:
+        session.now = now
+        set_data(code, source)
+    session.module.export_events(str(tmp_path / 'run_events.tsv'), start=9.)
+    events = _events(str(tmp_path / 'run_events.tsv'))
+    assert [row['value'] for row in events] == ['101', '11', '102']
+    assert [row['duration'] for row in events] == ['0.004000', '0.696000', '0.010000']  # the 11 cut the 101 short
+
+
+def test_log_from_two_threads(session):
+    triggers = session.module
+    before = len(triggers.trigger_log()[0])
+
+    def pulses():
+        for i in range(2000):
+            triggers.setParallelData(101, PULSE)
+            triggers.setParallelData(0, PULSE)
+    thread = threading.Thread(target=pulses)
+    thread.start()
+    for i in range(2000):
+        triggers.setParallelData(11)
+        triggers.setParallelData(0)
+    thread.join()
+
+    times, codes, sources = triggers.trigger_log()
+    assert len(codes) - before == 8000 == len(session.triggers)
+    assert codes[before:].tolist() == [code for t, code in session.triggers]  # logged in the order they reached the port
+    assert sorted(codes[before:][sources[before:] == PULSE].tolist()) == [0] * 2000 + [101] * 2000
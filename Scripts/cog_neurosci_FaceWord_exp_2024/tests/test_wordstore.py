@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The binary store of the word list, see wordstore.py.
+
+    python -m pytest tests/test_wordstore.py
+"""
+
+import csv
+import os
+
+import pytest
+
+from faceword import wordstore
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEXT = (u'word\tscore_pc\tscore_warriner\tlabel\tsession\n'
+        u'glæde\t0.75\t7.5\tpos\t2\n'
+        u'war\t-0.5\t2.0\tneg\t1\n'
+        u'table\t0.0\t5.25\tneu\t2\n')
+
+
+def test_round_trip(tmp_path):
+    source = tmp_path / 'wordlist.txt'
+    source.write_text(TEXT, encoding='utf-8')
+    store = wordstore.load(str(source))
+
+    assert os.path.exists(wordstore.store_filename(str(source)))
+    assert store.sessions == [1, 2]
+    words = store.session(2)
+    assert words.word == (u'glæde', u'table')  # in the order of the word list
+    assert words.label == ('pos', 'neu')
+    assert words.score_pc == (0.75, 0.0) and words.score_warriner == (7.5, 5.25)
+    assert len(store.session(1)) == 1
+    with pytest.raises(KeyError):
+        store.session(3)
+
+
+def test_converted_again_when_the_word_list_changes(tmp_path):
+    source = tmp_path / 'wordlist.txt'
+    source.write_text(TEXT, encoding='utf-8')
+    assert wordstore.load(str(source)).session(1).word == ('war',)
+
+    source.write_text(TEXT.replace('\nwar', '\nsin'), encoding='utf-8')  # same size, another word
+    store = wordstore.load(str(source))
+    assert store.session(1).word == ('sin',)
+    assert store.is_of(source.read_bytes())
+
+
+def test_missing_column():
+    with pytest.raises(ValueError):
+        wordstore.pack(b'word\tlabel\nwar\tneg\n')
+
+
+def test_same_as_the_word_list():
+    store = wordstore.load(os.path.join(HERE, 'wordlist.txt'))
+    with open(os.path.join(HERE, 'wordlist.txt'), newline='') as f:
+        rows = list(csv.DictReader(f, delimiter='\t'))
+    for session in store.sessions:
+        mine = [row for row in rows if int(row['session']) == session]
+        words = store.session(session)
+        assert list(words.word) == [row['word'] for row in mine]
+        assert list(words.label) == [row['label'] for row in mine]
+        assert list(words.score_pc) == [float(row['score_pc']) for row in mine]
@@ -1,29 +1,112 @@
-#!/usr/bin/env python2
-# -*- coding: utf-8 -*-
-from psychopy import parallel
-import platform
-
-PLATFORM = platform.platform()
-if 'Linux' in PLATFORM:
-    port = parallel.ParallelPort(address='/dev/parport0')  # on MEG stim PC
-else:  # on Win this will work, on Mac we catch error below
-    port = parallel.ParallelPort(address=0xDFF8)  # on MEG stim PC
-
-# NB problems getting parallel port working under conda env
-# from psychopy.parallel._inpout32 import PParallelInpOut32
-# port = PParallelInpOut32(address=0xDFF8)  # on MEG stim PC
-# parallel.setPortAddress(address='0xDFF8')
-# port = parallel
-
-# Figure out whether to flip pins or fake it
-try:
-    port.setData(128)
-except NotImplementedError:
-    def setParallelData(code=1):
-        if code > 0:
-            # logging.exp('TRIG %d (Fake)' % code)
-            print('TRIG %d (Fake)' % code)
-            pass
-else:
-    port.setData(0)
-    setParallelData = port.setData
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sets the trigger codes on the port (setParallelData), and logs every
+code that is set, with its core.monotonicClock time, in a preallocated array.
+After a run, export_events() saves the triggers of the run as a BIDS events.tsv
+file plus an events.json dictionary of the codes, for aligning the MEG/EEG
+recording with the experiment:
+
+    from triggers import setParallelData, export_events
+    setParallelData(11)
+    export_events('data/0001_sess_1_events.tsv', exp_start, TRIGGERS.names())
+
+The port is the parallel port unless the FACEWORD_TRIGGERS environment
+variable picks another transport, e.g. FACEWORD_TRIGGERS=udp:192.168.1.10:5005
+(see transports.py).
+"""
+from psychopy import core
+import json
+import threading
+
+import numpy as np
+
+from faceword import transports
+from faceword.pulses import PULSE, STIMULUS
+
+# The parallel port, or whatever FACEWORD_TRIGGERS says this lab uses (see
+# transports.py). Falls back to printing the codes if there is no parallel port.
+port = transports.open_transport()
+
+# NB problems getting parallel port working under conda env
+# from psychopy.parallel._inpout32 import PParallelInpOut32
+# port = PParallelInpOut32(address=0xDFF8)  # on MEG stim PC
+# parallel.setPortAddress(address='0xDFF8')
+# port = parallel
+
+_setData = port.setData
+
+
+"""
+TRIGGER LOG
+"""
+LOG_SIZE = 100000  # ~ 150 runs of the MEG experiment
+
+_log_t = np.zeros(LOG_SIZE)
+_log_code = np.zeros(LOG_SIZE, np.int16)
+_log_source = np.zeros(LOG_SIZE, np.int8)
+_log_n = 0  # entries logged so far
+_lock = threading.Lock()  # the flips and the pulse thread both set triggers
+_logged = 0  # entries logged when export_events() was last called
+
+
+def setParallelData(code=1, source=STIMULUS):
+    """Sets the code on the port (0 = pull the trigger down) and logs it.
+    :source: who sets it, pulses.STIMULUS or pulses.PULSE"""
+    global _log_n
+    with _lock:  # the log is in the order the codes reached the port
+        if _log_n < LOG_SIZE:  # when full, the port still works but nothing more is logged
+            _log_t[_log_n] = core.monotonicClock.getTime()
+            _log_code[_log_n] = code
+            _log_source[_log_n] = source
+            _log_n += 1
+        _setData(code)
+
+
+def trigger_log():
+    """Returns (times, codes, sources) of every code set so far, incl. the 0's."""
+    with _lock:
+        return _log_t[:_log_n].copy(), _log_code[:_log_n].copy(), _log_source[:_log_n].copy()
+
+
+def export_events(filename, start=0.0, codes=None):
+    """
+    Saves the triggers set since the last export (i.e. in this run) as a BIDS
+    events.tsv file with the columns onset, duration, value and trial_type,
+    and the code dictionary next to it as events.json.
+        :filename: (str) e.g. 'data/0001_sess_1_events.tsv'
+        :start: (float) core.monotonicClock time of the start of the run, i.e. onset 0
+        :codes: {code: trial_type}, e.g. TriggerTable.names() of the profile
+    """
+    global _logged
+    codes = codes or {}
+    times, values, sources = trigger_log()
+    first, _logged = _logged, len(times)
+    times, values, sources = times[first:], values[first:], sources[first:]
+
+    # A trigger lasts until the next code from the same source, i.e. its own 0,
+    # even if a code from the other source (a response pulse) came in between.
+    # A response pulse is cut short by the next stimulus code though (see pulses.py)
+    ends = np.full(len(times), np.nan)
+    for source in np.unique(sources):
+        rows = np.flatnonzero(sources == source)
+        ends[rows[:-1]] = times[rows[1:]]
+    pulse_rows, stimulus_rows = np.flatnonzero(sources == PULSE), np.flatnonzero(sources == STIMULUS)
+    following = np.searchsorted(stimulus_rows, pulse_rows)
+    cut = following < len(stimulus_rows)
+    ends[pulse_rows[cut]] = np.fmin(ends[pulse_rows[cut]], times[stimulus_rows[following[cut]]])
+    ups = np.flatnonzero(values)
+    with open(filename, 'w') as f:
+        f.write('onset\tduration\tvalue\ttrial_type\n')
+        for onset, duration, value in zip(times[ups] - start, ends[ups] - times[ups], values[ups]):
+            f.write('%.6f\t%s\t%i\t%s\n' % (onset, 'n/a' if np.isnan(duration) else '%.6f' % duration,
+                                               value, codes.get(int(value), 'n/a')))
+
+    with open(filename[:-len('.tsv')] + '.json', 'w') as f:
+        json.dump({
+            'onset': {'Description': 'Time the code was set on the port, relative to the start of the run', 'Units': 's'},
+            'duration': {'Description': 'Time until the same source (the flips or the response pulses) set the next code, normally its 0. '
+                                        'A response pulse ends early if a stimulus code was set before its 0', 'Units': 's'},
+            'value': {'Description': 'Trigger code', 'Levels': dict((str(code), name) for code, name in sorted(codes.items()))},
+            'trial_type': {'Description': 'What the trigger code means'},
+        }, f, indent=1)